@@ -3,9 +3,13 @@ import re
 import json
 <<<<<<< HEAD
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable
 import db
 from ssh_manager import ssh_manager
+from fanout import fanout, server_host_key
+from metrics import format_bytes
+from metrics_pipeline import collect_metrics
+from history_writer import history_writer
 
 # Later we'll integrate with Claude
 # from anthropic import Anthropic
@@ -375,14 +379,14 @@ class AIAgent:
             formatted += f"• CPU Usage: {metrics['cpu_usage']:.1f}%\n"
         
         if 'memory_used' in metrics and 'memory_total' in metrics:
-            formatted += f"• Memory: {metrics['memory_used']} MB / {metrics['memory_total']} MB "
+            formatted += f"• Memory: {format_bytes(metrics['memory_used'])} / {format_bytes(metrics['memory_total'])} "
             if 'memory_percent' in metrics:
                 formatted += f"({metrics['memory_percent']}%)\n"
             else:
                 formatted += "\n"
         
         if 'disk_used' in metrics and 'disk_total' in metrics:
-            formatted += f"• Disk: {metrics['disk_used']} / {metrics['disk_total']} "
+            formatted += f"• Disk: {format_bytes(metrics['disk_used'])} / {format_bytes(metrics['disk_total'])} "
             if 'disk_percent' in metrics:
                 formatted += f"({metrics['disk_percent']}%)\n"
             else:
@@ -394,13 +398,76 @@ class AIAgent:
         if 'uptime' in metrics:
             formatted += f"• Uptime: {metrics['uptime']}\n"
         
-        if 'network_interface' in metrics:
-            rx = metrics.get('network_rx', 0)
-            tx = metrics.get('network_tx', 0)
-            formatted += f"• Network ({metrics['network_interface']}): RX {rx} bytes, TX {tx} bytes\n"
+        if 'disk_iops' in metrics:
+            formatted += (f"• Disk I/O: {metrics['disk_iops']} IOPS, "
+                          f"read {format_bytes(metrics.get('disk_read_rate'))}/s, "
+                          f"write {format_bytes(metrics.get('disk_write_rate'))}/s\n")
+        
+        for interface, network in metrics.get('network_interfaces', {}).items():
+            if network['rx_bytes_per_sec'] is not None:
+                formatted += (f"• Network ({interface}): RX {format_bytes(network['rx_bytes_per_sec'])}/s, "
+                              f"TX {format_bytes(network['tx_bytes_per_sec'])}/s\n")
+            else:
+                formatted += (f"• Network ({interface}): RX {format_bytes(network['rx_bytes'])}, "
+                              f"TX {format_bytes(network['tx_bytes'])} total\n")
         
         return formatted
 
+    def run_actions(self, actions: List[Dict[str, Any]],
+                    on_result: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """
+        Run 'execute' and 'get_metrics' actions concurrently across servers.
+        
+        'confirm' actions are skipped; they must be confirmed by the user first.
+        Results are passed to on_result(action, result) as each server completes
+        and returned in the original action order.
+        """
+        runnable = [
+            (index, action) for index, action in enumerate(actions)
+            if action.get('type') in ('execute', 'get_metrics')
+        ]
+        servers = {}
+        for _, action in runnable:
+            if action['server_id'] not in servers:
+                servers[action['server_id']] = db.get_server(action['server_id'])
+        
+        def run(indexed_action):
+            _, action = indexed_action
+            server = servers.get(action['server_id'])
+            if not server:
+                return {'success': False, 'error': f"Server with ID {action['server_id']} not found"}
+            if not ssh_manager.ensure_connected(server):
+                return {'success': False, 'error': ssh_manager.connect_error(server)}
+            
+            if action['type'] == 'get_metrics':
+                return collect_metrics(server['id'])
+            
+            result = ssh_manager.execute_command(server['id'], action['command'])
+            history_writer.add(
+                server_id=server['id'],
+                command=action['command'],
+                output=result.get('stdout', '') + '\n' + result.get('stderr', ''),
+                exit_code=result.get('exit_code')
+            )
+            return result
+        
+        def host_key(indexed_action):
+            server = servers.get(indexed_action[1]['server_id'])
+            return server_host_key(server) if server else indexed_action[1]['server_id']
+        
+        results = [None] * len(actions)
+        for (index, action), future in fanout.map_unordered(run, runnable, key=host_key):
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Error running action on server {action['server_id']}: {str(e)}")
+                result = {'success': False, 'error': str(e)}
+            results[index] = result
+            if on_result:
+                on_result(action, result)
+        
+        return [result for result in results if result is not None]
+
 # Create a singleton instance
 ai_agent = AIAgent() 
 =======
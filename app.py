@@ -6,6 +6,9 @@ from dotenv import load_dotenv
 import db
 from routes import api
 from websocket import socketio, init_socketio
+from connection_maintenance import connection_maintainer
+from warmup import connection_warmer, WARMUP_ENABLED
+from metrics_poller import metrics_poller
 =======
 import json
 from dotenv import load_dotenv
@@ -73,6 +76,18 @@ def create_app():
     # Initialize database
     db.init_db()
     
+    # Start background SSH keepalive, idle reaping and reconnects
+    if os.environ.get('SSH_MAINTENANCE', 'True').lower() in ('true', '1', 't'):
+        connection_maintainer.start()
+    
+    # Optionally connect to every server up front instead of on first use
+    if WARMUP_ENABLED:
+        connection_warmer.warm_all(reason='startup')
+    
+    # Poll every server's metrics in the background and push them to subscribers
+    if os.environ.get('METRICS_POLLING', 'True').lower() in ('true', '1', 't'):
+        metrics_poller.start()
+    
     return app
 
 if __name__ == '__main__':
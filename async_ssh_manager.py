@@ -0,0 +1,420 @@
+import os
+import time
+import asyncio
+import threading
+import logging
+from typing import Dict, Optional, Any, Callable
+import asyncssh
+from circuit_breaker import CircuitBreakerRegistry, unavailable_message
+from metrics import METRIC_COMMANDS, COLLECTOR_SCRIPT, RateTracker, parse_metric, parse_collector_output
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Metrics collection mode, shared with the paramiko backend
+METRICS_MODE = os.environ.get('METRICS_MODE', 'batched')
+
+# Seconds between SSH keepalive messages on idle connections (0 disables)
+SSH_KEEPALIVE_INTERVAL = int(os.environ.get('SSH_KEEPALIVE_INTERVAL', 30))
+
+# Characters of trailing output kept per stream in a streamed command's result
+STREAM_TAIL_BYTES = int(os.environ.get('STREAM_TAIL_BYTES', 65536))
+
+class AsyncSSHManager:
+    """
+    asyncio-native SSH backend with the same surface as SSHManager.
+
+    All sessions live on one event loop running in a background thread, so
+    holding thousands of hosts costs sockets, not threads. The synchronous
+    methods mirror SSHManager and can be used as a drop-in replacement; the
+    *_async coroutines can be awaited directly from code running on the loop.
+    """
+
+    def __init__(self, metrics_mode: str = METRICS_MODE):
+        self.connections = {}  # Dictionary to store active SSH connections
+        self.breakers = CircuitBreakerRegistry()  # fail fast for unreachable hosts
+        self.metrics_mode = metrics_mode
+        self.metric_rates = RateTracker()  # previous counters per server, for rates
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name='async-ssh', daemon=True)
+        self._thread.start()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _call(self, coro, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the backend loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    # Coroutine API
+
+    async def connect_async(self, server_id: str, hostname: str, username: str,
+                            password: Optional[str] = None, key_path: Optional[str] = None,
+                            port: int = 22) -> bool:
+        """Establish an SSH connection to a server and store it."""
+        breaker = self.breakers.get(hostname, port)
+        try:
+            options = {
+                'host': hostname,
+                'port': port,
+                'username': username,
+                'known_hosts': None,
+                'connect_timeout': 10,
+                'keepalive_interval': SSH_KEEPALIVE_INTERVAL
+            }
+
+            # Connect using either password or key
+            if key_path and os.path.exists(key_path):
+                options['client_keys'] = [key_path]
+                options['password'] = None
+            elif password:
+                options['client_keys'] = None
+                options['password'] = password
+            else:
+                logger.error(f"No valid authentication method provided for {hostname}")
+                return False
+
+            if not breaker.allow():
+                status = breaker.status()
+                logger.warning(f"Not connecting to {hostname}: host unavailable "
+                               f"(retry in {status['retry_after']}s): {status['last_error']}")
+                return False
+
+            try:
+                conn = await asyncssh.connect(**options)
+            except asyncssh.PermissionDenied:
+                # The host answered; only unreachable hosts trip the breaker
+                breaker.record_success()
+                raise
+            except Exception as e:
+                breaker.record_failure(str(e) or type(e).__name__)
+                raise
+            breaker.record_success()
+
+            # Store the connection, closing any existing one
+            previous = self.connections.pop(server_id, None)
+            if previous:
+                previous['client'].close()
+            self.connections[server_id] = {
+                'client': conn,
+                'last_used': time.time()
+            }
+
+            logger.info(f"Successfully connected to {hostname}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to connect to {hostname}: {str(e)}")
+            return False
+
+    async def disconnect_async(self, server_id: str) -> bool:
+        """Close an SSH connection."""
+        entry = self.connections.pop(server_id, None)
+        if not entry:
+            return False
+        try:
+            entry['client'].close()
+            await entry['client'].wait_closed()
+            return True
+        except Exception as e:
+            logger.error(f"Error disconnecting from server {server_id}: {str(e)}")
+            return False
+
+    async def execute_command_async(self, server_id: str, command: str,
+                                    timeout: int = 30) -> Dict[str, Any]:
+        """Execute a command on the connected server."""
+        conn = self.get_connection(server_id)
+
+        if not conn:
+            return {
+                'success': False,
+                'error': 'Not connected to server',
+                'stdout': '',
+                'stderr': 'SSH connection not established',
+                'exit_code': -1
+            }
+
+        try:
+            result = await conn.run(command, check=False, timeout=timeout)
+            exit_code = result.exit_status if result.exit_status is not None else -1
+
+            return {
+                'success': exit_code == 0,
+                'stdout': result.stdout or '',
+                'stderr': result.stderr or '',
+                'exit_code': exit_code
+            }
+
+        except asyncssh.TimeoutError as e:
+            # asyncssh closes the channel; keep whatever the command printed
+            logger.error(f"Command timed out after {timeout} seconds on server {server_id}")
+            return {
+                'success': False,
+                'error': f'Command timed out after {timeout} seconds',
+                'stdout': e.stdout or '',
+                'stderr': e.stderr or '',
+                'exit_code': -1
+            }
+
+        except Exception as e:
+            logger.error(f"Error executing command on server {server_id}: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'stdout': '',
+                'stderr': f'Error: {str(e)}',
+                'exit_code': -1
+            }
+
+    async def get_server_metrics_async(self, server_id: str) -> Dict[str, Any]:
+        """Collect basic metrics from the server."""
+        metrics = {
+            'success': False,
+            'timestamp': time.time()
+        }
+
+        if not self.get_connection(server_id):
+            metrics['error'] = 'Not connected to server'
+            return metrics
+
+        try:
+            if self.metrics_mode == 'batched':
+                # Run every collector in a single exec round trip
+                result = await self.execute_command_async(server_id, COLLECTOR_SCRIPT)
+                if not result['stdout'] and not result['success']:
+                    raise RuntimeError(result.get('error') or result['stderr'] or 'Metrics collection failed')
+                parse_collector_output(result['stdout'], metrics)
+            else:
+                # One exec per metric, issued concurrently over the connection
+                results = await asyncio.gather(*(
+                    self.execute_command_async(server_id, command)
+                    for command in METRIC_COMMANDS.values()
+                ))
+                for name, result in zip(METRIC_COMMANDS, results):
+                    if result['success']:
+                        parse_metric(name, result['stdout'], metrics)
+
+            self.metric_rates.apply(server_id, metrics)
+            metrics['success'] = True
+            return metrics
+
+        except Exception as e:
+            logger.error(f"Error collecting metrics from server {server_id}: {str(e)}")
+            metrics['error'] = str(e)
+            return metrics
+
+    async def _transfer_async(self, server_id: str, local_path: str, remote_path: str,
+                              upload: bool,
+                              on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        conn = self.get_connection(server_id)
+
+        if not conn:
+            return {
+                'success': False,
+                'error': 'Not connected to server'
+            }
+
+        try:
+            # asyncssh pipelines reads and writes itself (max_requests per file)
+            start = time.perf_counter()
+            progress_handler = None
+            if on_progress:
+                # asyncssh reports running totals; on_progress takes increments
+                copied = [0]
+
+                def progress_handler(src, dst, bytes_copied, total):
+                    on_progress(bytes_copied - copied[0])
+                    copied[0] = bytes_copied
+
+            async with conn.start_sftp_client() as sftp:
+                if upload:
+                    await sftp.put(local_path, remote_path, progress_handler=progress_handler)
+                else:
+                    await sftp.get(remote_path, local_path, progress_handler=progress_handler)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(local_path)
+
+            return {
+                'success': True,
+                'local_path': local_path,
+                'remote_path': remote_path,
+                'bytes': size,
+                'bytes_transferred': size,
+                'elapsed': round(elapsed, 3),
+                'throughput_mb_s': round(size / elapsed / 1e6, 2) if elapsed > 0 else None
+            }
+
+        except Exception as e:
+            direction = 'uploading file to' if upload else 'downloading file from'
+            logger.error(f"Error {direction} server {server_id}: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'local_path': local_path,
+                'remote_path': remote_path
+            }
+
+    async def upload_file_async(self, server_id: str, local_path: str,
+                                remote_path: str,
+                                on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """Upload a file to the remote server."""
+        return await self._transfer_async(server_id, local_path, remote_path, upload=True,
+                                          on_progress=on_progress)
+
+    async def download_file_async(self, server_id: str, remote_path: str,
+                                  local_path: str) -> Dict[str, Any]:
+        """Download a file from the remote server."""
+        return await self._transfer_async(server_id, local_path, remote_path, upload=False)
+
+    # Synchronous API, matching SSHManager
+
+    def connect(self, server_id: str, hostname: str, username: str,
+                password: Optional[str] = None, key_path: Optional[str] = None,
+                port: int = 22, reconnect: bool = True) -> bool:
+        """Establish an SSH connection to a server and store it."""
+        if not reconnect and server_id in self.connections:
+            return True
+        return self._call(self.connect_async(server_id, hostname, username,
+                                             password, key_path, port))
+
+    def disconnect(self, server_id: str) -> bool:
+        """Close an SSH connection."""
+        return self._call(self.disconnect_async(server_id))
+
+    def get_connection(self, server_id: str) -> Optional[asyncssh.SSHClientConnection]:
+        """Get an active SSH connection or None if not connected."""
+        entry = self.connections.get(server_id)
+        if entry:
+            # Update last used time
+            entry['last_used'] = time.time()
+            return entry['client']
+        return None
+
+    def pool_stats(self, server_id: str) -> Optional[Dict[str, Any]]:
+        """Get connection statistics for a server; asyncssh multiplexes one connection."""
+        entry = self.connections.get(server_id)
+        if not entry:
+            return None
+        return {
+            'backend': 'asyncssh',
+            'transports': 1,
+            'last_used': entry['last_used']
+        }
+
+    def host_status(self, server: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Get the circuit breaker status for a server record's host, if it has one."""
+        return self.breakers.status(server['hostname'], server.get('port', 22))
+
+    def connect_error(self, server: Dict[str, Any]) -> str:
+        """Describe why a server record could not be connected to."""
+        status = self.host_status(server)
+        if status and not status['available']:
+            return unavailable_message(server['name'], status)
+        return f"Failed to connect to server {server['name']}"
+
+    def ensure_connected(self, server: Dict[str, Any]) -> bool:
+        """Connect to a server record from the database unless already connected."""
+        if self.get_connection(server['id']):
+            return True
+
+        return self.connect(
+            server_id=server['id'],
+            hostname=server['hostname'],
+            username=server['username'],
+            password=server.get('password'),
+            key_path=server.get('key_path'),
+            port=server.get('port', 22)
+        )
+
+    def execute_command(self, server_id: str, command: str,
+                        timeout: int = 30) -> Dict[str, Any]:
+        """Execute a command on the connected server."""
+        return self._call(self.execute_command_async(server_id, command, timeout))
+
+    def execute_command_stream(self, server_id: str, command: str,
+                               on_output: Callable[[str, str], None],
+                               timeout: Optional[int] = None) -> Dict[str, Any]:
+        """Execute a command and pass its output to on_output(stream, text) as it arrives."""
+        return self._call(self._stream_async(server_id, command, on_output, timeout))
+
+    async def _stream_async(self, server_id: str, command: str,
+                            on_output: Callable[[str, str], None],
+                            timeout: Optional[int]) -> Dict[str, Any]:
+        conn = self.get_connection(server_id)
+
+        if not conn:
+            return {
+                'success': False,
+                'error': 'Not connected to server',
+                'stdout': '',
+                'stderr': 'SSH connection not established',
+                'exit_code': -1
+            }
+
+        sizes = {'stdout': 0, 'stderr': 0}
+        tails = {'stdout': '', 'stderr': ''}
+
+        async def pump(stream_name, reader):
+            while True:
+                text = await asyncio.wait_for(reader.read(32768), timeout)
+                if not text:
+                    break
+                sizes[stream_name] += len(text)
+                tails[stream_name] = (tails[stream_name] + text)[-STREAM_TAIL_BYTES:]
+                on_output(stream_name, text)
+
+        try:
+            async with conn.create_process(command) as process:
+                await asyncio.gather(pump('stdout', process.stdout),
+                                     pump('stderr', process.stderr))
+                await process.wait()
+                exit_code = process.exit_status if process.exit_status is not None else -1
+
+            return {
+                'success': exit_code == 0,
+                'stdout': tails['stdout'],
+                'stderr': tails['stderr'],
+                'exit_code': exit_code,
+                'stdout_bytes': sizes['stdout'],
+                'stderr_bytes': sizes['stderr'],
+                'truncated': any(size > STREAM_TAIL_BYTES for size in sizes.values())
+            }
+
+        except Exception as e:
+            logger.error(f"Error streaming command on server {server_id}: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'stdout': '',
+                'stderr': f'Error: {str(e)}',
+                'exit_code': -1
+            }
+
+    def get_server_metrics(self, server_id: str) -> Dict[str, Any]:
+        """Collect basic metrics from the server."""
+        return self._call(self.get_server_metrics_async(server_id))
+
+    def cleanup_idle_connections(self, max_idle_time: int = 600) -> int:
+        """Close connections that have been idle for too long."""
+        current_time = time.time()
+        closed_count = 0
+
+        for server_id, entry in list(self.connections.items()):
+            if current_time - entry['last_used'] > max_idle_time:
+                if self.disconnect(server_id):
+                    closed_count += 1
+
+        return closed_count
+
+    def upload_file(self, server_id: str, local_path: str,
+                    remote_path: str, source: Optional[memoryview] = None,
+                    on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """Upload a file to the remote server; asyncssh reads the file itself, so source is unused."""
+        return self._call(self.upload_file_async(server_id, local_path, remote_path, on_progress))
+
+    def download_file(self, server_id: str, remote_path: str,
+                      local_path: str) -> Dict[str, Any]:
+        """Download a file from the remote server."""
+        return self._call(self.download_file_async(server_id, remote_path, local_path))
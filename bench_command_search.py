@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import statistics
+from unittest import mock
+import db
+
+COMMANDS = [
+    ('uptime', lambda rng: f'up {rng.randint(1, 400)} days, load average: {rng.random():.2f}'),
+    ('df -h', lambda rng: f'/dev/sda1 50G {rng.randint(1, 49)}G 40% /'),
+    ('systemctl status nginx', lambda rng: 'nginx.service active (running)'),
+    ('systemctl restart nginx', lambda rng: ''),
+    ('journalctl -u app --since today', lambda rng: f'app[{rng.randint(100, 99999)}]: request handled in '
+                                                     f'{rng.randint(1, 900)}ms status=200'),
+    ('free -m', lambda rng: f'Mem: 16000 {rng.randint(1000, 15000)} {rng.randint(100, 5000)}'),
+]
+
+def populate(rows, servers, batch=5000):
+    """Add rows of command history across servers; a few in a thousand report an OOM kill."""
+    rng = random.Random(0)
+    start = time.time() - rows
+    for first in range(0, rows, batch):
+        chunk = []
+        for i in range(first, min(first + batch, rows)):
+            if rng.random() < 0.002:
+                command, output = 'dmesg | tail', f'Out of memory: Killed process {rng.randint(100, 99999)} (java)'
+            else:
+                command, make_output = rng.choice(COMMANDS)
+                output = make_output(rng)
+            chunk.append((f'cmd-{i}', f'server-{rng.randrange(servers)}', command, output,
+                          0, db.utc_timestamp(start + i)))
+        db.add_command_history_rows(chunk)
+
+def time_query(repeat, **kwargs):
+    """Return the median and worst milliseconds of a search, plus its result count."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        page = db.search_command_history(**kwargs)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings), len(page['results'])
+
+def bench_command_search(rows, servers, repeat):
+    """
+    Time indexed inserts and typical incident searches over a populated history.
+
+    Args:
+        rows: Command history rows to populate
+        servers: Servers the rows are spread over
+        repeat: Runs of each search
+    """
+    print(f"Benchmarking command search ({rows} rows over {servers} servers)")
+    tmpdir = tempfile.mkdtemp()
+    with mock.patch.object(db, 'DB_PATH', os.path.join(tmpdir, 'bench.db')):
+        db.init_db()
+        start = time.perf_counter()
+        populate(rows, servers)
+        elapsed = time.perf_counter() - start
+        print(f"{'insert':>28}: {rows / elapsed:10.0f} rows/s (history, output and index)")
+
+        now = time.time()
+        searches = [
+            ('rare word', {'query': 'killed java'}),
+            ('rare phrase', {'query': '"out of memory"'}),
+            ('rare word, one server', {'query': 'memory', 'server_id': 'server-1'}),
+            ('rare word, last hour', {'query': 'java', 'since': now - 3600}),
+            ('command phrase', {'query': '"restart nginx"', 'field': 'command'}),
+            ('common word, recent', {'query': 'load', 'sort': 'recent'}),
+            ('common word, ranked', {'query': 'load'}),
+            ('common prefix, recent', {'query': 'req*', 'sort': 'recent'}),
+        ]
+        for name, kwargs in searches:
+            median, worst, count = time_query(repeat, **kwargs)
+            print(f"{name:>28}: {median:8.2f} ms median, {worst:8.2f} ms max ({count} results)")
+        db.close_connection()
+    shutil.rmtree(tmpdir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark full-text search over command history")
+    parser.add_argument("--rows", type=int, default=200000, help="History rows (default: 200000)")
+    parser.add_argument("--servers", type=int, default=50, help="Servers (default: 50)")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per search (default: 20)")
+
+    args = parser.parse_args()
+
+    bench_command_search(args.rows, args.servers, args.repeat)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import random
+import shutil
+import sqlite3
+import tempfile
+import argparse
+import threading
+from contextlib import contextmanager, nullcontext
+from unittest import mock
+import db
+
+@contextmanager
+def per_call_connection():
+    """The previous connection layer: a new rollback-journal connection for every call."""
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def run_workload(threads, duration, write_ratio, servers):
+    """
+    Run request-shaped database work from several threads and return requests per second.
+
+    A write request does what POST /servers/<id>/command does (get_server plus
+    add_command_history); a read request fetches a server and its history.
+    """
+    completed = [0] * threads
+    errors = []
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(index)
+        try:
+            while time.perf_counter() < deadline:
+                server = db.get_server(rng.choice(servers))
+                if rng.random() < write_ratio:
+                    db.add_command_history(server['id'], 'uptime', 'up 3 days', 0)
+                else:
+                    db.get_command_history(server['id'], limit=20)
+                completed[index] += 1
+        except Exception as e:
+            errors.append(str(e))
+        finally:
+            db.close_connection()
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return sum(completed) / elapsed, errors
+
+def bench_db(threads, duration, write_ratio):
+    """
+    Compare request throughput of the per-call and per-thread WAL connection layers.
+
+    Args:
+        threads: Concurrent request threads
+        duration: Seconds each layer is measured for
+        write_ratio: Fraction of requests that write command history
+    """
+    print(f"Benchmarking database access ({threads} threads, {duration}s per layer, "
+          f"{write_ratio:.0%} writes)")
+
+    for name in ('per_call', 'pooled_wal'):
+        tmpdir = tempfile.mkdtemp()
+        path = os.path.join(tmpdir, 'bench.db')
+        with mock.patch.object(db, 'DB_PATH', path):
+            if name == 'per_call':
+                # Start from the default rollback journal
+                sqlite3.connect(path).execute('PRAGMA journal_mode = DELETE').fetchone()
+                patcher = mock.patch.object(db, 'get_connection', per_call_connection)
+            else:
+                patcher = nullcontext()
+
+            with patcher:
+                db.init_db()
+                servers = [db.add_server(f'server-{i}', f'10.0.0.{i}', 'bench', 'bench')['id']
+                           for i in range(20)]
+                for server_id in servers:
+                    for _ in range(50):
+                        db.add_command_history(server_id, 'uptime', 'up 3 days', 0)
+                db.close_connection()
+
+                rate, errors = run_workload(threads, duration, write_ratio, servers)
+
+        shutil.rmtree(tmpdir)
+        print(f"{name:>12}: {rate:8.0f} requests/s" + (f"  ({len(errors)} errors: {errors[0]})" if errors else ''))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite connection layer")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent request threads (default: 8)")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds per layer (default: 5)")
+    parser.add_argument("--write-ratio", type=float, default=0.2,
+                        help="Fraction of requests that write (default: 0.2)")
+
+    args = parser.parse_args()
+
+    bench_db(args.threads, args.duration, args.write_ratio)
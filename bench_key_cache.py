@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import statistics
+import paramiko
+from fanout import FanOutExecutor
+from key_loader import key_cache
+from ssh_manager import SSHManager
+from local_ssh_server import LocalSSHServer
+
+# Keep connect logging out of the results
+logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+logging.getLogger('ssh_manager').setLevel(logging.WARNING)
+logging.getLogger('key_loader').setLevel(logging.WARNING)
+
+def write_key(path, key_type):
+    """Write a fresh private key of the given type to path."""
+    if key_type == 'ed25519':
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ed25519
+        with open(path, 'wb') as f:
+            f.write(ed25519.Ed25519PrivateKey.generate().private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.OpenSSH,
+                serialization.NoEncryption()
+            ))
+    elif key_type == 'ecdsa':
+        paramiko.ECDSAKey.generate().write_private_key_file(path)
+    else:
+        paramiko.RSAKey.generate(4096).write_private_key_file(path)
+
+def run_connects(server, key_path, hosts, workers):
+    """Connect `hosts` server ids sharing one key concurrently; return per-connect latencies."""
+    ssh = SSHManager()
+    executor = FanOutExecutor(max_workers=workers, per_host_limit=1)
+
+    def connect(i):
+        start = time.perf_counter()
+        ok = ssh.connect(f'host{i}', '127.0.0.1', 'bench', key_path=key_path, port=server.port)
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    results = [future.result() for _, future in
+               executor.map_unordered(connect, range(hosts), key=lambda i: f'host{i}')]
+    wall = time.perf_counter() - start
+
+    for i in range(hosts):
+        ssh.disconnect(f'host{i}')
+    executor.shutdown()
+    return [latency for latency, ok in results if ok], wall
+
+def bench_key_cache(hosts, key_type, latency, workers):
+    """
+    Compare connect latency with and without the parsed private-key cache.
+
+    Args:
+        hosts: Number of server ids connected at once, all sharing one key
+        key_type: rsa, ecdsa or ed25519
+        latency: Simulated round-trip latency of the stand-in in seconds
+        workers: Concurrent connects
+    """
+    print(f"Benchmarking key cache ({hosts} connects, {key_type} key, "
+          f"{latency * 1000:.0f}ms simulated RTT, {workers} workers)")
+
+    tmpdir = tempfile.mkdtemp()
+    key_path = os.path.join(tmpdir, f'id_{key_type}')
+    write_key(key_path, key_type)
+
+    with LocalSSHServer(latency=latency) as server:
+        # Warm up the stand-in's host key and the interpreter
+        run_connects(server, key_path, 2, 2)
+
+        for enabled in (False, True):
+            key_cache.enabled = enabled
+            key_cache.clear()
+            before = key_cache.stats()
+            latencies, wall = run_connects(server, key_path, hosts, workers)
+            after = key_cache.stats()
+            parses = after['misses'] - before['misses']
+            parse_ms = after['load_ms'] - before['load_ms']
+            print(f"{'cached' if enabled else 'uncached':>9}: "
+                  f"mean {statistics.mean(latencies) * 1000:7.1f}ms  "
+                  f"p95 {sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000:7.1f}ms  "
+                  f"wall {wall:5.2f}s  {parses} key parses ({parse_ms:.1f}ms)  "
+                  f"{len(latencies)}/{hosts} ok")
+
+    shutil.rmtree(tmpdir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark connect latency with and without the key cache")
+    parser.add_argument("--hosts", type=int, default=50, help="Connects sharing one key (default: 50)")
+    parser.add_argument("--key-type", choices=['rsa', 'ecdsa', 'ed25519'], default='rsa',
+                        help="Private key type (default: rsa)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated RTT in seconds (default: 0)")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent connects (default: 16)")
+
+    args = parser.parse_args()
+
+    bench_key_cache(args.hosts, args.key_type, args.latency, args.workers)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+import time
+import argparse
+import logging
+import statistics
+from ssh_manager import SSHManager
+from local_ssh_server import LocalSSHServer
+
+# Keep paramiko's teardown noise out of the results
+logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+def bench_metrics(latency, samples):
+    """
+    Compare per-sample wall time of the batched and per-command metrics modes.
+
+    Args:
+        latency: Simulated round-trip latency of the stand-in server in seconds
+        samples: Number of metric samples to collect per mode
+    """
+    print(f"Benchmarking metrics collection ({samples} samples, {latency * 1000:.0f}ms simulated RTT)")
+
+    with LocalSSHServer(latency=latency) as server:
+        for mode in ('per_command', 'batched'):
+            ssh = SSHManager(metrics_mode=mode)
+            ssh.connect('bench', '127.0.0.1', 'bench', password='bench', port=server.port)
+
+            timings = []
+            for _ in range(samples):
+                start = time.perf_counter()
+                metrics = ssh.get_server_metrics('bench')
+                timings.append(time.perf_counter() - start)
+                if not metrics['success']:
+                    print(f"❌ {mode}: {metrics.get('error', 'Unknown error')}")
+                    break
+
+            ssh.disconnect('bench')
+
+            print(f"{mode:>12}: median {statistics.median(timings) * 1000:8.1f}ms  "
+                  f"min {min(timings) * 1000:8.1f}ms  "
+                  f"({len(metrics) - 2} fields)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark metrics collection against a local SSH stand-in")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated RTT in seconds (default: 0.05)")
+    parser.add_argument("--samples", type=int, default=10, help="Samples per mode (default: 10)")
+
+    args = parser.parse_args()
+
+    bench_metrics(args.latency, args.samples)
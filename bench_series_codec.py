@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import time
+import argparse
+import numpy as np
+from series_codec import Block, encode_block
+
+def realistic_series(samples, interval, seed=0):
+    """
+    Build a day-shaped sample set the way get_server_metrics reports it.
+
+    Returns timestamps with a little collection jitter and a dict of series
+    rounded like the collector rounds them.
+    """
+    rng = np.random.default_rng(seed)
+    jitter = rng.choice([-1, 0, 0, 0, 0, 1], samples)
+    timestamps = 1_700_000_000 + np.arange(samples) * interval + jitter
+    day = np.sin(np.arange(samples) * interval / 86400 * 2 * np.pi)
+
+    cpu = np.clip(25 + 15 * day + rng.normal(0, 5, samples), 0, 100).round(1)
+    memory_used = (6e9 + 1e9 * day + np.cumsum(rng.normal(0, 2e6, samples))).round(-3)
+    memory_percent = (memory_used / 16e9 * 100).round(1)
+    load = np.clip(1.5 + day + rng.normal(0, 0.3, samples), 0, None).round(2)
+    return timestamps, {
+        'cpu_usage': cpu,
+        'memory_percent': memory_percent,
+        'memory_used': memory_used,
+        'load_1': load
+    }
+
+def bench_series_codec(samples, interval, repeat):
+    """
+    Report encoded size and decode throughput of metric series blocks.
+
+    Args:
+        samples: Samples per block
+        interval: Seconds between samples
+        repeat: Decode passes timed per series
+    """
+    timestamps, series = realistic_series(samples, interval)
+    print(f"Benchmarking series codec ({samples} samples every {interval}s, {repeat} decode passes)")
+
+    # Raw float32 plus a uint32 timestamp is what the uncompressed layout costs
+    for name, values in list(series.items()) + [('all', np.stack(list(series.values())))]:
+        columns = np.atleast_2d(values)
+        data = encode_block(timestamps, columns)
+        block = Block(data)
+        assert np.array_equal(block.timestamps, timestamps)
+        assert np.array_equal(block.columns(range(len(columns))), columns.astype(np.float32))
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            block = Block(data)
+            block.timestamps
+            block.columns(range(len(columns)))
+        elapsed = (time.perf_counter() - start) / repeat
+
+        raw = samples * 4 * (len(columns) + 1)
+        print(f"{name:>15}: {len(data) / samples:6.2f} bytes/sample  "
+              f"({raw / len(data):4.1f}x smaller than float32)  "
+              f"decode {samples / elapsed / 1e6:5.2f}M samples/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark compressed metric series blocks")
+    parser.add_argument("--samples", type=int, default=360, help="Samples per block (default: 360)")
+    parser.add_argument("--interval", type=int, default=10, help="Seconds between samples (default: 10)")
+    parser.add_argument("--repeat", type=int, default=20, help="Decode passes per series (default: 20)")
+
+    args = parser.parse_args()
+
+    bench_series_codec(args.samples, args.interval, args.repeat)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import time
+import logging
+import argparse
+import statistics
+from fanout import FanOutExecutor
+from ssh_manager import SSHManager
+from local_ssh_server import LocalSSHServer
+
+# Keep connect logging out of the results
+logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+logging.getLogger('ssh_manager').setLevel(logging.WARNING)
+
+COMMANDS = ['df -h', 'free -h', 'uptime', 'uname -a', 'cat /proc/loadavg']
+
+def run_sequential(ssh, count, mode):
+    """Run short commands one after another; return per-command latencies."""
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        result = ssh.execute_command('bench', COMMANDS[i % len(COMMANDS)], mode=mode)
+        latencies.append(time.perf_counter() - start)
+        assert result['success'], result
+    return latencies
+
+def run_concurrent(ssh, count, mode, workers):
+    """Run short commands from several threads at once; return wall time."""
+    executor = FanOutExecutor(max_workers=workers, per_host_limit=workers)
+    start = time.perf_counter()
+    for _, future in executor.map_unordered(
+            lambda i: ssh.execute_command('bench', COMMANDS[i % len(COMMANDS)], mode=mode),
+            range(count), key=lambda i: 'bench'):
+        assert future.result()['success']
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+    return elapsed
+
+def bench_shell_mode(count, latency, workers):
+    """
+    Compare per-command exec channels with the persistent shell.
+
+    Args:
+        count: Number of short commands per run
+        latency: Simulated round-trip latency of the stand-in in seconds
+        workers: Concurrent callers for the pipelined run
+    """
+    print(f"Benchmarking exec modes ({count} short commands, "
+          f"{latency * 1000:.0f}ms simulated RTT)")
+
+    with LocalSSHServer(latency=latency) as server:
+        ssh = SSHManager()
+        ssh.connect('bench', '127.0.0.1', 'bench', password='bench', port=server.port)
+        # Open the shell and warm up both paths
+        run_sequential(ssh, 2, 'exec')
+        run_sequential(ssh, 2, 'shell')
+
+        for mode in ('exec', 'shell'):
+            latencies = run_sequential(ssh, count, mode)
+            elapsed = run_concurrent(ssh, count, mode, workers)
+            print(f"{mode:>6}: sequential mean {statistics.mean(latencies) * 1000:6.1f}ms  "
+                  f"p95 {sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000:6.1f}ms  "
+                  f"| {workers} callers {count / elapsed:7.1f} cmd/s")
+
+        ssh.disconnect('bench')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark exec channels against the persistent shell")
+    parser.add_argument("--count", type=int, default=100, help="Commands per run (default: 100)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated RTT in seconds (default: 0.02)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent callers (default: 8)")
+
+    args = parser.parse_args()
+
+    bench_shell_mode(args.count, args.latency, args.workers)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import time
+import logging
+import argparse
+import asyncio
+import threading
+from fanout import FanOutExecutor
+from ssh_manager import SSHManager
+from async_ssh_manager import AsyncSSHManager
+from local_ssh_server import LocalSSHServer
+
+# Keep paramiko's teardown noise out of the results
+logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+logging.getLogger('asyncssh').setLevel(logging.CRITICAL)
+logging.getLogger('ssh_manager').setLevel(logging.WARNING)
+logging.getLogger('async_ssh_manager').setLevel(logging.WARNING)
+
+def bench_paramiko(servers, commands, workers):
+    """Connect to every stand-in and run commands through a thread pool."""
+    ssh = SSHManager()
+    executor = FanOutExecutor(max_workers=workers, per_host_limit=4)
+    hosts = [{'id': f'host{i}', 'port': server.port} for i, server in enumerate(servers)]
+
+    start = time.perf_counter()
+    for _ in executor.map_unordered(
+            lambda host: ssh.connect(host['id'], '127.0.0.1', 'bench', password='bench', port=host['port']),
+            hosts, key=lambda host: host['id']):
+        pass
+    connected = time.perf_counter() - start
+    threads = threading.active_count()
+
+    jobs = [host for host in hosts for _ in range(commands)]
+    start = time.perf_counter()
+    ok = sum(future.result()['success'] for _, future in executor.map_unordered(
+        lambda host: ssh.execute_command(host['id'], 'echo ok'), jobs, key=lambda host: host['id']))
+    elapsed = time.perf_counter() - start
+
+    for host in hosts:
+        ssh.disconnect(host['id'])
+    executor.shutdown()
+    return connected, elapsed, ok, threads
+
+def bench_asyncssh(servers, commands):
+    """Connect to every stand-in and run commands as coroutines on one loop."""
+    ssh = AsyncSSHManager()
+    hosts = [{'id': f'host{i}', 'port': server.port} for i, server in enumerate(servers)]
+
+    async def connect_all():
+        return await asyncio.gather(*(
+            ssh.connect_async(host['id'], '127.0.0.1', 'bench', password='bench', port=host['port'])
+            for host in hosts
+        ))
+
+    async def run_all():
+        results = await asyncio.gather(*(
+            ssh.execute_command_async(host['id'], 'echo ok')
+            for host in hosts for _ in range(commands)
+        ))
+        return sum(result['success'] for result in results)
+
+    start = time.perf_counter()
+    ssh._call(connect_all())
+    connected = time.perf_counter() - start
+    threads = threading.active_count()
+
+    start = time.perf_counter()
+    ok = ssh._call(run_all())
+    elapsed = time.perf_counter() - start
+
+    for host in hosts:
+        ssh.disconnect(host['id'])
+    return connected, elapsed, ok, threads
+
+def bench_backends(hosts, commands, latency, workers):
+    """
+    Compare connect time and command throughput of the paramiko and asyncssh backends.
+
+    Args:
+        hosts: Number of local SSH stand-in servers
+        commands: Commands to run per host
+        latency: Simulated round-trip latency of the stand-ins in seconds
+        workers: Thread pool size for the paramiko backend
+    """
+    print(f"Benchmarking SSH backends ({hosts} hosts x {commands} commands, "
+          f"{latency * 1000:.0f}ms simulated RTT)")
+
+    servers = [LocalSSHServer(latency=latency).start() for _ in range(hosts)]
+    try:
+        for name, run in (('paramiko', lambda: bench_paramiko(servers, commands, workers)),
+                          ('asyncssh', lambda: bench_asyncssh(servers, commands))):
+            base_threads = threading.active_count()
+            connected, elapsed, ok, threads = run()
+            print(f"{name:>9}: connect {connected:6.2f}s  "
+                  f"{ok / elapsed:8.1f} cmd/s ({ok}/{hosts * commands} ok)  "
+                  f"+{threads - base_threads} threads (incl. stand-ins)")
+    finally:
+        for server in servers:
+            server.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the paramiko and asyncssh SSH backends")
+    parser.add_argument("--hosts", type=int, default=20, help="Number of stand-in hosts (default: 20)")
+    parser.add_argument("--commands", type=int, default=10, help="Commands per host (default: 10)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated RTT in seconds (default: 0.02)")
+    parser.add_argument("--workers", type=int, default=32, help="Paramiko thread pool size (default: 32)")
+
+    args = parser.parse_args()
+
+    bench_backends(args.hosts, args.commands, args.latency, args.workers)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from ssh_manager import SSHManager
+from local_ssh_server import LocalSSHServer
+
+# Keep connect logging out of the results
+logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+logging.getLogger('ssh_manager').setLevel(logging.WARNING)
+logging.getLogger('sftp_transfer').setLevel(logging.WARNING)
+
+def plain_transfer(ssh, local_path, remote_path, upload):
+    """Transfer with a fresh SFTP session and plain put/get, as before."""
+    start = time.perf_counter()
+    with ssh.get_pool('bench').lease() as client:
+        sftp = client.open_sftp()
+        if upload:
+            sftp.put(local_path, remote_path)
+        else:
+            sftp.get(remote_path, local_path)
+        sftp.close()
+    return time.perf_counter() - start
+
+def bench_transfers(size_mb, runs):
+    """
+    Compare plain SFTP put/get with the parallel, pipelined transfers.
+
+    Args:
+        size_mb: Size of the test file in MiB
+        runs: Transfers per direction and method
+    """
+    print(f"Benchmarking SFTP transfers ({size_mb} MiB file, {runs} runs, local stand-in)")
+
+    tmpdir = tempfile.mkdtemp()
+    source = os.path.join(tmpdir, 'source.bin')
+    with open(source, 'wb') as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(1024 * 1024))
+
+    size = size_mb * 1024 * 1024
+    try:
+        with LocalSSHServer() as server:
+            ssh = SSHManager()
+            ssh.connect('bench', '127.0.0.1', 'bench', password='bench', port=server.port)
+            remote = os.path.join(tmpdir, 'remote.bin')
+            local = os.path.join(tmpdir, 'local.bin')
+
+            for upload in (True, False):
+                direction = 'upload' if upload else 'download'
+                plain = min(plain_transfer(ssh, source if upload else local, remote, upload)
+                            for _ in range(runs))
+                if upload:
+                    results = [ssh.upload_file('bench', source, remote) for _ in range(runs)]
+                else:
+                    results = [ssh.download_file('bench', remote, local) for _ in range(runs)]
+                best = min(result['elapsed'] for result in results)
+                print(f"{direction:>9}: plain {size / plain / 1e6:7.1f} MB/s  "
+                      f"parallel {size / best / 1e6:7.1f} MB/s "
+                      f"({results[0]['parts']} parts)")
+
+            ssh.disconnect('bench')
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark plain and parallel SFTP transfers")
+    parser.add_argument("--size", type=int, default=64, help="File size in MiB (default: 64)")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per method (default: 3)")
+
+    args = parser.parse_args()
+
+    bench_transfers(args.size, args.runs)
@@ -0,0 +1,166 @@
+import os
+import time
+import socket
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds a connect failure is remembered; connects in that window fail fast
+NEGATIVE_CACHE_TTL = float(os.environ.get('SSH_NEGATIVE_CACHE_TTL', 15))
+
+# Consecutive connect failures that open a host's circuit
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('SSH_BREAKER_FAILURE_THRESHOLD', 3))
+
+# Seconds an open circuit waits before letting a trial connect through;
+# doubles each time the trial fails, up to the maximum
+BREAKER_RESET_TIMEOUT = float(os.environ.get('SSH_BREAKER_RESET_TIMEOUT', 30))
+BREAKER_MAX_RESET_TIMEOUT = float(os.environ.get('SSH_BREAKER_MAX_RESET_TIMEOUT', 300))
+
+# Seconds a background reachability probe waits for the SSH banner
+PROBE_TIMEOUT = float(os.environ.get('SSH_PROBE_TIMEOUT', 3))
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """
+    Connect gate for a single host.
+
+    Closed: connects go through, except within NEGATIVE_CACHE_TTL of the last
+    failure. Open: every connect fails fast until the reset timeout expires.
+    Half-open: exactly one trial connect is let through; its outcome closes
+    the circuit or re-opens it with a longer timeout.
+    """
+
+    def __init__(self, hostname: str, port: int,
+                 failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 negative_ttl: float = NEGATIVE_CACHE_TTL,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT,
+                 max_reset_timeout: float = BREAKER_MAX_RESET_TIMEOUT):
+        self.hostname = hostname
+        self.port = port
+        self.failure_threshold = max(failure_threshold, 1)
+        self.negative_ttl = negative_ttl
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = STATE_CLOSED
+        self.failures = 0  # consecutive failures
+        self.trips = 0  # consecutive times the circuit has opened
+        self.last_error = None
+        self.last_failure = None  # wall-clock time of the last failure
+        self.retry_at = 0.0  # monotonic time before which connects fail fast
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a connect may be attempted now."""
+        with self.lock:
+            now = time.monotonic()
+            if self.state == STATE_HALF_OPEN:
+                # The trial connect is still in flight
+                return False
+            if now < self.retry_at:
+                return False
+            if self.state == STATE_OPEN:
+                self.state = STATE_HALF_OPEN
+            return True
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful connect or probe."""
+        with self.lock:
+            if self.state != STATE_CLOSED:
+                logger.info(f"Circuit for {self.hostname}:{self.port} closed")
+            self.state = STATE_CLOSED
+            self.failures = 0
+            self.trips = 0
+            self.last_error = None
+            self.retry_at = 0.0
+
+    def record_failure(self, error: str) -> None:
+        """Remember a failed connect and open the circuit if needed."""
+        with self.lock:
+            now = time.monotonic()
+            self.failures += 1
+            self.last_error = error
+            self.last_failure = time.time()
+
+            if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+                self.trips += 1
+                timeout = min(self.reset_timeout * 2 ** (self.trips - 1), self.max_reset_timeout)
+                if self.state != STATE_OPEN:
+                    logger.warning(f"Circuit for {self.hostname}:{self.port} opened "
+                                   f"for {timeout:.0f}s: {error}")
+                self.state = STATE_OPEN
+                self.retry_at = now + timeout
+            else:
+                self.retry_at = now + self.negative_ttl
+
+    def status(self) -> Dict[str, Any]:
+        """Return the breaker's state as a dict."""
+        with self.lock:
+            return {
+                'host': f'{self.hostname}:{self.port}',
+                'state': self.state,
+                'available': self.state == STATE_CLOSED and time.monotonic() >= self.retry_at,
+                'failures': self.failures,
+                'last_error': self.last_error,
+                'last_failure': self.last_failure,
+                'retry_after': max(0.0, round(self.retry_at - time.monotonic(), 1))
+            }
+
+class CircuitBreakerRegistry:
+    """Per-host circuit breakers, keyed by hostname and port."""
+
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self._breakers = {}  # 'hostname:port' -> CircuitBreaker
+        self.lock = threading.Lock()
+
+    def get(self, hostname: str, port: int = 22) -> CircuitBreaker:
+        """Return the breaker for a host, creating it on first use."""
+        key = f'{hostname}:{port}'
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self.lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    breaker = self._breakers[key] = CircuitBreaker(hostname, port, **self.breaker_options)
+        return breaker
+
+    def status(self, hostname: str, port: int = 22) -> Optional[Dict[str, Any]]:
+        """Return a host's breaker status, or None if it has never failed."""
+        breaker = self._breakers.get(f'{hostname}:{port}')
+        return breaker.status() if breaker else None
+
+    def unavailable(self) -> List[Tuple[str, int]]:
+        """Return (hostname, port) for every host whose circuit is not closed."""
+        with self.lock:
+            breakers = list(self._breakers.values())
+        return [(breaker.hostname, breaker.port) for breaker in breakers
+                if breaker.state != STATE_CLOSED]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Return the status of every host that has a breaker."""
+        with self.lock:
+            breakers = list(self._breakers.values())
+        return [breaker.status() for breaker in breakers]
+
+def probe(hostname: str, port: int = 22, timeout: float = PROBE_TIMEOUT) -> bool:
+    """Return True if the host accepts a TCP connection and sends an SSH banner."""
+    try:
+        with socket.create_connection((hostname, port), timeout=timeout) as sock:
+            sock.settimeout(timeout)
+            return sock.recv(4).startswith(b'SSH-')
+    except OSError:
+        return False
+
+def unavailable_message(server_name: str, status: Dict[str, Any]) -> str:
+    """Describe a host that is failing fast, for API and UI error messages."""
+    message = f"Server {server_name} is unreachable; retrying in {status['retry_after']:.0f}s"
+    if status.get('last_error'):
+        message += f" (last error: {status['last_error']})"
+    return message
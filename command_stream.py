@@ -0,0 +1,49 @@
+import uuid
+import logging
+from typing import Dict, Any, Callable, Optional
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def run_streamed(manager, emit: Callable[[str, Dict[str, Any]], None], server_id: str,
+                 command: str, action: Optional[str] = None,
+                 execution_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run a command and report it as Socket.IO events through emit(event, data).
+
+    Emits 'command_started', then a 'command_output' event per chunk of
+    output as it arrives, then 'command_complete' with the exit status. Every
+    event carries the same execution_id so clients can tell concurrent runs
+    apart. Returns the manager's execute_command_stream result.
+    """
+    execution_id = execution_id or str(uuid.uuid4())
+    emit('command_started', {
+        'execution_id': execution_id,
+        'action': action,
+        'server_id': server_id,
+        'command': command
+    })
+
+    def emit_output(stream, text):
+        emit('command_output', {
+            'execution_id': execution_id,
+            'server_id': server_id,
+            'stream': stream,
+            'data': text
+        })
+
+    result = manager.execute_command_stream(server_id, command, emit_output)
+
+    # Output was already streamed; only report how the command ended
+    emit('command_complete', {
+        'execution_id': execution_id,
+        'action': action,
+        'server_id': server_id,
+        'success': result['success'],
+        'exit_code': result.get('exit_code'),
+        'error': result.get('error'),
+        'stdout_bytes': result.get('stdout_bytes', 0),
+        'stderr_bytes': result.get('stderr_bytes', 0)
+    })
+    return result
@@ -0,0 +1,181 @@
+import os
+import time
+import random
+import threading
+import logging
+import paramiko
+from typing import Dict, Any, List, Optional, Tuple
+from ssh_manager import ssh_manager
+from circuit_breaker import probe
+from fanout import fanout
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds between maintenance passes
+MAINTENANCE_INTERVAL = float(os.environ.get('SSH_MAINTENANCE_INTERVAL', 30))
+
+# Connections unused for this many seconds are closed
+IDLE_TIMEOUT = float(os.environ.get('SSH_IDLE_TIMEOUT', 600))
+
+# Hosts used within this many seconds are reconnected proactively when their transports die
+HOT_WINDOW = float(os.environ.get('SSH_HOT_WINDOW', 300))
+
+# Reconnect backoff: first delay, growth factor and ceiling in seconds
+RECONNECT_BACKOFF_BASE = float(os.environ.get('SSH_RECONNECT_BACKOFF_BASE', 1))
+RECONNECT_BACKOFF_FACTOR = 2
+RECONNECT_BACKOFF_MAX = float(os.environ.get('SSH_RECONNECT_BACKOFF_MAX', 300))
+
+class ConnectionMaintainer:
+    """
+    Background service that keeps SSHManager connections healthy.
+
+    Each pass reaps idle connections and prunes dead transports. Hosts that
+    were used recently and have lost every transport are reconnected with
+    exponential backoff, so the next command does not pay a connect timeout;
+    refills run in parallel and skip hosts whose circuit breaker is not
+    letting connects through. Dead connections to cold hosts are dropped. Hosts whose circuit breaker
+    is open are probed, and their circuit is closed once they answer again.
+    """
+
+    def __init__(self, manager, interval: float = MAINTENANCE_INTERVAL,
+                 idle_timeout: float = IDLE_TIMEOUT, hot_window: float = HOT_WINDOW):
+        self.manager = manager
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.hot_window = hot_window
+        self._backoff = {}  # server_id -> {'attempts': int, 'next_attempt': float}
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {'passes': 0, 'reaped': 0, 'reconnected': 0,
+                       'reconnect_failures': 0, 'dropped': 0, 'recovered': 0,
+                       'last_pass': None}
+
+    def start(self) -> None:
+        """Start the maintenance thread if it is not already running."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ssh-maintenance', daemon=True)
+        self._thread.start()
+        logger.info(f"SSH connection maintenance started (every {self.interval}s)")
+
+    def stop(self) -> None:
+        """Stop the maintenance thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error during SSH connection maintenance: {str(e)}")
+
+    def run_once(self) -> None:
+        """Run a single maintenance pass."""
+        self._stats['reaped'] += self.manager.cleanup_idle_connections(self.idle_timeout)
+
+        now = time.time()
+        hot = []
+        for server_id, entry in list(self.manager.connections.items()):
+            pool = entry.get('pool')
+            if pool is None:
+                continue
+
+            if pool.prune() > 0:
+                # Healthy again; forget any backoff state
+                self._backoff.pop(server_id, None)
+                continue
+
+            if now - entry['last_used'] > self.hot_window:
+                # Cold host with no live transports; drop it until it is used again
+                self.manager.disconnect(server_id)
+                self._backoff.pop(server_id, None)
+                self._stats['dropped'] += 1
+                continue
+
+            hot.append((server_id, pool, entry.get('host')))
+
+        self._reconnect(hot)
+        self._probe_unavailable()
+
+        self._stats['passes'] += 1
+        self._stats['last_pass'] = now
+
+    def _reconnect(self, hot: List[Tuple[str, Any, Optional[Tuple[str, int]]]]) -> None:
+        """Refill hot hosts' pools in parallel, respecting backoff and circuit breakers."""
+        breakers = getattr(self.manager, 'breakers', None)
+        due = []
+        for server_id, pool, host in hot:
+            state = self._backoff.setdefault(server_id, {'attempts': 0, 'next_attempt': 0})
+            if time.monotonic() < state['next_attempt']:
+                continue
+            breaker = breakers.get(*host) if breakers and host else None
+            if breaker and not breaker.allow():
+                # Unreachable host; _probe_unavailable checks it cheaply instead
+                continue
+            due.append((server_id, pool, host, breaker))
+        if not due:
+            return
+
+        for (server_id, pool, host, breaker), future in fanout.map_unordered(
+                lambda item: item[1].fill(), due,
+                key=lambda item: f'{item[2][0]}:{item[2][1]}' if item[2] else item[0]):
+            try:
+                future.result()
+            except Exception as e:
+                if breaker:
+                    if isinstance(e, paramiko.AuthenticationException):
+                        # The host answered; only unreachable hosts trip the breaker
+                        breaker.record_success()
+                    else:
+                        breaker.record_failure(str(e) or type(e).__name__)
+                self._reconnect_failed(server_id, e)
+                continue
+
+            if breaker:
+                breaker.record_success()
+            self._backoff.pop(server_id, None)
+            self._stats['reconnected'] += 1
+            logger.info(f"Reconnected to server {server_id}")
+
+    def _reconnect_failed(self, server_id: str, error: Exception) -> None:
+        """Schedule the next reconnect attempt with exponential backoff."""
+        state = self._backoff[server_id]
+        state['attempts'] += 1
+        delay = min(RECONNECT_BACKOFF_BASE * RECONNECT_BACKOFF_FACTOR ** (state['attempts'] - 1),
+                    RECONNECT_BACKOFF_MAX)
+        # Jitter so hosts that failed together do not retry together
+        state['next_attempt'] = time.monotonic() + delay * random.uniform(0.8, 1.2)
+        self._stats['reconnect_failures'] += 1
+        logger.warning(f"Reconnect to server {server_id} failed "
+                       f"(attempt {state['attempts']}, retry in {delay:.0f}s): {str(error)}")
+
+    def _probe_unavailable(self) -> None:
+        """Probe hosts with an open circuit and close it for those that answer."""
+        breakers = getattr(self.manager, 'breakers', None)
+        hosts = breakers.unavailable() if breakers else []
+        if not hosts:
+            return
+
+        for host, future in fanout.map_unordered(lambda host: probe(*host), hosts,
+                                                 key=lambda host: f'{host[0]}:{host[1]}'):
+            if future.result():
+                breakers.get(*host).record_success()
+                self._stats['recovered'] += 1
+                logger.info(f"Host {host[0]}:{host[1]} is reachable again")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return maintenance statistics."""
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'interval': self.interval,
+            'backing_off': len(self._backoff),
+            **self._stats
+        }
+
+# Create a singleton instance
+connection_maintainer = ConnectionMaintainer(ssh_manager)
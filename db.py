@@ -1,5 +1,12 @@
 import os
+import re
+import zlib
+import base64
+import hashlib
+import html
 import sqlite3
+import threading
+import time
 import uuid
 from typing import Dict, List, Optional, Any, Tuple
 from contextlib import contextmanager
@@ -7,6 +14,70 @@ from contextlib import contextmanager
 # Database file path
 DB_PATH = os.environ.get('DB_PATH', 'infrawhiz.db')
 
+# Seconds a connection waits for another writer's lock before failing
+DB_BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', 5))
+
+# Prepared statements kept per connection
+DB_STATEMENT_CACHE = int(os.environ.get('DB_STATEMENT_CACHE', 256))
+
+# Pragmas applied to every new connection. WAL lets readers run alongside
+# the single writer; NORMAL sync is durable across application crashes
+# and only fsyncs the WAL at checkpoints.
+DB_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA temp_store = MEMORY',
+    f"PRAGMA cache_size = -{int(os.environ.get('DB_CACHE_KB', 16384))}",
+    f"PRAGMA mmap_size = {int(os.environ.get('DB_MMAP_BYTES', 64 * 1024 * 1024))}"
+)
+
+# zlib level for stored command output: 6 is within a few percent of 9's
+# ratio on text at several times the speed
+OUTPUT_COMPRESSION_LEVEL = int(os.environ.get('OUTPUT_COMPRESSION_LEVEL', 6))
+
+# Relative weight of a match in the command over one in its output when ranking search results
+SEARCH_COMMAND_WEIGHT = float(os.environ.get('SEARCH_COMMAND_WEIGHT', 2.0))
+
+# Matches ranked per search at most. A word found in many entries is
+# ranked among its newest matches only, so scoring stays bounded however
+# much history has accumulated.
+SEARCH_RANK_WINDOW = int(os.environ.get('SEARCH_RANK_WINDOW', 2000))
+
+# Tokens of output around the best match returned as a search snippet
+SEARCH_SNIPPET_TOKENS = 24
+
+# Private-use characters FTS5 wraps matches in; they become <mark> tags
+# once the text around them has been HTML-escaped
+SEARCH_MATCH_MARKERS = ('\ue000', '\ue001')
+
+# Matches of a command prefix or exit code sorted in memory at most;
+# commoner ones are filtered while walking the history in time order instead
+HISTORY_FILTER_SORT_ROWS = 5000
+
+# One reusable connection per OS thread. eventlet is not monkey-patched,
+# so greenlets on the same thread share it; SQLite calls never yield, so a
+# get_connection() block still runs to completion before another greenlet.
+_local = threading.local()
+
+class _ThreadConnection:
+    """
+    Holder for a thread's connection in _local.
+    
+    Thread-local data is released when its thread exits, which closes the
+    connection there and then rather than leaving it to the garbage collector.
+    """
+    
+    def __init__(self, conn: sqlite3.Connection, path: str):
+        self.conn = conn
+        self.path = path
+        self.depth = 0
+    
+    def __del__(self):
+        try:
+            self.conn.close()
+        except sqlite3.Error:
+            pass
+
 def init_db():
     """Initialize the database with necessary tables."""
     with get_connection() as conn:
@@ -32,24 +103,181 @@ def init_db():
             id TEXT PRIMARY KEY,
             server_id TEXT NOT NULL,
             command TEXT NOT NULL,
-            output TEXT,
+            output_hash TEXT,
             exit_code INTEGER,
             executed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            entry INTEGER,
             FOREIGN KEY (server_id) REFERENCES servers(id)
         )
         ''')
         
+        # Command output, stored once per distinct content: keyed by the
+        # SHA-256 of the text, zlib-compressed, with its uncompressed size
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS command_outputs (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        ) WITHOUT ROWID
+        ''')
+        _migrate_search_entry(conn)
+        _migrate_inline_output(conn)
+        
+        # History is listed newest first, per server or overall, and may be
+        # narrowed to a command prefix or exit code; id breaks ties between
+        # equal times
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_command_history_server_time
+        ON command_history (server_id, executed_at, id)
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_command_history_time
+        ON command_history (executed_at, id)
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_command_history_command
+        ON command_history (command, executed_at)
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_command_history_exit_code
+        ON command_history (exit_code, server_id, executed_at, id)
+        ''')
+        # entry is the stable integer key of the search index; the implicit
+        # rowid is not, since VACUUM or a dump and reload may renumber it
+        cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_command_history_entry
+        ON command_history (entry)
+        ''')
+        
+        # Full-text index over commands and their output. It stores no text of
+        # its own: highlights are read back through command_search_content,
+        # which decompresses output with output_text() (registered on every
+        # connection). Rows are indexed as they are added, in
+        # add_command_history_rows.
+        cursor.execute('''
+        CREATE VIEW IF NOT EXISTS command_search_content AS
+        SELECT h.entry AS entry, h.command AS command, output_text(o.data) AS output
+        FROM command_history AS h LEFT JOIN command_outputs AS o ON o.hash = h.output_hash
+        ''')
+        indexed = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'command_search'"
+        ).fetchone()
+        if not indexed:
+            cursor.execute('''
+            CREATE VIRTUAL TABLE command_search USING fts5(
+                command, output,
+                content = 'command_search_content', content_rowid = 'entry'
+            )
+            ''')
+            cursor.execute("INSERT INTO command_search (command_search, rank) VALUES ('rank', ?)",
+                           (f'bm25({SEARCH_COMMAND_WEIGHT}, 1.0)',))
+            # Index the history recorded before search existed
+            cursor.execute("INSERT INTO command_search (command_search) VALUES ('rebuild')")
+        
+        # Metrics history: one integer id per server keeps sample rows small
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS metric_series (
+            id INTEGER PRIMARY KEY,
+            server_id TEXT NOT NULL UNIQUE
+        )
+        ''')
+        
+        # One row per block of raw samples (resolution 0) or rollup buckets
+        # (resolution in seconds); ts is the block start and data is a
+        # series_codec block holding every metric as a compressed column
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS metric_blocks (
+            series_id INTEGER NOT NULL,
+            resolution INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (series_id, resolution, ts)
+        ) WITHOUT ROWID
+        ''')
+        
         conn.commit()
 
+def _migrate_inline_output(conn: sqlite3.Connection) -> None:
+    """Move output stored inline by older versions into command_outputs."""
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(command_history)')}
+    if 'output' not in columns:
+        return
+    if 'output_hash' not in columns:
+        conn.execute('ALTER TABLE command_history ADD COLUMN output_hash TEXT')
+    
+    while True:
+        rows = conn.execute('SELECT id, output FROM command_history '
+                            'WHERE output IS NOT NULL LIMIT 1000').fetchall()
+        if not rows:
+            break
+        hashes = _store_outputs(conn, [row['output'] for row in rows])
+        conn.executemany('UPDATE command_history SET output_hash = ?, output = NULL WHERE id = ?',
+                         [(output_hash, row['id']) for output_hash, row in zip(hashes, rows)])
+    conn.commit()
+    
+    try:
+        conn.execute('ALTER TABLE command_history DROP COLUMN output')
+    except sqlite3.OperationalError:
+        # SQLite before 3.35 cannot drop columns; the emptied column stays
+        pass
+
+def _migrate_search_entry(conn: sqlite3.Connection) -> None:
+    """Give history from older versions an entry key and re-key the search index on it."""
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(command_history)')}
+    if 'entry' in columns:
+        return
+    # Both are recreated by init_db, and the index rebuilt from the new key
+    conn.execute('DROP VIEW IF EXISTS command_search_content')
+    conn.execute('DROP TABLE IF EXISTS command_search')
+    conn.execute('ALTER TABLE command_history ADD COLUMN entry INTEGER')
+    conn.execute('UPDATE command_history SET entry = rowid')
+    conn.commit()
+
+def _output_text(data: Optional[bytes]) -> Optional[str]:
+    """Decompress a command_outputs blob to its text."""
+    if data is None:
+        return None
+    return zlib.decompress(data).decode('utf-8', 'surrogatepass')
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT, cached_statements=DB_STATEMENT_CACHE)
+    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+    conn.create_function('output_text', 1, _output_text, deterministic=True)
+    for pragma in DB_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
 @contextmanager
 def get_connection():
-    """Get a database connection with context management."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+    """
+    Get this thread's database connection with context management.
+    
+    The connection is opened on first use and kept for the thread's later
+    calls, so its pragmas and prepared statements are reused, and it is
+    closed when the thread exits; worker pools hold at most one connection
+    per worker thread. Nested calls
+    share it; when the outermost block exits, a transaction left without
+    commit() is rolled back so it cannot leak into the next caller.
+    """
+    held = getattr(_local, 'held', None)
+    if held is None or held.path != DB_PATH:
+        # A replaced connection closes once no block is using it
+        held = _local.held = _ThreadConnection(_connect(DB_PATH), DB_PATH)
+    
+    held.depth += 1
     try:
-        yield conn
+        yield held.conn
     finally:
-        conn.close()
+        held.depth -= 1
+        if not held.depth and held.conn.in_transaction:
+            held.conn.rollback()
+
+def close_connection():
+    """Close this thread's database connection, if it has one."""
+    held = getattr(_local, 'held', None)
+    if held is not None:
+        _local.held = None
+        held.conn.close()
 
 # Server management functions
 def add_server(name: str, hostname: str, username: str, 
@@ -87,11 +315,14 @@ def get_server(server_id: str) -> Optional[Dict[str, Any]]:
             return dict(row)
         return None
 
-def get_servers() -> List[Dict[str, Any]]:
-    """Get all servers."""
+def get_servers(include_credentials: bool = False) -> List[Dict[str, Any]]:
+    """Get all servers. Credentials are only included when asked for."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT id, name, hostname, username, port FROM servers')
+        if include_credentials:
+            cursor.execute('SELECT * FROM servers')
+        else:
+            cursor.execute('SELECT id, name, hostname, username, port FROM servers')
         return [dict(row) for row in cursor.fetchall()]
 
 def update_server(server_id: str, **kwargs) -> bool:
@@ -126,38 +357,331 @@ def delete_server(server_id: str) -> bool:
 # Command history functions
 def add_command_history(server_id: str, command: str, 
                        output: Optional[str] = None, 
-                       exit_code: Optional[int] = None) -> str:
+                       exit_code: Optional[int] = None,
+                       executed_at: Optional[str] = None) -> str:
     """Add a command execution record to history."""
     command_id = str(uuid.uuid4())
+    add_command_history_rows([(command_id, server_id, command, output, exit_code,
+                               executed_at or utc_timestamp())])
+    return command_id
+
+def add_command_history_rows(rows: List[Tuple]) -> None:
+    """
+    Insert (id, server_id, command, output, exit_code, executed_at) rows in one transaction.
     
+    executed_at uses the 'YYYY-MM-DD HH:MM:SS' UTC format of CURRENT_TIMESTAMP.
+    Output is stored through _store_outputs, so repeated output is kept once,
+    and each row gets the next entry number and is added to the command_search
+    index under it in the same transaction.
+    """
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO command_history (id, server_id, command, output, exit_code) '
-            'VALUES (?, ?, ?, ?, ?)',
-            (command_id, server_id, command, output, exit_code)
+        hashes = _store_outputs(conn, [row[3] for row in rows])
+        conn.executemany(
+            'INSERT INTO command_history (id, server_id, command, output_hash, exit_code, executed_at, entry) '
+            'VALUES (?, ?, ?, ?, ?, ?, (SELECT IFNULL(MAX(entry), 0) + 1 FROM command_history))',
+            [row[:3] + (output_hash,) + tuple(row[4:]) for row, output_hash in zip(rows, hashes)]
+        )
+        # Index the text we already have rather than reading it back compressed
+        conn.executemany(
+            'INSERT INTO command_search (rowid, command, output) '
+            'SELECT entry, command, ? FROM command_history WHERE id = ?',
+            [(row[3], row[0]) for row in rows]
         )
         conn.commit()
+
+def _store_outputs(conn: sqlite3.Connection, outputs: List[Optional[str]]) -> List[Optional[str]]:
+    """
+    Store command outputs by content hash and return their hashes (None for no output).
     
-    return command_id
+    Only outputs not already stored are compressed and written.
+    """
+    hashes, pending = [], {}
+    for output in outputs:
+        if output is None:
+            hashes.append(None)
+            continue
+        data = output.encode('utf-8', 'surrogatepass')
+        output_hash = hashlib.sha256(data).hexdigest()
+        hashes.append(output_hash)
+        pending[output_hash] = data
+    
+    if pending:
+        placeholders = ', '.join('?' * len(pending))
+        stored = {row['hash'] for row in conn.execute(
+            f'SELECT hash FROM command_outputs WHERE hash IN ({placeholders})', list(pending)
+        )}
+        conn.executemany(
+            'INSERT OR IGNORE INTO command_outputs (hash, size, data) VALUES (?, ?, ?)',
+            [(output_hash, len(data), zlib.compress(data, OUTPUT_COMPRESSION_LEVEL))
+             for output_hash, data in pending.items() if output_hash not in stored]
+        )
+    return hashes
+
+def get_command_output(command_id: str) -> Optional[Dict[str, Any]]:
+    """Get a history entry's id, output and output size, or None if there is no such entry."""
+    with get_connection() as conn:
+        row = conn.execute(
+            'SELECT h.id, o.size, o.data FROM command_history AS h '
+            'LEFT JOIN command_outputs AS o ON o.hash = h.output_hash WHERE h.id = ?',
+            (command_id,)
+        ).fetchone()
+    if not row:
+        return None
+    
+    return {'id': row['id'], 'output': _output_text(row['data']), 'size': row['size'] or 0}
+
+def utc_timestamp(ts: Optional[float] = None) -> str:
+    """Format a unix time (default now) the way SQLite's CURRENT_TIMESTAMP does."""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts))
 
 def get_command_history(server_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
     """Get command history, optionally filtered by server_id."""
+    return query_command_history(server_id=server_id, limit=limit)['history']
+
+def query_command_history(server_id: Optional[str] = None, limit: int = 50,
+                          cursor: Optional[str] = None, exit_code: Optional[int] = None,
+                          since: Optional[float] = None, until: Optional[float] = None,
+                          command_prefix: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get one page of command history, newest first.
+    
+    Pages are keyed on (executed_at, id) rather than offsets, so each page is
+    an index range scan however deep it is. Pass the returned next_cursor
+    to get the following page; it is None on the last page.
+    
+    Args:
+        server_id: Only this server's commands
+        limit: Page size
+        cursor: next_cursor of the previous page
+        exit_code: Only commands that exited with this code
+        since, until: Only commands run in this range (unix seconds, inclusive)
+        command_prefix: Only commands starting with this text (case-sensitive)
+    
+    Raises:
+        ValueError: If cursor is malformed
+    """
+    conditions, params = [], []
+    if server_id:
+        conditions.append('server_id = ?')
+        params.append(server_id)
+    if exit_code is not None:
+        conditions.append('exit_code = ?')
+        params.append(exit_code)
+    if since is not None:
+        conditions.append('executed_at >= ?')
+        params.append(utc_timestamp(since))
+    if until is not None:
+        conditions.append('executed_at <= ?')
+        params.append(utc_timestamp(until))
+    if command_prefix:
+        # A range instead of LIKE, so the command index can serve it
+        prefix_range = (command_prefix, command_prefix[:-1] + chr(ord(command_prefix[-1]) + 1))
+        conditions.append('command >= ? AND command < ?')
+        params.extend(prefix_range)
+    if cursor:
+        conditions.append('(executed_at, id) < (?, ?)')
+        params.extend(decode_history_cursor(cursor))
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
     with get_connection() as conn:
-        cursor = conn.cursor()
+        table = _history_table(conn, server_id, exit_code, command_prefix and prefix_range)
         
-        if server_id:
-            cursor.execute(
-                'SELECT * FROM command_history WHERE server_id = ? ORDER BY executed_at DESC LIMIT ?',
-                (server_id, limit)
-            )
-        else:
-            cursor.execute(
-                'SELECT * FROM command_history ORDER BY executed_at DESC LIMIT ?',
-                (limit,)
-            )
-            
-        return [dict(row) for row in cursor.fetchall()]
+        # Metadata only; output is fetched per entry with get_command_output
+        rows = conn.execute(
+            f'SELECT id, server_id, command, exit_code, executed_at, '
+            f'(SELECT size FROM command_outputs WHERE hash = output_hash) AS output_size '
+            f'FROM {table} {where} ORDER BY executed_at DESC, id DESC LIMIT ?',
+            params + [limit + 1]
+        ).fetchall()
+    
+    history = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit and history:
+        next_cursor = encode_history_cursor(history[-1]['executed_at'], history[-1]['id'])
+    return {'history': history, 'next_cursor': next_cursor}
+
+def _history_table(conn: sqlite3.Connection, server_id: Optional[str], exit_code: Optional[int],
+                   prefix_range: Optional[Tuple[str, str]]) -> str:
+    """
+    Pick the index a filtered history listing reads.
+    
+    An exit code with a server is an exact range of the exit code index,
+    already in time order. Otherwise the rarest of the exit code and prefix
+    filters is read through its index and sorted, if it matches fewer than
+    HISTORY_FILTER_SORT_ROWS rows (a bounded count decides); commoner ones
+    walk the time index, stopping after one page.
+    """
+    if exit_code is not None and server_id:
+        return 'command_history INDEXED BY idx_command_history_exit_code'
+    if server_id:
+        return 'command_history'
+    
+    candidates = []
+    if exit_code is not None:
+        candidates.append(('idx_command_history_exit_code', 'exit_code = ?', (exit_code,)))
+    if prefix_range:
+        candidates.append(('idx_command_history_command', 'command >= ? AND command < ?', prefix_range))
+    if not candidates:
+        return 'command_history'
+    
+    best, fewest = 'idx_command_history_time', HISTORY_FILTER_SORT_ROWS
+    for index, condition, params in candidates:
+        matches = conn.execute(
+            f'SELECT COUNT(*) FROM (SELECT 1 FROM command_history INDEXED BY {index} '
+            f'WHERE {condition} LIMIT ?)',
+            params + (HISTORY_FILTER_SORT_ROWS,)
+        ).fetchone()[0]
+        if matches < fewest:
+            best, fewest = index, matches
+    return f'command_history INDEXED BY {best}'
+
+def encode_history_cursor(executed_at: str, command_id: str) -> str:
+    """Build the opaque cursor that resumes a listing after this row."""
+    return base64.urlsafe_b64encode(f'{executed_at}|{command_id}'.encode()).decode()
+
+def decode_history_cursor(cursor: str) -> Tuple[str, str]:
+    """Return the (executed_at, id) a cursor resumes after."""
+    try:
+        executed_at, command_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    except Exception:
+        raise ValueError('Invalid cursor')
+    return executed_at, command_id
+
+def search_command_history(query: str, server_id: Optional[str] = None,
+                           exit_code: Optional[int] = None, since: Optional[float] = None,
+                           until: Optional[float] = None, field: Optional[str] = None,
+                           sort: str = 'rank', limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """
+    Search commands and their output with the command_search index.
+    
+    Every word of query must match (as a word or, ending in *, a prefix);
+    "quoted text" must match as a phrase. Other FTS5 syntax is taken
+    literally, so user input cannot break the query. Results carry the
+    command and a snippet of the output around its best match as HTML:
+    the text is escaped and matches are wrapped in <mark> tags.
+    
+    Args:
+        query: Words and phrases to find
+        server_id: Only this server's commands
+        exit_code: Only commands that exited with this code
+        since, until: Only commands run in this range (unix seconds, inclusive)
+        field: 'command' or 'output' to search only that column
+        sort: 'rank' (BM25, command matches weighted by SEARCH_COMMAND_WEIGHT,
+            over the newest SEARCH_RANK_WINDOW matches) or 'recent' (newest
+            first, unscored; cheapest when words or phrases are very common)
+        limit: Page size
+        offset: Results to skip; pass the returned next_offset for the next page
+    
+    Raises:
+        ValueError: If query has no words, or field or sort is unknown
+    """
+    match = build_search_query(query)
+    if field:
+        if field not in ('command', 'output'):
+            raise ValueError("'field' must be 'command' or 'output'")
+        match = f'{{{field}}} : ({match})'
+    if sort not in ('rank', 'recent'):
+        raise ValueError("'sort' must be 'rank' or 'recent'")
+    
+    conditions, params = ['command_search MATCH ?'], [match]
+    if server_id:
+        conditions.append('h.server_id = ?')
+        params.append(server_id)
+    if exit_code is not None:
+        conditions.append('h.exit_code = ?')
+        params.append(exit_code)
+    if since is not None:
+        conditions.append('h.executed_at >= ?')
+        params.append(utc_timestamp(since))
+    if until is not None:
+        conditions.append('h.executed_at <= ?')
+        params.append(utc_timestamp(until))
+    # Only ranked searches select rank: BM25 counts every entry matching each
+    # term, which newest-first pages have no need to pay for
+    if sort == 'rank':
+        order, rank = 'command_search.rank', 'command_search.rank'
+    else:
+        order, rank = 'command_search.rowid DESC', 'NULL'
+    source = ('FROM command_search JOIN command_history AS h ON h.entry = command_search.rowid '
+              f"WHERE {' AND '.join(conditions)}")
+    
+    with get_connection() as conn:
+        if sort == 'rank':
+            # Walking matches newest first is cheap; scoring them is not.
+            # Without filters the walk needs no history rows at all.
+            walk = source if len(conditions) > 1 else 'FROM command_search WHERE command_search MATCH ?'
+            oldest = conn.execute(
+                f'SELECT command_search.rowid {walk} ORDER BY command_search.rowid DESC LIMIT 1 OFFSET ?',
+                params + [SEARCH_RANK_WINDOW - 1]
+            ).fetchone()
+            if oldest:
+                source += ' AND command_search.rowid >= ?'
+                params.append(oldest[0])
+        
+        # Pick the page first, then highlight only its rows: highlighting
+        # decompresses output, which would otherwise happen for every match
+        page = conn.execute(
+            f'SELECT command_search.rowid AS entry, {rank} AS rank '
+            f'{source} ORDER BY {order} LIMIT ? OFFSET ?',
+            params + [limit + 1, offset]
+        ).fetchall()
+        entries = [row['entry'] for row in page[:limit]]
+        
+        rows = {}
+        if entries:
+            # Scan the page's rowid range once: a rowid IN (...) lookup would
+            # evaluate the query again (prefixes included) for every entry
+            placeholders = ', '.join('?' * len(entries))
+            rows = {row['entry']: row for row in conn.execute(
+                f'SELECT command_search.rowid AS entry, h.id, h.server_id, h.command, h.exit_code, '
+                f'h.executed_at, (SELECT size FROM command_outputs WHERE hash = h.output_hash) AS output_size, '
+                f'highlight(command_search, 0, ?, ?) AS command_highlight, '
+                f"snippet(command_search, 1, ?, ?, '…', {SEARCH_SNIPPET_TOKENS}) AS output_snippet "
+                f'FROM command_search JOIN command_history AS h ON h.entry = command_search.rowid '
+                f'WHERE command_search MATCH ? AND command_search.rowid BETWEEN ? AND ? '
+                f'AND +command_search.rowid IN ({placeholders})',
+                list(SEARCH_MATCH_MARKERS) * 2 + [match, min(entries), max(entries)] + entries
+            )}
+    
+    results = []
+    for row in page[:limit]:
+        result = dict(rows[row['entry']])
+        del result['entry']
+        result['command_highlight'] = _highlight_html(result['command_highlight'])
+        result['output_snippet'] = _highlight_html(result['output_snippet']) if result['output_size'] else None
+        # FTS5 ranks best first with the most negative BM25 score
+        result['score'] = None if row['rank'] is None else round(-row['rank'], 4)
+        results.append(result)
+    return {
+        'results': results,
+        'next_offset': offset + limit if len(page) > limit else None
+    }
+
+def _highlight_html(text: Optional[str]) -> Optional[str]:
+    """HTML-escape highlighted text, then turn its match markers into <mark> tags."""
+    if text is None:
+        return None
+    start, end = SEARCH_MATCH_MARKERS
+    return html.escape(text).replace(start, '<mark>').replace(end, '</mark>')
+
+def build_search_query(text: str) -> str:
+    """
+    Turn search box text into an FTS5 query matching all of its words and phrases.
+    
+    Raises:
+        ValueError: If text has no words
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        term = phrase if phrase else word
+        prefix = bool(word) and term.endswith('*') and len(term) > 1
+        term = term.rstrip('*') if prefix else term
+        if not term.strip():
+            continue
+        terms.append('"' + term.replace('"', '""') + '"' + ('*' if prefix else ''))
+    if not terms:
+        raise ValueError("'q' must contain at least one word")
+    return ' '.join(terms)
 
 # Initialize the database on module load
 init_db() 
\ No newline at end of file
@@ -0,0 +1,121 @@
+import os
+import logging
+from typing import Dict, Any, List, Optional, Sequence
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Points per chart series when the caller does not ask for a budget, and the most it may ask for
+CHART_POINTS = int(os.environ.get('CHART_POINTS', 500))
+CHART_MAX_POINTS = int(os.environ.get('CHART_MAX_POINTS', 5000))
+
+# Stored points read per chart point before downsampling. Higher keeps more
+# short spikes for LTTB to pick from; the read stays bounded either way.
+CHART_OVERSAMPLE = int(os.environ.get('CHART_OVERSAMPLE', 20))
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Return the indices of the points Largest-Triangle-Three-Buckets keeps.
+
+    The first and last points are always kept. The points between them are
+    split into threshold - 2 equal buckets, and from each bucket the point
+    forming the largest triangle with the previously kept point and the
+    average of the next bucket is kept, so peaks and dips survive where a
+    plain average or stride would flatten them.
+
+    Args:
+        x: Increasing x values (timestamps)
+        y: Values, without NaN
+        threshold: Number of points to keep
+
+    Returns:
+        Sorted indices into x and y
+    """
+    n = len(x)
+    if threshold >= n or n <= 2:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1])[:max(threshold, 0)]
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket edges over the interior points, plus each bucket's average
+    # point, computed for every bucket at once
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    x_means = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    y_means = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    # The last bucket looks ahead to the final point
+    x_next = np.append(x_means[1:], x[-1])
+    y_next = np.append(y_means[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        ax, ay = x[a], y[a]
+        # Twice the triangle area; the constant factor does not change the argmax
+        areas = np.abs((ax - x_next[bucket]) * (y[start:end] - ay)
+                       - (ax - x[start:end]) * (y_next[bucket] - ay))
+        a = start + int(np.argmax(areas))
+        selected[bucket + 1] = a
+    return selected
+
+def downsample(timestamps: Sequence[int], values: Sequence[Optional[float]], points: int,
+               minimum: Optional[Sequence[Optional[float]]] = None,
+               maximum: Optional[Sequence[Optional[float]]] = None) -> Dict[str, List]:
+    """
+    Downsample one series to at most points points with LTTB.
+
+    Missing values (None or NaN) are dropped first, so gaps do not pull
+    the chart to zero. Each kept point also gets the min and max of every
+    source point up to the next kept one (taken from minimum and maximum
+    when given, else from values), so the envelope still shows spikes LTTB
+    had to leave out.
+    """
+    def as_array(series):
+        return np.asarray([np.nan if value is None else value for value in series], dtype=np.float64)
+
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = as_array(values)
+    minimum = values if minimum is None else as_array(minimum)
+    maximum = values if maximum is None else as_array(maximum)
+    present = ~np.isnan(values)
+    timestamps, values = timestamps[present], values[present]
+    minimum, maximum = minimum[present], maximum[present]
+
+    keep = lttb(timestamps, values, points)
+    if not len(keep):
+        return {'timestamps': [], 'values': [], 'min': [], 'max': []}
+    return {
+        'timestamps': timestamps[keep].tolist(),
+        'values': np.round(values[keep], 3).tolist(),
+        'min': np.round(np.fmin.reduceat(minimum, keep), 3).tolist(),
+        'max': np.round(np.fmax.reduceat(maximum, keep), 3).tolist()
+    }
+
+def chart_series(history: Dict[str, Any], points: int = CHART_POINTS) -> Dict[str, Any]:
+    """
+    Turn a metrics_history.query() result into chart series of at most points points each.
+
+    Each metric's means are downsampled on their own, so every series keeps
+    its own peaks; the payload size depends on points, not on the range.
+    """
+    series = {
+        name: downsample(history['timestamps'], values['mean'], points,
+                         values.get('min'), values.get('max'))
+        for name, values in history['metrics'].items()
+    }
+    return {
+        'server_id': history['server_id'],
+        'from': history['from'],
+        'to': history['to'],
+        'resolution': history['resolution'],
+        'source_points': len(history['timestamps']),
+        'points': points,
+        'series': series
+    }
@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Global cap on concurrently running tasks across all hosts
+FANOUT_MAX_WORKERS = int(os.environ.get('FANOUT_MAX_WORKERS', 32))
+
+# Cap on concurrently running tasks against a single host
+FANOUT_PER_HOST = int(os.environ.get('FANOUT_PER_HOST', 2))
+
+class FanOutExecutor:
+    """
+    Bounded-concurrency executor for running one task per server.
+
+    A thread pool enforces the global cap. Tasks for a host that is already at
+    its per-host cap wait in a per-host queue instead of occupying a worker,
+    so one busy host never blocks work for the others.
+    """
+
+    def __init__(self, max_workers: int = FANOUT_MAX_WORKERS,
+                 per_host_limit: int = FANOUT_PER_HOST):
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='fanout')
+        self._hosts = {}  # host key -> {'active': int, 'queue': deque}
+        self.lock = threading.Lock()
+
+    def submit(self, host_key: str, fn: Callable, *args, **kwargs) -> Future:
+        """Schedule fn(*args, **kwargs) against a host, respecting the per-host cap."""
+        future = Future()
+        task = (future, fn, args, kwargs)
+
+        with self.lock:
+            state = self._hosts.setdefault(host_key, {'active': 0, 'queue': deque()})
+            if state['active'] >= self.per_host_limit:
+                state['queue'].append(task)
+                return future
+            state['active'] += 1
+
+        self._executor.submit(self._run, host_key, task)
+        return future
+
+    def _run(self, host_key: str, task: Tuple) -> None:
+        future, fn, args, kwargs = task
+
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+        # Hand the host slot to the next queued task, if any
+        with self.lock:
+            state = self._hosts[host_key]
+            if state['queue']:
+                next_task = state['queue'].popleft()
+            else:
+                next_task = None
+                state['active'] -= 1
+                if state['active'] == 0:
+                    del self._hosts[host_key]
+
+        if next_task:
+            self._executor.submit(self._run, host_key, next_task)
+
+    def map_unordered(self, fn: Callable, items: Iterable[Any],
+                      key: Callable[[Any], str],
+                      timeout: Optional[float] = None) -> Iterator[Tuple[Any, Future]]:
+        """
+        Run fn(item) for every item and yield (item, future) as each completes.
+
+        Args:
+            fn: Callable invoked once per item.
+            items: Items to fan out over, typically server records.
+            key: Returns the host key for an item; the per-host cap applies per key.
+            timeout: Optional overall timeout in seconds.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        pending = {}
+        for item in items:
+            pending[self.submit(key(item), fn, item)] = item
+
+        while pending:
+            remaining = max(0, deadline - time.monotonic()) if deadline is not None else None
+            done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"{len(pending)} fan-out tasks did not complete in time")
+            for future in done:
+                yield pending.pop(future), future
+
+    def stats(self) -> Dict[str, Any]:
+        """Return current executor statistics."""
+        with self.lock:
+            return {
+                'max_workers': self.max_workers,
+                'per_host_limit': self.per_host_limit,
+                'active': sum(state['active'] for state in self._hosts.values()),
+                'queued': sum(len(state['queue']) for state in self._hosts.values()),
+                'hosts': len(self._hosts)
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting tasks and optionally wait for running ones."""
+        self._executor.shutdown(wait=wait)
+
+def server_host_key(server: Dict[str, Any]) -> str:
+    """Host key used for per-host limits: several server ids may share one host."""
+    return f"{server.get('hostname', server.get('id'))}:{server.get('port', 22)}"
+
+# Create a singleton instance
+fanout = FanOutExecutor()
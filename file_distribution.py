@@ -0,0 +1,187 @@
+import os
+import mmap
+import time
+import uuid
+import threading
+import logging
+from concurrent.futures import wait
+from typing import Callable, Dict, Any, List, Optional
+from ssh_manager import ssh_manager
+from fanout import FanOutExecutor, server_host_key
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Hosts an artifact is pushed to at once
+DISTRIBUTE_CONCURRENCY = int(os.environ.get('DISTRIBUTE_CONCURRENCY', 8))
+
+# Minimum seconds between progress reports for one host
+DISTRIBUTE_PROGRESS_INTERVAL = float(os.environ.get('DISTRIBUTE_PROGRESS_INTERVAL', 0.5))
+
+class FileDistributor:
+    """
+    Pushes one local file to many servers.
+
+    The file is memory-mapped once and every host's upload slices its blocks
+    from the same mapping, so N targets cost one read of the file rather than
+    N. Hosts are uploaded to concurrently, at most `concurrency` at a time and
+    one upload per host; each upload is itself split into parallel parts.
+    """
+
+    def __init__(self, manager, concurrency: int = DISTRIBUTE_CONCURRENCY,
+                 progress_interval: float = DISTRIBUTE_PROGRESS_INTERVAL):
+        self.manager = manager
+        self.concurrency = concurrency
+        self.progress_interval = progress_interval
+        self._executor = FanOutExecutor(max_workers=concurrency, per_host_limit=1)
+
+    def distribute(self, local_path: str, remote_path: str, servers: List[Dict[str, Any]],
+                   on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                   distribution_id: Optional[str] = None, sync: bool = False) -> Dict[str, Any]:
+        """
+        Upload local_path to remote_path on every server and wait for all of them.
+
+        Args:
+            servers: Server records including credentials.
+            on_progress: Called with a host's progress entry as it changes, at
+                most every progress_interval seconds while bytes are flowing.
+            distribution_id: Identifier reported in progress entries; generated
+                if not given.
+            sync: Send each host only what differs from its current copy
+                (see FileSync) instead of the whole file.
+
+        Returns:
+            Summary with per-host results and aggregate throughput in MB/s.
+        """
+        distribution_id = distribution_id or str(uuid.uuid4())
+        size = os.path.getsize(local_path)
+
+        with open(local_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        source = memoryview(mapped) if mapped else memoryview(b'')
+
+        logger.info(f"Distributing {local_path} ({size} bytes) to {len(servers)} servers")
+        start = time.perf_counter()
+        try:
+            futures = [
+                self._executor.submit(server_host_key(server), self._send_one, distribution_id,
+                                      server, local_path, remote_path, source, on_progress, sync)
+                for server in servers
+            ]
+            wait(futures)
+        finally:
+            source.release()
+            if mapped:
+                try:
+                    mapped.close()
+                except BufferError:
+                    # A failed upload still holds a slice; the mapping closes when it is freed
+                    pass
+        elapsed = time.perf_counter() - start
+
+        hosts = [future.result() for future in futures]
+        bytes_sent = sum(host['bytes_sent'] for host in hosts)
+        succeeded = sum(1 for host in hosts if host['success'])
+        logger.info(f"Distribution {distribution_id} finished in {elapsed:.2f}s: "
+                    f"{succeeded}/{len(hosts)} servers")
+
+        return {
+            'success': succeeded == len(hosts),
+            'id': distribution_id,
+            'local_path': local_path,
+            'remote_path': remote_path,
+            'bytes': size,
+            'targets': len(hosts),
+            'succeeded': succeeded,
+            'failed': len(hosts) - succeeded,
+            'bytes_sent': bytes_sent,
+            'elapsed': round(elapsed, 3),
+            'throughput_mb_s': round(bytes_sent / elapsed / 1e6, 2) if elapsed > 0 else None,
+            'hosts': hosts
+        }
+
+    def _send_one(self, distribution_id: str, server: Dict[str, Any], local_path: str,
+                  remote_path: str, source: memoryview,
+                  on_progress: Optional[Callable[[Dict[str, Any]], None]],
+                  sync: bool = False) -> Dict[str, Any]:
+        entry = {
+            'distribution_id': distribution_id,
+            'server_id': server['id'],
+            'name': server.get('name'),
+            'state': 'connecting',
+            'bytes': len(source),
+            'bytes_sent': 0,
+            'percent': 0.0,
+            'elapsed': None,
+            'throughput_mb_s': None,
+            'error': None
+        }
+        lock = threading.Lock()
+        last_report = [0.0]
+        start = time.perf_counter()
+
+        def report(force: bool = False):
+            if not on_progress:
+                return
+            now = time.monotonic()
+            with lock:
+                if not force and now - last_report[0] < self.progress_interval:
+                    return
+                last_report[0] = now
+                entry['elapsed'] = round(time.perf_counter() - start, 3)
+                snapshot = dict(entry)
+            try:
+                on_progress(snapshot)
+            except Exception as e:
+                logger.debug(f"Progress callback failed: {str(e)}")
+
+        def sent(nbytes: int):
+            with lock:
+                entry['bytes_sent'] += nbytes
+                entry['percent'] = round(100.0 * entry['bytes_sent'] / entry['bytes'], 1)
+            report()
+
+        report(force=True)
+        try:
+            if not self.manager.ensure_connected(server):
+                raise ConnectionError(self.manager.connect_error(server))
+
+            if sync:
+                if not hasattr(self.manager, 'sync_file'):
+                    raise NotImplementedError('Delta sync is not supported by this SSH backend')
+                entry['state'] = 'syncing'
+                report(force=True)
+                result = self.manager.sync_file(server['id'], local_path, remote_path)
+                if not result['success']:
+                    raise IOError(result['error'])
+                # Skipped, delta-patched or sent whole
+                entry['action'] = result['action']
+                entry['bytes_sent'] = result['bytes_sent']
+            else:
+                entry['state'] = 'uploading'
+                report(force=True)
+                result = self.manager.upload_file(server['id'], local_path, remote_path,
+                                                  source=source, on_progress=sent)
+                if not result['success']:
+                    raise IOError(result['error'])
+
+            entry['state'] = 'done'
+            entry['percent'] = 100.0
+            # Resumed parts were sent by an earlier, interrupted distribution
+            entry['resumed_bytes'] = result.get('resumed_bytes', 0)
+        except Exception as e:
+            logger.error(f"Error distributing {local_path} to server {server['id']}: {str(e)}")
+            entry['state'] = 'failed'
+            entry['error'] = str(e)
+
+        elapsed = time.perf_counter() - start
+        entry['elapsed'] = round(elapsed, 3)
+        if entry['bytes_sent'] and elapsed > 0:
+            entry['throughput_mb_s'] = round(entry['bytes_sent'] / elapsed / 1e6, 2)
+        report(force=True)
+
+        return {'success': entry['state'] == 'done', **entry}
+
+# Create a singleton instance
+file_distributor = FileDistributor(ssh_manager)
@@ -0,0 +1,381 @@
+import os
+import json
+import math
+import time
+import shlex
+import struct
+import hashlib
+import logging
+from itertools import accumulate
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from ssh_pool import LANE_TRANSFER
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Files larger than this are re-sent whole instead of delta-encoded; the
+# rolling checksum runs in Python and scans about a few MB/s
+DELTA_MAX_SIZE = int(os.environ.get('SYNC_DELTA_MAX_SIZE', 16 * 1024 * 1024))
+
+# Bounds for the delta block size, which otherwise grows with sqrt(file size)
+DELTA_MIN_BLOCK = 2048
+DELTA_MAX_BLOCK = 65536
+
+# Files synced at once within a directory tree
+SYNC_PARALLELISM = int(os.environ.get('SYNC_PARALLELISM', 4))
+
+# Name of the manifest kept in each synced remote directory
+MANIFEST_NAME = '.infrawhiz-manifest.json'
+
+# Suffix of the remote scratch files used while patching
+SYNC_TMP_SUFFIX = '.sync-tmp'
+
+# Modulus of the two halves of the rolling checksum
+_MOD = 1 << 16
+
+# Helper run with the remote python3. 'sig' prints the block signatures of a
+# file; 'patch' rebuilds a file from its old version and a delta and prints
+# the SHA-256 of the result; 'list' prints the size and mtime of every regular
+# file under a directory (portable, unlike GNU find -printf).
+REMOTE_HELPER = r'''
+import os, sys, stat, json, hashlib, struct
+from itertools import accumulate
+M = 1 << 16
+def weak(data):
+    return (sum(data) % M) | ((sum(accumulate(data)) % M) << 16)
+if sys.argv[1] == "sig":
+    size, blocks = int(sys.argv[3]), []
+    with open(sys.argv[2], "rb") as f:
+        for data in iter(lambda: f.read(size), b""):
+            blocks.append([weak(data), hashlib.md5(data).hexdigest()])
+    print(json.dumps(blocks))
+elif sys.argv[1] == "patch":
+    size, digest = int(sys.argv[5]), hashlib.sha256()
+    with open(sys.argv[2], "rb") as b, open(sys.argv[3], "rb") as d, open(sys.argv[4], "wb") as o:
+        for op in iter(lambda: d.read(1), b""):
+            if op == b"C":
+                b.seek(struct.unpack(">Q", d.read(8))[0] * size)
+                data = b.read(size)
+            else:
+                data = d.read(struct.unpack(">I", d.read(4))[0])
+            o.write(data)
+            digest.update(data)
+    print(digest.hexdigest())
+elif sys.argv[1] == "list":
+    root, files = sys.argv[2], {}
+    for base, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(base, name)
+            st = os.lstat(path)
+            if stat.S_ISREG(st.st_mode):
+                files[os.path.relpath(path, root).replace(os.sep, "/")] = [st.st_size, int(st.st_mtime)]
+    print(json.dumps(files))
+'''
+
+def _weak_checksum(data: bytes) -> Tuple[int, int]:
+    """Return the (a, b) halves of the rsync weak checksum of data."""
+    return sum(data) % _MOD, sum(accumulate(data)) % _MOD
+
+def block_size_for(size: int) -> int:
+    """Pick a delta block size for a file, as rsync does: about sqrt(size)."""
+    return max(DELTA_MIN_BLOCK, min(DELTA_MAX_BLOCK, 1 << max(0, int(math.sqrt(size)).bit_length() - 1)))
+
+def compute_delta(data: bytes, signatures: List[List], block_size: int) -> Tuple[bytes, int]:
+    """
+    Encode data against the block signatures of the remote copy.
+
+    Returns the delta, a stream of b'C' + block index (copy a remote block) and
+    b'L' + length + bytes (literal data), and the number of matched blocks.
+    """
+    table = {}
+    for index, (weak, strong) in enumerate(signatures):
+        table.setdefault(weak, []).append((strong, index))
+
+    delta = bytearray()
+    matched = 0
+    literal_start = 0
+    length = len(data)
+
+    def emit_literal(end):
+        for start in range(literal_start, end, 0xFFFFFFFF):
+            chunk = data[start:min(end, start + 0xFFFFFFFF)]
+            delta.extend(b'L' + struct.pack('>I', len(chunk)) + chunk)
+
+    i = 0
+    if length >= block_size:
+        a, b = _weak_checksum(data[:block_size])
+    while i + block_size <= length:
+        candidates = table.get(a | (b << 16))
+        if candidates:
+            strong = hashlib.md5(data[i:i + block_size]).hexdigest()
+            index = next((index for digest, index in candidates if digest == strong), None)
+            if index is not None:
+                emit_literal(i)
+                delta.extend(b'C' + struct.pack('>Q', index))
+                matched += 1
+                i += block_size
+                literal_start = i
+                if i + block_size <= length:
+                    a, b = _weak_checksum(data[i:i + block_size])
+                continue
+
+        # Roll the window forward one byte
+        if i + block_size < length:
+            out, new = data[i], data[i + block_size]
+            a = (a - out + new) % _MOD
+            b = (b - block_size * out + a) % _MOD
+        i += 1
+
+    emit_literal(length)
+    return bytes(delta), matched
+
+def _within(name: str) -> bool:
+    """Return True if a manifest path stays inside the synced directory."""
+    return bool(name) and not name.startswith('/') and '..' not in name.split('/')
+
+def _helper_command() -> str:
+    return f'python3 -c {shlex.quote(REMOTE_HELPER)}'
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class FileSync:
+    """
+    Pushes files and directory trees to a host, sending as little as possible.
+
+    A file is skipped when the remote copy has the same size and mtime, or the
+    same SHA-256. A changed file is delta-encoded against the remote copy with
+    the rsync algorithm: the remote python3 helper returns block signatures,
+    the local side finds matching blocks with a rolling checksum, and only
+    unmatched bytes are sent. Hosts without python3, new files and very large
+    files get a full upload instead; on such hosts remote-side changes to
+    files already synced also go unnoticed, since the helper lists the tree. Directories keep a manifest of what was
+    last synced, so unchanged files need no per-file round trips at all.
+    """
+
+    def __init__(self, manager, server_id: str):
+        self.manager = manager
+        self.server_id = server_id
+
+    def _exec(self, command: str, timeout: int = 120) -> Dict[str, Any]:
+        return self.manager.execute_command(self.server_id, command, timeout=timeout, lane=LANE_TRANSFER)
+
+    def _sftp(self):
+        return self.manager.sftp_session(self.server_id)
+
+    def sync_file(self, local_path: str, remote_path: str,
+                  local_sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Make remote_path identical to local_path."""
+        start = time.perf_counter()
+        result = {
+            'success': True,
+            'local_path': local_path,
+            'remote_path': remote_path,
+            'bytes': None,
+            'bytes_sent': 0
+        }
+
+        try:
+            stat = os.stat(local_path)
+            result['bytes'] = stat.st_size
+            with self._sftp() as sftp:
+                try:
+                    remote = sftp.stat(remote_path)
+                except IOError:
+                    remote = None
+
+            if remote is None:
+                self._full_upload(local_path, remote_path, result, 'missing')
+            elif remote.st_size == stat.st_size and remote.st_mtime == int(stat.st_mtime):
+                result.update(action='skipped', reason='size_mtime')
+            else:
+                local_sha256 = local_sha256 or _file_sha256(local_path)
+                if remote.st_size == stat.st_size and self._remote_sha256(remote_path) == local_sha256:
+                    # Same content; align the mtime so the fast path hits next time
+                    self._set_attributes(remote_path, stat)
+                    result.update(action='skipped', reason='checksum')
+                elif stat.st_size > DELTA_MAX_SIZE or remote.st_size < DELTA_MIN_BLOCK:
+                    # Too big to scan, or too small to contain a matching block
+                    self._full_upload(local_path, remote_path, result, 'changed')
+                else:
+                    self._delta_upload(local_path, remote_path, stat, local_sha256, result)
+        except Exception as e:
+            logger.error(f"Error syncing {local_path} to server {self.server_id}: {str(e)}")
+            result.update(success=False, error=str(e))
+
+        result['elapsed'] = round(time.perf_counter() - start, 3)
+        return result
+
+    def _remote_sha256(self, remote_path: str) -> Optional[str]:
+        result = self._exec(f'sha256sum {shlex.quote(remote_path)}')
+        if not result['success'] or not result['stdout']:
+            return None
+        return result['stdout'].split()[0]
+
+    def _set_attributes(self, remote_path: str, stat: os.stat_result) -> None:
+        with self._sftp() as sftp:
+            sftp.utime(remote_path, (int(stat.st_atime), int(stat.st_mtime)))
+            sftp.chmod(remote_path, stat.st_mode & 0o7777)
+
+    def _full_upload(self, local_path: str, remote_path: str,
+                     result: Dict[str, Any], reason: str) -> None:
+        upload = self.manager.upload_file(self.server_id, local_path, remote_path)
+        if not upload['success']:
+            raise IOError(upload.get('error', 'Upload failed'))
+        self._set_attributes(remote_path, os.stat(local_path))
+        result.update(action='uploaded', reason=reason, bytes_sent=upload.get('bytes_transferred', 0))
+
+    def _delta_upload(self, local_path: str, remote_path: str, stat: os.stat_result,
+                      local_sha256: str, result: Dict[str, Any]) -> None:
+        block_size = block_size_for(stat.st_size)
+        helper = _helper_command()
+
+        signatures = self._exec(f'{helper} sig {shlex.quote(remote_path)} {block_size}')
+        if not signatures['success']:
+            logger.info(f"Delta sync unavailable on server {self.server_id} "
+                        f"({signatures['stderr'].strip() or signatures.get('error')}); sending whole file")
+            self._full_upload(local_path, remote_path, result, 'no_delta_helper')
+            return
+
+        with open(local_path, 'rb') as f:
+            data = f.read()
+        delta, matched = compute_delta(data, json.loads(signatures['stdout']), block_size)
+
+        delta_path = remote_path + SYNC_TMP_SUFFIX + '.delta'
+        new_path = remote_path + SYNC_TMP_SUFFIX
+        with self._sftp() as sftp:
+            with sftp.open(delta_path, 'wb') as remote_delta:
+                remote_delta.set_pipelined(True)
+                remote_delta.write(delta)
+
+        patched = self._exec(f'{helper} patch {shlex.quote(remote_path)} {shlex.quote(delta_path)} '
+                             f'{shlex.quote(new_path)} {block_size}')
+        with self._sftp() as sftp:
+            sftp.remove(delta_path)
+            if not patched['success'] or patched['stdout'].strip() != local_sha256:
+                # Never install a file that does not match; send it whole instead
+                logger.warning(f"Delta patch of {remote_path} on server {self.server_id} did not verify")
+                try:
+                    sftp.remove(new_path)
+                except IOError:
+                    pass
+                self._full_upload(local_path, remote_path, result, 'delta_failed')
+                return
+            sftp.posix_rename(new_path, remote_path)
+
+        self._set_attributes(remote_path, stat)
+        result.update(action='delta', reason='changed', bytes_sent=len(delta),
+                      blocks_matched=matched, block_size=block_size)
+
+    def sync_directory(self, local_dir: str, remote_dir: str, delete: bool = False) -> Dict[str, Any]:
+        """
+        Make the tree under remote_dir match local_dir.
+
+        Files whose local size and mtime match the remote manifest, and whose
+        remote size and mtime are unchanged since, are skipped without any
+        further round trips. With delete=True, remote files that an earlier
+        sync recorded in the manifest and that no longer exist locally are
+        removed; files the sync never wrote are always left alone.
+        """
+        start = time.perf_counter()
+        local_files = {}
+        for root, _, names in os.walk(local_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                local_files[os.path.relpath(path, local_dir).replace(os.sep, '/')] = os.stat(path)
+
+        manifest_path = f'{remote_dir.rstrip("/")}/{MANIFEST_NAME}'
+        manifest = self._read_manifest(manifest_path)
+        remote_files = self._list_remote(remote_dir)
+
+        changed = []
+        for name, stat in local_files.items():
+            entry = manifest.get(name)
+            synced = entry and (entry['size'], entry['mtime'])
+            if synced != (stat.st_size, int(stat.st_mtime)):
+                changed.append(name)
+            elif remote_files is not None and remote_files.get(name) != synced:
+                # Changed on the remote side since the last sync
+                changed.append(name)
+
+        # Create every missing directory in one round trip
+        directories = sorted({os.path.dirname(f'{remote_dir.rstrip("/")}/{name}') for name in changed})
+        if directories:
+            self._exec('mkdir -p ' + ' '.join(shlex.quote(directory) for directory in directories))
+
+        def sync(name):
+            return self.sync_file(os.path.join(local_dir, name), f'{remote_dir.rstrip("/")}/{name}')
+
+        results = []
+        if changed:
+            with ThreadPoolExecutor(max_workers=min(SYNC_PARALLELISM, len(changed)),
+                                    thread_name_prefix='sync') as executor:
+                results = list(executor.map(sync, changed))
+
+        # Only files this sync put there are candidates for deletion
+        removed = [name for name in manifest if name not in local_files and _within(name)
+                   and (remote_files is None or name in remote_files)]
+        deleted = removed if delete else []
+        if deleted:
+            self._exec('rm -f ' + ' '.join(shlex.quote(f'{remote_dir.rstrip("/")}/{name}')
+                                           for name in deleted))
+
+        # Record what is now on the remote side; files kept despite being
+        # removed locally stay listed so a later delete can still remove them
+        failed = {result['local_path'] for result in results if not result['success']}
+        new_manifest = {name: manifest[name] for name in removed if not delete}
+        new_manifest.update(
+            (name, {'size': stat.st_size, 'mtime': int(stat.st_mtime)})
+            for name, stat in local_files.items()
+            if os.path.join(local_dir, name) not in failed
+        )
+        self._write_manifest(manifest_path, new_manifest)
+
+        actions = [result.get('action') for result in results]
+        return {
+            'success': not failed,
+            'local_path': local_dir,
+            'remote_path': remote_dir,
+            'files': len(local_files),
+            'unchanged': len(local_files) - len(changed) + actions.count('skipped'),
+            'uploaded': actions.count('uploaded'),
+            'delta': actions.count('delta'),
+            'deleted': len(deleted),
+            'failed': len(failed),
+            'bytes': sum(stat.st_size for stat in local_files.values()),
+            'bytes_sent': sum(result['bytes_sent'] for result in results),
+            'elapsed': round(time.perf_counter() - start, 3),
+            'results': [result for result in results if result.get('action') != 'skipped']
+        }
+
+    def _read_manifest(self, manifest_path: str) -> Dict[str, Any]:
+        try:
+            with self._sftp() as sftp:
+                with sftp.open(manifest_path, 'rb') as f:
+                    return json.loads(f.read())
+        except (IOError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest_path: str, manifest: Dict[str, Any]) -> None:
+        with self._sftp() as sftp:
+            with sftp.open(manifest_path, 'wb') as f:
+                f.write(json.dumps(manifest).encode('utf-8'))
+
+    def _list_remote(self, remote_dir: str) -> Optional[Dict[str, Tuple[int, int]]]:
+        """Return {relative path: (size, mtime)} of remote files, or None if unavailable."""
+        result = self._exec(f'{_helper_command()} list {shlex.quote(remote_dir)}')
+        try:
+            listing = json.loads(result['stdout']) if result['success'] else None
+        except ValueError:
+            listing = None
+        if listing is None:
+            return None
+
+        return {name: tuple(entry) for name, entry in listing.items()
+                if name != MANIFEST_NAME and SYNC_TMP_SUFFIX not in name}
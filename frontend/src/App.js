@@ -32,6 +32,21 @@ function App() {
     };
   }, []);
   
+  // Receive pushed metrics for the selected server only
+  useEffect(() => {
+    if (!selectedServer) return;
+    
+    const subscribe = () => socket.emit('subscribe_metrics', { server_id: selectedServer.id });
+    subscribe();
+    // Rooms do not survive a reconnect
+    socket.on('connect', subscribe);
+    
+    return () => {
+      socket.off('connect', subscribe);
+      socket.emit('unsubscribe_metrics', { server_id: selectedServer.id });
+    };
+  }, [selectedServer]);
+  
   // Fetch servers from API
   const fetchServers = async () => {
     try {
@@ -1,4 +1,5 @@
-import React, { useEffect } from 'react';
+import React, { useEffect, useState } from 'react';
+import axios from 'axios';
 import {
   Paper,
   Typography,
@@ -26,6 +27,17 @@ import {
   ResponsiveContainer 
 } from 'recharts';
 
+// Range and point budget of the history charts; the server downsamples to the budget
+const HISTORY_RANGE_SECONDS = 24 * 60 * 60;
+const HISTORY_POINTS = 300;
+// Charts are refetched about once per point width; pushed samples are appended in between
+const HISTORY_REFRESH_MS = (HISTORY_RANGE_SECONDS / HISTORY_POINTS) * 1000;
+const HISTORY_METRICS = [
+  { key: 'cpu_usage', title: 'CPU Usage (24h)', unit: '%', color: '#8884d8' },
+  { key: 'memory_percent', title: 'Memory (24h)', unit: '%', color: '#82ca9d' },
+  { key: 'load_1', title: 'Load 1m (24h)', unit: '', color: '#ffc658' }
+];
+
 const MetricItem = ({ title, value, percentage, icon }) => (
   <Paper sx={{ p: 2, height: '100%' }}>
     <Box sx={{ display: 'flex', alignItems: 'center', mb: 1 }}>
@@ -50,13 +62,96 @@ const MetricItem = ({ title, value, percentage, icon }) => (
   </Paper>
 );
 
+// Add a pushed sample to the end of each chart series, dropping points that left the range
+const appendSample = (history, metrics) => {
+  const cutoff = metrics.timestamp - HISTORY_RANGE_SECONDS;
+  const next = { ...history };
+  HISTORY_METRICS.forEach(({ key }) => {
+    const series = history[key];
+    const value = metrics[key];
+    const last = series && series.timestamps[series.timestamps.length - 1];
+    if (!series || value === undefined || value === null || metrics.timestamp <= last) return;
+    
+    const first = series.timestamps.findIndex(ts => ts >= cutoff);
+    const start = first === -1 ? series.timestamps.length : first;
+    next[key] = {
+      timestamps: [...series.timestamps.slice(start), metrics.timestamp],
+      values: [...series.values.slice(start), value],
+      min: [...series.min.slice(start), value],
+      max: [...series.max.slice(start), value]
+    };
+  });
+  return next;
+};
+
+const HistoryChart = ({ title, unit, color, series }) => {
+  // One row per kept point; the min/max band shows spikes between them
+  const data = series.timestamps.map((ts, i) => ({
+    time: new Date(ts * 1000).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
+    value: series.values[i],
+    range: [series.min[i], series.max[i]]
+  }));
+  
+  return (
+    <Paper sx={{ p: 2, height: '100%' }}>
+      <Typography variant="subtitle1" sx={{ mb: 1 }}>{title}</Typography>
+      <ResponsiveContainer width="100%" height={160}>
+        <AreaChart data={data}>
+          <CartesianGrid strokeDasharray="3 3" />
+          <XAxis dataKey="time" minTickGap={40} />
+          <YAxis unit={unit} />
+          <RechartsTooltip />
+          <Area type="monotone" dataKey="range" stroke="none" fill={color} fillOpacity={0.2} isAnimationActive={false} />
+          <Area type="monotone" dataKey="value" stroke={color} fill="none" isAnimationActive={false} />
+        </AreaChart>
+      </ResponsiveContainer>
+    </Paper>
+  );
+};
+
 const ServerMetrics = ({ server, metrics, onRefresh }) => {
+  const [history, setHistory] = useState(null);
+  
   // Auto-refresh metrics on initial load
   useEffect(() => {
     onRefresh();
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [server.id]);
   
+  // Fetch downsampled history for the server, then again on a coarse interval
+  useEffect(() => {
+    let active = true;
+    const fetchHistory = () => {
+      const now = Math.floor(Date.now() / 1000);
+      axios.get(`/api/servers/${server.id}/metrics/chart`, {
+        params: {
+          from: now - HISTORY_RANGE_SECONDS,
+          to: now,
+          points: HISTORY_POINTS,
+          metrics: HISTORY_METRICS.map(metric => metric.key).join(',')
+        }
+      })
+        .then(response => active && setHistory(response.data.series))
+        .catch(error => console.error('Failed to fetch metrics history:', error));
+    };
+    
+    setHistory(null);
+    fetchHistory();
+    const timer = setInterval(fetchHistory, HISTORY_REFRESH_MS);
+    return () => {
+      active = false;
+      clearInterval(timer);
+    };
+  }, [server.id]);
+  
+  // Pushed samples extend the charts without another request
+  useEffect(() => {
+    if (metrics.timestamp) {
+      setHistory(current => current && appendSample(current, metrics));
+    }
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [metrics.timestamp]);
+  
   // Whether we have metrics data
   const hasMetrics = Object.keys(metrics).length > 0 && !metrics.error;
   
@@ -104,7 +199,7 @@ const ServerMetrics = ({ server, metrics, onRefresh }) => {
           <Grid item xs={12} sm={6} md={4}>
             <MetricItem 
               title="Memory" 
-              value={`${metrics.memory_used} / ${metrics.memory_total} MB`} 
+              value={`${formatBytes(metrics.memory_used)} / ${formatBytes(metrics.memory_total)}`} 
               percentage={metrics.memory_percent}
               icon={<MemoryIcon />}
             />
@@ -114,7 +209,7 @@ const ServerMetrics = ({ server, metrics, onRefresh }) => {
           <Grid item xs={12} sm={6} md={4}>
             <MetricItem 
               title="Disk Space" 
-              value={`${metrics.disk_used} / ${metrics.disk_total}`} 
+              value={`${formatBytes(metrics.disk_used)} / ${formatBytes(metrics.disk_total)}`} 
               percentage={metrics.disk_percent}
               icon={<DiskIcon />}
             />
@@ -124,9 +219,11 @@ const ServerMetrics = ({ server, metrics, onRefresh }) => {
           <Grid item xs={12} sm={6} md={4}>
             <MetricItem 
               title="Network" 
-              value={metrics.network_interface ? 
-                `${metrics.network_interface}: RX ${formatBytes(metrics.network_rx)}, TX ${formatBytes(metrics.network_tx)}` : 
-                'N/A'
+              value={metrics.network_rx_rate !== undefined ? 
+                `RX ${formatBytes(metrics.network_rx_rate)}/s, TX ${formatBytes(metrics.network_tx_rate)}/s` : 
+                metrics.network_rx !== undefined ?
+                  `RX ${formatBytes(metrics.network_rx)}, TX ${formatBytes(metrics.network_tx)}` :
+                  'N/A'
               }
               icon={<NetworkIcon />}
             />
@@ -159,6 +256,13 @@ const ServerMetrics = ({ server, metrics, onRefresh }) => {
               </ResponsiveContainer>
             </Paper>
           </Grid>
+          
+          {/* History */}
+          {history && HISTORY_METRICS.map(metric => history[metric.key] && (
+            <Grid item xs={12} md={4} key={metric.key}>
+              <HistoryChart {...metric} series={history[metric.key]} />
+            </Grid>
+          ))}
         </Grid>
       )}
     </Paper>
@@ -0,0 +1,200 @@
+import os
+import time
+import uuid
+import queue
+import atexit
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+import db
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows written per transaction, and the longest a row waits for one (milliseconds)
+COMMAND_HISTORY_BATCH_SIZE = int(os.environ.get('COMMAND_HISTORY_BATCH_SIZE', 200))
+COMMAND_HISTORY_FLUSH_MS = float(os.environ.get('COMMAND_HISTORY_FLUSH_MS', 100))
+
+# Rows that may wait in memory. When the queue is full, callers block for up
+# to COMMAND_HISTORY_PUT_TIMEOUT seconds and then write their row themselves,
+# so a stalled writer slows requests down instead of losing history.
+COMMAND_HISTORY_QUEUE_SIZE = int(os.environ.get('COMMAND_HISTORY_QUEUE_SIZE', 10000))
+COMMAND_HISTORY_PUT_TIMEOUT = float(os.environ.get('COMMAND_HISTORY_PUT_TIMEOUT', 1))
+
+class HistoryWriter:
+    """
+    Write-behind queue for command history.
+
+    add() assigns the row's id and executed_at and returns at once; a
+    background thread writes queued rows in one transaction per batch of
+    batch_size rows or every flush_ms milliseconds, whichever comes first.
+    flush() waits until everything queued so far is written, and runs on
+    shutdown.
+    """
+
+    def __init__(self, batch_size: int = COMMAND_HISTORY_BATCH_SIZE,
+                 flush_ms: float = COMMAND_HISTORY_FLUSH_MS,
+                 queue_size: int = COMMAND_HISTORY_QUEUE_SIZE,
+                 put_timeout: float = COMMAND_HISTORY_PUT_TIMEOUT):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._flush_now = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.lock = threading.Lock()
+        self._stats = {'queued': 0, 'written': 0, 'batches': 0, 'failed': 0,
+                       'blocked_puts': 0, 'direct_writes': 0, 'max_depth': 0,
+                       'last_flush_ms': None, 'max_flush_ms': 0.0, 'total_flush_ms': 0.0}
+
+    def start(self) -> None:
+        """Start the writer thread if it is not already running."""
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+
+    def add(self, server_id: str, command: str, output: Optional[str] = None,
+            exit_code: Optional[int] = None) -> str:
+        """Queue a command execution record and return its id."""
+        command_id = str(uuid.uuid4())
+        row = (command_id, server_id, command, output, exit_code, db.utc_timestamp())
+        if not (self._thread and self._thread.is_alive()):
+            self.start()
+
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self.lock:
+                self._stats['blocked_puts'] += 1
+            try:
+                self._queue.put(row, timeout=self.put_timeout)
+            except queue.Full:
+                # Still full: write this row on the caller's thread rather than drop it
+                db.add_command_history_rows([row])
+                with self.lock:
+                    self._stats['direct_writes'] += 1
+                return command_id
+
+        with self.lock:
+            self._stats['queued'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'], self._queue.qsize())
+        return command_id
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything queued so far now; returns False if timeout passed first."""
+        if not (self._thread and self._thread.is_alive()):
+            if self._queue.empty():
+                return True
+            self.start()
+        self._flush_now.set()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self) -> None:
+        """Flush and stop the writer thread."""
+        self.flush()
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            # Wake the writer if it is waiting for rows
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if first is None:
+                self._queue.task_done()
+                continue
+
+            # Gather a batch until it is full or the first row has waited long enough
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._flush_now.is_set() or self._stop.is_set():
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.01)))
+                except queue.Empty:
+                    pass
+
+            if self._queue.empty():
+                self._flush_now.clear()
+            self._write(batch)
+
+    def _write(self, batch: List[Optional[Tuple]]) -> None:
+        rows = [row for row in batch if row is not None]
+        start = time.perf_counter()
+        failed = self._write_rows(rows)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self.lock:
+            self._stats['written'] += len(rows) - failed
+            self._stats['failed'] += failed
+            self._stats['batches'] += 1
+            self._stats['last_flush_ms'] = round(elapsed_ms, 3)
+            self._stats['max_flush_ms'] = max(self._stats['max_flush_ms'], round(elapsed_ms, 3))
+            self._stats['total_flush_ms'] += elapsed_ms
+        for _ in batch:
+            self._queue.task_done()
+
+    def _write_rows(self, rows: List[Tuple]) -> int:
+        """Write rows, retrying the batch once and then row by row. Returns the rows that failed."""
+        for attempt in (1, 2):
+            try:
+                db.add_command_history_rows(rows)
+                return 0
+            except Exception as e:
+                logger.warning(f"Error writing {len(rows)} command history rows "
+                               f"(attempt {attempt}): {str(e)}")
+
+        # One row at a time, so a bad row cannot sink the rest of its batch
+        failed = 0
+        for row in rows:
+            try:
+                db.add_command_history_rows([row])
+            except Exception as e:
+                failed += 1
+                logger.error(f"Error writing command history row {row[0]}: {str(e)}")
+        return failed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, throughput and flush latency."""
+        with self.lock:
+            stats = dict(self._stats)
+        total = stats.pop('total_flush_ms')
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'depth': self._queue.qsize(),
+            'capacity': self._queue.maxsize,
+            'batch_size': self.batch_size,
+            'flush_ms': self.flush_interval * 1000,
+            'avg_flush_ms': round(total / stats['batches'], 3) if stats['batches'] else None,
+            **stats
+        }
+
+# Create a singleton instance
+history_writer = HistoryWriter()
+
+# Write queued rows before the process exits
+atexit.register(history_writer.close)
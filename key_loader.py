@@ -0,0 +1,87 @@
+import os
+import time
+import threading
+import logging
+from typing import Dict, Any, Optional
+import paramiko
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cache parsed private keys; disable to measure the cost of re-parsing on every connect
+KEY_CACHE_ENABLED = os.environ.get('SSH_KEY_CACHE', 'True').lower() in ('true', '1', 't')
+
+# Passphrase for encrypted private keys, if any
+KEY_PASSPHRASE = os.environ.get('SSH_KEY_PASSPHRASE')
+
+class PrivateKeyCache:
+    """
+    Cache of parsed private keys.
+
+    Keys are loaded with paramiko.PKey.from_path, which detects RSA, ECDSA and
+    Ed25519 keys. Entries are keyed by path and validated against the file's
+    mtime and size, so an edited or replaced key file is picked up on the next
+    connect while hundreds of hosts sharing one key parse it only once.
+    """
+
+    def __init__(self, enabled: bool = KEY_CACHE_ENABLED, passphrase: Optional[str] = KEY_PASSPHRASE):
+        self.enabled = enabled
+        self.passphrase = passphrase
+        self._keys = {}  # realpath -> (mtime_ns, size, PKey)
+        self.lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'load_ms': 0.0}
+
+    def load(self, key_path: str) -> paramiko.PKey:
+        """Return the parsed private key at key_path. Raises if it cannot be read."""
+        path = os.path.realpath(os.path.expanduser(key_path))
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        if not self.enabled:
+            return self._parse(path)
+
+        # Parse under the lock so a reconnect storm parses each key once
+        with self.lock:
+            cached = self._keys.get(path)
+            if cached and cached[:2] == signature:
+                with self._stats_lock:
+                    self._stats['hits'] += 1
+                return cached[2]
+
+            key = self._parse(path)
+            self._keys[path] = (*signature, key)
+            logger.info(f"Loaded {key.get_name()} key from {path}")
+            return key
+
+    def _parse(self, path: str) -> paramiko.PKey:
+        start = time.perf_counter()
+        key = paramiko.PKey.from_path(path, password=self.passphrase)
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._stats['load_ms'] += elapsed
+            self._stats['misses'] += 1
+        return key
+
+    def clear(self) -> None:
+        """Forget every cached key."""
+        with self.lock:
+            self._keys.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache statistics."""
+        with self.lock, self._stats_lock:
+            return {
+                'enabled': self.enabled,
+                'keys': len(self._keys),
+                **self._stats,
+                'load_ms': round(self._stats['load_ms'], 3)
+            }
+
+# Create a singleton instance
+key_cache = PrivateKeyCache()
+
+def load_private_key(key_path: str) -> paramiko.PKey:
+    """Load a private key of any supported type through the shared cache."""
+    return key_cache.load(key_path)
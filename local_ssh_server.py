@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+"""
+Minimal local SSH server used as a stand-in for real hosts in benchmarks.
+
+Exec requests are run with /bin/sh on the local machine, with the channel's
+input forwarded to the command's stdin. The sftp subsystem serves the local
+filesystem. An artificial latency can be injected
+to emulate WAN round trips; it applies to each exec request and to each chunk
+of input sent to a running command.
+"""
+
+import os
+import socket
+import subprocess
+import threading
+import time
+import logging
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+# Share one host key between stand-in servers; generating it is slow
+_host_key = None
+_host_key_lock = threading.Lock()
+
+
+def _get_host_key() -> paramiko.PKey:
+    global _host_key
+    with _host_key_lock:
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+        return _host_key
+
+
+class _StandInServer(paramiko.ServerInterface):
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return 'password,publickey'
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED_OPEN_FAILED
+
+    def check_channel_exec_request(self, channel, command):
+        # Emulate the network round trip of the exec request
+        if self.latency:
+            time.sleep(self.latency)
+        threading.Thread(
+            target=_run_command, args=(channel, command.decode('utf-8'), self.latency), daemon=True
+        ).start()
+        return True
+
+
+def _run_command(channel: paramiko.Channel, command: str, latency: float = 0.0) -> None:
+    """Run a command locally and stream its output back over the channel."""
+    try:
+        process = subprocess.Popen(
+            ['/bin/sh', '-c', command],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+
+        def pump_stdin():
+            try:
+                for chunk in iter(lambda: channel.recv(32768), b''):
+                    if latency:
+                        time.sleep(latency)
+                    process.stdin.write(chunk)
+                    process.stdin.flush()
+            except (OSError, EOFError):
+                pass
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+        threading.Thread(target=pump_stdin, daemon=True).start()
+
+        def pump_stderr():
+            for chunk in iter(lambda: process.stderr.read1(32768), b''):
+                channel.sendall_stderr(chunk)
+
+        stderr_thread = threading.Thread(target=pump_stderr, daemon=True)
+        stderr_thread.start()
+
+        for chunk in iter(lambda: process.stdout.read1(32768), b''):
+            channel.sendall(chunk)
+
+        stderr_thread.join()
+        channel.send_exit_status(process.wait())
+    except Exception as e:
+        logger.debug(f"Stand-in command failed: {str(e)}")
+        channel.send_exit_status(255)
+    finally:
+        channel.close()
+
+
+def _sftp_errno(e: OSError) -> int:
+    return paramiko.SFTPServer.convert_errno(e.errno)
+
+
+class _LocalSFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return _sftp_errno(e)
+
+
+class _LocalSFTPServer(paramiko.SFTPServerInterface):
+    """SFTP over the local filesystem, paths used as given."""
+
+    def open(self, path, flags, attr):
+        try:
+            fd = os.open(path, flags | getattr(os, 'O_BINARY', 0), 0o644)
+        except OSError as e:
+            return _sftp_errno(e)
+        if flags & os.O_WRONLY:
+            mode = 'ab' if flags & os.O_APPEND else 'wb'
+        elif flags & os.O_RDWR:
+            mode = 'a+b' if flags & os.O_APPEND else 'r+b'
+        else:
+            mode = 'rb'
+        handle = _LocalSFTPHandle(flags)
+        handle.filename = path
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(path))
+        except OSError as e:
+            return _sftp_errno(e)
+
+    def lstat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.lstat(path))
+        except OSError as e:
+            return _sftp_errno(e)
+
+    def list_folder(self, path):
+        try:
+            return [paramiko.SFTPAttributes.from_stat(os.lstat(os.path.join(path, name)), name)
+                    for name in os.listdir(path)]
+        except OSError as e:
+            return _sftp_errno(e)
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            return _sftp_errno(e)
+        return paramiko.SFTP_OK
+
+    def rename(self, oldpath, newpath):
+        if os.path.exists(newpath):
+            return paramiko.SFTP_FAILURE
+        return self.posix_rename(oldpath, newpath)
+
+    def posix_rename(self, oldpath, newpath):
+        try:
+            os.replace(oldpath, newpath)
+        except OSError as e:
+            return _sftp_errno(e)
+        return paramiko.SFTP_OK
+
+    def mkdir(self, path, attr):
+        try:
+            os.mkdir(path)
+        except OSError as e:
+            return _sftp_errno(e)
+        return paramiko.SFTP_OK
+
+    def rmdir(self, path):
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            return _sftp_errno(e)
+        return paramiko.SFTP_OK
+
+    def chattr(self, path, attr):
+        try:
+            if attr._flags & attr.FLAG_PERMISSIONS:
+                os.chmod(path, attr.st_mode)
+            if attr._flags & attr.FLAG_AMTIME:
+                os.utime(path, (attr.st_atime, attr.st_mtime))
+        except OSError as e:
+            return _sftp_errno(e)
+        return paramiko.SFTP_OK
+
+    def canonicalize(self, path):
+        return os.path.abspath(path)
+
+
+class LocalSSHServer:
+    """
+    Threaded SSH server bound to 127.0.0.1 on a free port.
+
+    Usage:
+        with LocalSSHServer(latency=0.05) as server:
+            ssh.connect('bench', '127.0.0.1', 'bench', password='x', port=server.port)
+    """
+
+    def __init__(self, latency: float = 0.0, host: str = '127.0.0.1'):
+        self.latency = latency
+        self.host = host
+        self.port = None
+        self._sock = None
+        self._transports = []
+        self._running = False
+
+    def start(self) -> 'LocalSSHServer':
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, 0))
+        self._sock.listen(128)
+        self.port = self._sock.getsockname()[1]
+        self._running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._running = False
+        for transport in self._transports:
+            transport.close()
+        if self._sock:
+            self._sock.close()
+
+    def _accept_loop(self) -> None:
+        while self._running:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        # Emulate the handshake round trip
+        if self.latency:
+            time.sleep(self.latency)
+        # Like sshd, do not hold back small writes waiting for ACKs
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        transport = paramiko.Transport(conn)
+        transport.add_server_key(_get_host_key())
+        transport.set_subsystem_handler('sftp', paramiko.SFTPServer, _LocalSFTPServer)
+        self._transports.append(transport)
+        try:
+            transport.start_server(server=_StandInServer(self.latency))
+        except Exception as e:
+            logger.debug(f"Stand-in handshake failed: {str(e)}")
+
+    def __enter__(self) -> 'LocalSSHServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,294 @@
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Commands used to collect each metric on the remote server. Everything but
+# the root filesystem usage comes straight from /proc: no process is forked
+# besides cat, and all sizes are bytes. Counters (CPU time, network and disk
+# I/O) are turned into rates locally by RateTracker.
+METRIC_COMMANDS = {
+    'cpu': "head -n1 /proc/stat",
+    'memory': "cat /proc/meminfo",
+    'disk': "df -P -B1 /",
+    'load': "cat /proc/loadavg",
+    'uptime': "cat /proc/uptime",
+    'network': "cat /proc/net/dev",
+    'diskstats': "cat /proc/diskstats"
+}
+
+# Bytes per sector in /proc/diskstats, regardless of the device's sector size
+DISKSTATS_SECTOR_SIZE = 512
+
+# Block devices left out of disk I/O totals: virtual devices and partitions or
+# device-mapper volumes whose I/O is already counted on the underlying disk
+DISKSTATS_IGNORED_PREFIXES = ('loop', 'ram', 'zram', 'sr', 'fd', 'dm-', 'md')
+
+# Marker prefix used to delimit sections in the collector script output
+SECTION_MARKER = '@@infrawhiz'
+
+
+def build_collector_script(commands: Optional[Dict[str, str]] = None) -> str:
+    """
+    Build a single shell script that runs every metric command in one exec.
+
+    Each command's output is wrapped in begin/end marker lines, and the end
+    marker carries the command's exit code so failures can be reported per
+    section exactly like separate executions would.
+    """
+    commands = commands or METRIC_COMMANDS
+    parts = []
+    for name, command in commands.items():
+        parts.append(
+            f"echo '{SECTION_MARKER} begin {name}'; "
+            f"{{ {command}; }} 2>/dev/null; "
+            f"echo \"{SECTION_MARKER} end {name} $?\""
+        )
+    return '\n'.join(parts)
+
+
+# The collector script is static, so build it once
+COLLECTOR_SCRIPT = build_collector_script()
+
+
+def split_sections(output: str) -> Dict[str, Tuple[str, int]]:
+    """
+    Split collector script output into {section: (stdout, exit_code)}.
+
+    Sections without an end marker (e.g. the script was cut short) are dropped.
+    """
+    sections = {}
+    current = None
+    lines = []
+
+    for line in output.splitlines():
+        if line.startswith(SECTION_MARKER + ' '):
+            parts = line.split()
+            if len(parts) >= 3 and parts[1] == 'begin':
+                current = parts[2]
+                lines = []
+                continue
+            if len(parts) >= 4 and parts[1] == 'end' and parts[2] == current:
+                try:
+                    exit_code = int(parts[3])
+                except ValueError:
+                    exit_code = -1
+                sections[current] = ('\n'.join(lines), exit_code)
+                current = None
+                continue
+        if current is not None:
+            lines.append(line)
+
+    return sections
+
+
+def format_bytes(value: Optional[float], default: str = 'N/A') -> str:
+    """Format a byte count with a binary unit, e.g. 1536 -> '1.5 KiB'."""
+    if value is None:
+        return default
+    for unit in ('B', 'KiB', 'MiB', 'GiB', 'TiB'):
+        if abs(value) < 1024 or unit == 'TiB':
+            break
+        value /= 1024
+    return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+
+
+def _format_uptime(seconds: float) -> str:
+    """Format seconds like `uptime -p`, e.g. 'up 3 days, 2 hours, 5 minutes'."""
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    parts = [f"{value} {unit}{'s' if value != 1 else ''}"
+             for value, unit in ((days, 'day'), (hours, 'hour'), (minutes, 'minute')) if value]
+    return 'up ' + ', '.join(parts or ['0 minutes'])
+
+
+def _whole_disks(names) -> set:
+    """Return the device names that are not ignored and not partitions of another listed device."""
+    names = [name for name in names if not name.startswith(DISKSTATS_IGNORED_PREFIXES)]
+    return {
+        name for name in names
+        if not any(name != other and name.startswith(other) and name[len(other):].lstrip('p').isdigit()
+                   for other in names)
+    }
+
+
+def parse_metric(name: str, output: str, metrics: Dict[str, Any]) -> None:
+    """
+    Parse the output of a single metric command into the metrics dict.
+
+    Cumulative counters are stored under metrics['counters'] for RateTracker,
+    which replaces them with rates.
+    """
+    output = output.strip()
+    counters = metrics.setdefault('counters', {})
+
+    if name == 'cpu':
+        # cpu user nice system idle iowait irq softirq steal [guest guest_nice]
+        fields = [int(value) for value in output.split()[1:9]]
+        counters['cpu'] = (sum(fields), fields[3] + fields[4])
+
+    elif name == 'memory':
+        meminfo = {}
+        for line in output.splitlines():
+            key, _, value = line.partition(':')
+            value = value.split()
+            if value:
+                meminfo[key] = int(value[0]) * (1024 if value[1:] == ['kB'] else 1)
+        total = meminfo['MemTotal']
+        available = meminfo.get('MemAvailable',
+                                meminfo.get('MemFree', 0) + meminfo.get('Buffers', 0) + meminfo.get('Cached', 0))
+        metrics['memory_total'] = total
+        metrics['memory_used'] = total - available
+        metrics['memory_available'] = available
+        metrics['memory_percent'] = round((total - available) / total * 100, 1) if total else 0.0
+        if 'SwapTotal' in meminfo:
+            metrics['swap_total'] = meminfo['SwapTotal']
+            metrics['swap_used'] = meminfo['SwapTotal'] - meminfo.get('SwapFree', 0)
+
+    elif name == 'disk':
+        # Filesystem 1-blocks Used Available Capacity Mounted-on
+        fields = output.splitlines()[-1].split()
+        used, available = int(fields[-4]), int(fields[-3])
+        metrics['disk_total'] = int(fields[-5])
+        metrics['disk_used'] = used
+        metrics['disk_available'] = available
+        # Like df, relative to the space usable by unprivileged users
+        metrics['disk_percent'] = round(used / (used + available) * 100, 1) if used + available else 0.0
+
+    elif name == 'load':
+        load1, load5, load15 = map(float, output.split()[:3])
+        metrics['load_1'] = load1
+        metrics['load_5'] = load5
+        metrics['load_15'] = load15
+
+    elif name == 'uptime':
+        seconds = float(output.split()[0])
+        metrics['uptime_seconds'] = seconds
+        metrics['uptime'] = _format_uptime(seconds)
+
+    elif name == 'network':
+        interfaces = {}
+        for line in output.splitlines():
+            interface, separator, values = line.partition(':')
+            interface = interface.strip()
+            if not separator or interface == 'lo' or '|' in values:
+                continue
+            fields = values.split()
+            interfaces[interface] = (int(fields[0]), int(fields[8]))
+        counters['network'] = interfaces
+
+    elif name == 'diskstats':
+        devices = {}
+        for line in output.splitlines():
+            fields = line.split()
+            if len(fields) < 14:
+                continue
+            # reads, sectors read, writes, sectors written
+            devices[fields[2]] = (int(fields[3]), int(fields[5]), int(fields[7]), int(fields[9]))
+        whole = _whole_disks(devices)
+        counters['disks'] = {name: devices[name] for name in devices if name in whole}
+
+
+class RateTracker:
+    """
+    Turns the cumulative counters of consecutive samples into rates.
+
+    The previous sample's counters are kept per server. CPU usage is the busy
+    share of CPU time between the two samples; network and disk rates are
+    per second. A server's first sample reports CPU usage since boot and no
+    rates. Counters that went backwards (reboot, wrap) give no rate.
+    """
+
+    def __init__(self):
+        self._previous = {}  # server_id -> (timestamp, counters)
+        self.lock = threading.Lock()
+
+    def apply(self, server_id: str, metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace metrics['counters'] with totals and rates against the previous sample."""
+        counters = metrics.pop('counters', None)
+        if not counters:
+            return metrics
+        timestamp = metrics.get('timestamp') or time.time()
+
+        with self.lock:
+            previous = self._previous.get(server_id)
+            self._previous[server_id] = (timestamp, counters)
+
+        interval = None
+        old = {}
+        if previous and timestamp > previous[0]:
+            interval = timestamp - previous[0]
+            old = previous[1]
+            metrics['rate_interval'] = round(interval, 3)
+
+        if 'cpu' in counters:
+            total, idle = counters['cpu']
+            old_total, old_idle = old.get('cpu', (0, 0))
+            if total <= old_total:
+                old_total, old_idle = 0, 0
+            metrics['cpu_usage'] = round((1 - (idle - old_idle) / (total - old_total)) * 100, 1) \
+                if total > old_total else 0.0
+
+        def rate(new, old_value):
+            if interval is None or old_value is None or new < old_value:
+                return None
+            return round((new - old_value) / interval, 1)
+
+        if 'network' in counters:
+            interfaces = {}
+            for interface, (rx, tx) in counters['network'].items():
+                old_rx, old_tx = old.get('network', {}).get(interface, (None, None))
+                interfaces[interface] = {
+                    'rx_bytes': rx,
+                    'tx_bytes': tx,
+                    'rx_bytes_per_sec': rate(rx, old_rx),
+                    'tx_bytes_per_sec': rate(tx, old_tx)
+                }
+            metrics['network_interfaces'] = interfaces
+            metrics['network_rx'] = sum(entry['rx_bytes'] for entry in interfaces.values())
+            metrics['network_tx'] = sum(entry['tx_bytes'] for entry in interfaces.values())
+            if interval is not None:
+                metrics['network_rx_rate'] = sum(entry['rx_bytes_per_sec'] or 0 for entry in interfaces.values())
+                metrics['network_tx_rate'] = sum(entry['tx_bytes_per_sec'] or 0 for entry in interfaces.values())
+
+        if 'disks' in counters:
+            disks = {}
+            for disk, (reads, read_sectors, writes, written_sectors) in counters['disks'].items():
+                old_reads, old_read_sectors, old_writes, old_written_sectors = \
+                    old.get('disks', {}).get(disk, (None,) * 4)
+                read_rate = rate(read_sectors, old_read_sectors)
+                write_rate = rate(written_sectors, old_written_sectors)
+                disks[disk] = {
+                    'read_iops': rate(reads, old_reads),
+                    'write_iops': rate(writes, old_writes),
+                    'read_bytes_per_sec': read_rate * DISKSTATS_SECTOR_SIZE if read_rate is not None else None,
+                    'write_bytes_per_sec': write_rate * DISKSTATS_SECTOR_SIZE if write_rate is not None else None
+                }
+            metrics['disks'] = disks
+            if interval is not None:
+                metrics['disk_iops'] = round(sum((entry['read_iops'] or 0) + (entry['write_iops'] or 0)
+                                                 for entry in disks.values()), 1)
+                metrics['disk_read_rate'] = sum(entry['read_bytes_per_sec'] or 0 for entry in disks.values())
+                metrics['disk_write_rate'] = sum(entry['write_bytes_per_sec'] or 0 for entry in disks.values())
+
+        return metrics
+
+
+def parse_collector_output(output: str, metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """Parse the sectioned output of COLLECTOR_SCRIPT into the metrics dict."""
+    sections = split_sections(output)
+
+    for name in METRIC_COMMANDS:
+        if name not in sections:
+            logger.debug(f"Metric section '{name}' missing from collector output")
+            continue
+        section_output, exit_code = sections[name]
+        if exit_code == 0:
+            parse_metric(name, section_output, metrics)
+
+    return metrics
@@ -0,0 +1,162 @@
+import os
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Sequence
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Samples kept per server: a day of 10-second samples by default
+METRICS_BUFFER_SAMPLES = int(os.environ.get('METRICS_BUFFER_SAMPLES', 24 * 60 * 60 // 10))
+
+# Numeric metrics kept in the buffer, one float32 row each. With ten metrics
+# a server costs 44 bytes per sample: 380 KB for a day of 10-second samples,
+# or 380 MB for 1,000 servers.
+BUFFERED_METRICS = (
+    'cpu_usage',
+    'memory_percent',
+    'memory_used',
+    'disk_percent',
+    'load_1',
+    'network_rx_rate',
+    'network_tx_rate',
+    'disk_iops',
+    'disk_read_rate',
+    'disk_write_rate'
+)
+
+class MetricRingBuffer:
+    """
+    Fixed-size ring of samples for one server.
+
+    Values live in a (metrics x capacity) float32 array and timestamps in a
+    uint32 array, both allocated up front, so appending is O(1) and memory
+    does not grow. Metrics missing from a sample are stored as NaN and are
+    ignored by the aggregates, which run over whole rows at once.
+    """
+
+    def __init__(self, capacity: int = METRICS_BUFFER_SAMPLES,
+                 metrics: Sequence[str] = BUFFERED_METRICS):
+        self.capacity = max(capacity, 1)
+        self.metrics = tuple(metrics)
+        self._rows = {name: row for row, name in enumerate(self.metrics)}
+        self.values = np.full((len(self.metrics), self.capacity), np.nan, dtype=np.float32)
+        self.timestamps = np.zeros(self.capacity, dtype=np.uint32)
+        self.head = 0  # slot the next sample is written to
+        self.count = 0
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.timestamps.nbytes
+
+    def append(self, timestamp: float, sample: Dict[str, Any]) -> None:
+        """Store one sample, overwriting the oldest once the buffer is full."""
+        column = [sample.get(name) for name in self.metrics]
+        column = [np.nan if value is None else value for value in column]
+        with self.lock:
+            self.values[:, self.head] = column
+            self.timestamps[self.head] = int(timestamp)
+            self.head = (self.head + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def _select(self, names: Sequence[str], since: float, until: Optional[float]):
+        """Copy the timestamps and rows of samples in [since, until], oldest first."""
+        rows = [self._rows[name] for name in names]
+        with self.lock:
+            if self.count < self.capacity:
+                order = np.arange(self.count)
+            else:
+                # Oldest sample sits at head once the ring has wrapped
+                order = np.roll(np.arange(self.capacity), -self.head)
+            timestamps = self.timestamps[order]
+            mask = timestamps >= since
+            if until is not None:
+                mask &= timestamps <= until
+            return timestamps[mask], self.values[rows][:, order[mask]]
+
+    def aggregate(self, names: Optional[Sequence[str]] = None, since: float = 0,
+                  until: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Return count, min, max, mean and p95 of each metric over [since, until]."""
+        names = list(names or self.metrics)
+        _, values = self._select(names, since, until)
+
+        counts = np.count_nonzero(~np.isnan(values), axis=1)
+        result = {name: {'count': int(count), 'min': None, 'max': None, 'mean': None, 'p95': None}
+                  for name, count in zip(names, counts)}
+
+        # NaN-aware reductions warn on all-NaN rows, so only reduce rows with data
+        present = counts > 0
+        if present.any():
+            values = values[present].astype(np.float64)
+            stats = {
+                'min': np.nanmin(values, axis=1),
+                'max': np.nanmax(values, axis=1),
+                'mean': np.nanmean(values, axis=1),
+                'p95': np.nanpercentile(values, 95, axis=1)
+            }
+            for index, name in enumerate(np.asarray(names)[present]):
+                result[name].update({key: round(float(column[index]), 3)
+                                     for key, column in stats.items()})
+        return result
+
+    def series(self, names: Optional[Sequence[str]] = None, since: float = 0,
+               until: Optional[float] = None) -> Dict[str, List]:
+        """Return timestamps and per-metric values in [since, until], oldest first."""
+        names = list(names or self.metrics)
+        timestamps, values = self._select(names, since, until)
+        series = {'timestamps': timestamps.tolist()}
+        for name, row in zip(names, np.round(values.astype(np.float64), 3)):
+            row_values = row.astype(object)
+            row_values[np.isnan(row)] = None
+            series[name] = row_values.tolist()
+        return series
+
+class MetricsBuffer:
+    """Ring buffers of recent metrics for every server, created on first sample."""
+
+    def __init__(self, capacity: int = METRICS_BUFFER_SAMPLES,
+                 metrics: Sequence[str] = BUFFERED_METRICS):
+        self.capacity = capacity
+        self.metrics = tuple(metrics)
+        self._buffers = {}  # server_id -> MetricRingBuffer
+        self.lock = threading.Lock()
+
+    def record(self, server_id: str, metrics: Dict[str, Any]) -> None:
+        """Append a metrics dict from get_server_metrics to the server's buffer."""
+        buffer = self._buffers.get(server_id)
+        if buffer is None:
+            with self.lock:
+                buffer = self._buffers.get(server_id)
+                if buffer is None:
+                    buffer = self._buffers[server_id] = MetricRingBuffer(self.capacity, self.metrics)
+        buffer.append(metrics['timestamp'], metrics)
+
+    def get(self, server_id: str) -> Optional[MetricRingBuffer]:
+        """Return a server's buffer, or None if it has no samples."""
+        return self._buffers.get(server_id)
+
+    def unknown(self, names: Sequence[str]) -> List[str]:
+        """Return the names that are not buffered metrics."""
+        return [name for name in names if name not in self.metrics]
+
+    def remove(self, server_id: str) -> None:
+        """Drop a server's buffer."""
+        with self.lock:
+            self._buffers.pop(server_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of buffered servers and their memory footprint."""
+        with self.lock:
+            buffers = list(self._buffers.values())
+        return {
+            'servers': len(buffers),
+            'capacity': self.capacity,
+            'metrics': list(self.metrics),
+            'memory_bytes': sum(buffer.nbytes for buffer in buffers)
+        }
+
+# Create a singleton instance
+metrics_buffer = MetricsBuffer()
@@ -0,0 +1,418 @@
+import os
+import math
+import time
+import atexit
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Sequence
+import numpy as np
+import db
+from metrics_buffer import BUFFERED_METRICS
+from series_codec import Block, BlockEncoder
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Metrics stored as block columns, in this order. Blocks written with a
+# shorter list still decode, so new metrics must only be appended.
+HISTORY_METRICS = BUFFERED_METRICS
+
+# Raw samples are stored at resolution 0; rollups at these bucket widths (seconds)
+RESOLUTION_RAW = 0
+ROLLUP_RESOLUTIONS = (60, 300, 3600)
+
+# Seconds of history kept at each resolution
+HISTORY_RETENTION = {
+    RESOLUTION_RAW: int(os.environ.get('HISTORY_RETENTION_RAW', 2 * 86400)),
+    60: int(os.environ.get('HISTORY_RETENTION_1M', 14 * 86400)),
+    300: int(os.environ.get('HISTORY_RETENTION_5M', 90 * 86400)),
+    3600: int(os.environ.get('HISTORY_RETENTION_1H', 730 * 86400))
+}
+
+# Seconds of samples per stored block at each resolution; blocks start at
+# multiples of their span
+BLOCK_SPANS = {
+    RESOLUTION_RAW: 3600,
+    60: 6 * 3600,
+    300: 86400,
+    3600: 14 * 86400
+}
+
+# Samples recorded between writes, and the longest they wait for one
+HISTORY_BATCH_SIZE = int(os.environ.get('HISTORY_BATCH_SIZE', 500))
+HISTORY_FLUSH_INTERVAL = float(os.environ.get('HISTORY_FLUSH_INTERVAL', 10))
+
+# Seconds between retention sweeps
+HISTORY_PRUNE_INTERVAL = float(os.environ.get('HISTORY_PRUNE_INTERVAL', 3600))
+
+# Points returned for a range when the caller does not ask for a step
+HISTORY_MAX_POINTS = int(os.environ.get('HISTORY_MAX_POINTS', 1000))
+
+# Rows of a rollup: samples, sum, min and max of each metric. A rollup block
+# stores the four rows flattened, as 4 x len(HISTORY_METRICS) columns.
+_COUNT, _SUM, _MIN, _MAX = range(4)
+
+def _empty_rollup(width: int) -> np.ndarray:
+    rollup = np.zeros((4, width), dtype=np.float32)
+    rollup[_MIN:] = np.nan
+    return rollup
+
+class MetricsHistory:
+    """
+    Durable metrics time series in SQLite.
+
+    Samples are stored in compressed columnar blocks (see series_codec): one
+    row per series, resolution and BLOCK_SPANS-aligned block, in a WITHOUT
+    ROWID table, so a range read is one short index scan. Raw samples are
+    also folded into 1m, 5m and 1h rollup buckets (count, sum, min, max per
+    metric); a bucket is appended to its block when it closes, and the bucket
+    still filling is written along with it. Blocks being filled are encoded
+    incrementally in memory and written in batches; each resolution keeps its
+    own retention. SQLite is only touched outside the lock that guards the
+    blocks, so one server's write or restore never stalls another's samples.
+    Queries read the coarsest resolution that still resolves the requested
+    step and decode only the blocks and columns they need.
+    """
+
+    def __init__(self, metrics: Sequence[str] = HISTORY_METRICS,
+                 batch_size: int = HISTORY_BATCH_SIZE,
+                 flush_interval: float = HISTORY_FLUSH_INTERVAL,
+                 retention: Optional[Dict[int, int]] = None):
+        self.metrics = tuple(metrics)
+        self.width = len(self.metrics)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention = dict(retention or HISTORY_RETENTION)
+        self._series = {}  # server_id -> series id
+        self._blocks = {}  # (series_id, resolution) -> (block start, BlockEncoder) being filled
+        self._buckets = {}  # (series_id, rollup resolution) -> (bucket start, rollup) being filled
+        self._dirty = set()  # keys of blocks changed since they were last written
+        self._closed = []  # finished blocks awaiting a write: (series_id, resolution, start, data)
+        self._pending = {}  # (series_id, resolution, start) -> sealed block data awaiting a write
+        self._recorded = 0  # samples recorded since the last write
+        self._last_flush = time.monotonic()
+        self._last_prune = 0.0
+        self.lock = threading.Lock()
+        self._write_lock = threading.Lock()  # writes pending blocks one batch at a time
+
+    def _series_id(self, server_id: str, create: bool = True) -> Optional[int]:
+        series_id = self._series.get(server_id)
+        if series_id is None:
+            with db.get_connection() as conn:
+                row = conn.execute('SELECT id FROM metric_series WHERE server_id = ?',
+                                   (server_id,)).fetchone()
+                if not row and create:
+                    # Another thread may be creating the same series
+                    conn.execute('INSERT OR IGNORE INTO metric_series (server_id) VALUES (?)',
+                                 (server_id,))
+                    conn.commit()
+                    row = conn.execute('SELECT id FROM metric_series WHERE server_id = ?',
+                                       (server_id,)).fetchone()
+            if not row:
+                return None
+            series_id = self._series.setdefault(server_id, row['id'])
+        return series_id
+
+    def _columns(self, resolution: int) -> int:
+        return self.width if resolution == RESOLUTION_RAW else 4 * self.width
+
+    def _load(self, series_id: int, resolution: int, ts: int) -> Optional[bytes]:
+        """Read the stored block holding ts, if any. Called without the lock."""
+        start = ts - ts % BLOCK_SPANS[resolution]
+        with db.get_connection() as conn:
+            row = conn.execute('SELECT data FROM metric_blocks WHERE series_id = ? AND resolution = ? '
+                               'AND ts = ?', (series_id, resolution, start)).fetchone()
+        return row['data'] if row else None
+
+    def _restore(self, series_id: int, resolution: int, ts: int, data: Optional[bytes]) -> None:
+        """Start filling the block holding ts from its stored data, so new samples extend it."""
+        span = BLOCK_SPANS[resolution]
+        start = ts - ts % span
+        key = (series_id, resolution)
+        encoder = BlockEncoder(self._columns(resolution))
+        self._blocks[key] = (start, encoder)
+        if data is None:
+            return
+
+        block = Block(data)
+        timestamps = block.timestamps.tolist()
+        columns = block.columns(range(self._columns(resolution)))
+        if resolution != RESOLUTION_RAW and timestamps:
+            # The last rollup may be a bucket that was still filling when written
+            bucket = timestamps.pop()
+            self._buckets[key] = (bucket, columns[:, -1].reshape(4, self.width).copy())
+        for index, sample_ts in enumerate(timestamps):
+            encoder.append(sample_ts, columns[:, index])
+
+    def _block_for(self, series_id: int, resolution: int, ts: int) -> Optional[BlockEncoder]:
+        """Return the encoder of the block holding ts, closing the previous block if needed."""
+        key = (series_id, resolution)
+        span = BLOCK_SPANS[resolution]
+        start = ts - ts % span
+        current_start, encoder = self._blocks[key]
+        if start == current_start:
+            return encoder
+        if start < current_start:
+            # Blocks before the one being filled are final
+            return None
+
+        self._closed.append((series_id, resolution, current_start, encoder.to_bytes()))
+        self._dirty.discard(key)
+        encoder = BlockEncoder(self._columns(resolution))
+        self._blocks[key] = (start, encoder)
+        return encoder
+
+    def record(self, server_id: str, metrics: Dict[str, Any]) -> None:
+        """Append a metrics sample and update its rollups; writes happen in batches."""
+        values = np.array([np.nan if metrics.get(name) is None else metrics[name]
+                           for name in self.metrics], dtype=np.float32)
+        present = ~np.isnan(values)
+        ts = int(metrics['timestamp'])
+
+        # Read what a first sample needs from SQLite before taking the lock
+        series_id = self._series_id(server_id)
+        stored = {resolution: self._load(series_id, resolution, ts)
+                  for resolution in (RESOLUTION_RAW,) + ROLLUP_RESOLUTIONS
+                  if (series_id, resolution) not in self._blocks}
+
+        with self.lock:
+            for resolution, data in stored.items():
+                if (series_id, resolution) not in self._blocks:
+                    self._restore(series_id, resolution, ts, data)
+
+            encoder = self._block_for(series_id, RESOLUTION_RAW, ts)
+            if encoder is None:
+                logger.debug(f"Dropping late metrics sample for server {server_id} at {ts}")
+                return
+            encoder.append(ts, values)
+            self._dirty.add((series_id, RESOLUTION_RAW))
+
+            for resolution in ROLLUP_RESOLUTIONS:
+                key = (series_id, resolution)
+                bucket = ts - ts % resolution
+                current = self._buckets.get(key)
+                if current is None or bucket > current[0]:
+                    if current:
+                        # The previous bucket is complete: append it to its block
+                        closed = self._block_for(series_id, resolution, current[0])
+                        if closed is not None:
+                            closed.append(current[0], current[1].reshape(-1))
+                    current = self._buckets[key] = (bucket, _empty_rollup(self.width))
+                elif bucket < current[0]:
+                    # Closed buckets are final; the raw block still has the sample
+                    continue
+
+                rollup = current[1]
+                rollup[_COUNT] += present
+                rollup[_SUM] += np.where(present, values, 0)
+                rollup[_MIN] = np.fmin(rollup[_MIN], values)
+                rollup[_MAX] = np.fmax(rollup[_MAX], values)
+                self._dirty.add(key)
+
+            self._recorded += 1
+            due = (self._recorded >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+            if due:
+                self._seal()
+
+        if due:
+            self._write_pending()
+
+    def flush(self) -> int:
+        """Write every changed block now; returns the number of blocks written."""
+        with self.lock:
+            self._seal()
+        return self._write_pending()
+
+    def _seal(self) -> None:
+        """Encode changed blocks for writing. Called with the lock held."""
+        rows = self._closed
+        for key in self._dirty:
+            series_id, resolution = key
+            start, encoder = self._blocks[key]
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rows.append((series_id, resolution, start, encoder.to_bytes()))
+                continue
+
+            # Write the bucket still filling as the last entry of its block;
+            # it is rewritten as it fills and restored after a restart
+            bucket_start, rollup = bucket
+            entry = (bucket_start, rollup.reshape(-1))
+            if bucket_start - bucket_start % BLOCK_SPANS[resolution] == start:
+                rows.append((series_id, resolution, start, encoder.to_bytes(extra=entry)))
+            else:
+                rows.append((series_id, resolution, start, encoder.to_bytes()))
+                empty = BlockEncoder(self._columns(resolution))
+                rows.append((series_id, resolution, bucket_start - bucket_start % BLOCK_SPANS[resolution],
+                             empty.to_bytes(extra=entry)))
+
+        # A later seal of the same block replaces one not yet written
+        self._pending.update(((series_id, resolution, start), data)
+                             for series_id, resolution, start, data in rows)
+        self._closed = []
+        self._dirty = set()
+        self._recorded = 0
+        self._last_flush = time.monotonic()
+
+    def _write_pending(self) -> int:
+        """Write sealed blocks without holding the lock; returns the number written."""
+        with self._write_lock:
+            # Taken under the write lock, so a batch never overwrites a newer one
+            with self.lock:
+                pending, self._pending = self._pending, {}
+            prune = time.monotonic() - self._last_prune >= HISTORY_PRUNE_INTERVAL
+            if not pending and not prune:
+                return 0
+
+            with db.get_connection() as conn:
+                conn.executemany('INSERT OR REPLACE INTO metric_blocks (series_id, resolution, ts, data) '
+                                 'VALUES (?, ?, ?, ?)', [key + (data,) for key, data in pending.items()])
+                if prune:
+                    self._prune(conn)
+                conn.commit()
+            return len(pending)
+
+    def _prune(self, conn) -> None:
+        """Delete blocks whose newest samples are past retention, one index range per series."""
+        now = int(time.time())
+        series_ids = [row['id'] for row in conn.execute('SELECT id FROM metric_series')]
+        conn.executemany(
+            'DELETE FROM metric_blocks WHERE series_id = ? AND resolution = ? AND ts <= ?',
+            [(series_id, resolution, now - keep - BLOCK_SPANS[resolution])
+             for series_id in series_ids for resolution, keep in self.retention.items()]
+        )
+        self._last_prune = time.monotonic()
+
+    def remove(self, server_id: str) -> None:
+        """Delete a server's history."""
+        series_id = self._series_id(server_id, create=False)
+        if series_id is None:
+            return
+        with self.lock:
+            for state in (self._blocks, self._buckets, self._pending):
+                for key in [key for key in state if key[0] == series_id]:
+                    del state[key]
+            self._dirty = {key for key in self._dirty if key[0] != series_id}
+            self._closed = [row for row in self._closed if row[0] != series_id]
+            self._series.pop(server_id, None)
+
+        with self._write_lock:
+            with db.get_connection() as conn:
+                conn.execute('DELETE FROM metric_blocks WHERE series_id = ?', (series_id,))
+                conn.execute('DELETE FROM metric_series WHERE id = ?', (series_id,))
+                conn.commit()
+
+    def choose_resolution(self, start: float, end: float, step: Optional[float] = None,
+                          now: Optional[float] = None) -> int:
+        """Return the coarsest resolution no wider than step that still covers start."""
+        now = now if now is not None else time.time()
+        if step is None:
+            step = (end - start) / HISTORY_MAX_POINTS
+        resolutions = sorted(self.retention)
+        covering = [r for r in resolutions if now - self.retention[r] <= start]
+        if not covering:
+            # Older than every retention: the longest-lived resolution has the most
+            return max(resolutions, key=lambda r: self.retention[r])
+        fitting = [r for r in covering if r <= step]
+        return max(fitting) if fitting else min(covering)
+
+    def query(self, server_id: str, start: float, end: float, step: Optional[float] = None,
+              metrics: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Return a server's metrics between start and end.
+
+        Each metric has mean, min and max per point. Points are step seconds
+        apart when step is coarser than the resolution read.
+        """
+        names = list(metrics or self.metrics)
+        columns = [self.metrics.index(name) for name in names]
+        resolution = self.choose_resolution(start, end, step)
+        if resolution != RESOLUTION_RAW:
+            # count, sum, min and max columns of each requested metric
+            columns = [part * self.width + column for part in range(4) for column in columns]
+
+        with self.lock:
+            self._seal()
+        self._write_pending()
+        series_id = self._series_id(server_id, create=False)
+        rows = []
+        if series_id is not None:
+            with db.get_connection() as conn:
+                rows = conn.execute(
+                    'SELECT data FROM metric_blocks WHERE series_id = ? AND resolution = ? '
+                    'AND ts > ? AND ts <= ? ORDER BY ts',
+                    (series_id, resolution, int(start) - BLOCK_SPANS[resolution], int(end))
+                ).fetchall()
+
+        # Decode only the blocks with samples in range, and only the requested columns
+        lower = int(start) - resolution
+        timestamps, values = [], []
+        for row in rows:
+            block = Block(row['data'])
+            block_timestamps = block.timestamps
+            mask = (block_timestamps > lower if resolution else block_timestamps >= start) & \
+                (block_timestamps <= end)
+            if mask.any():
+                timestamps.append(block_timestamps[mask])
+                values.append(block.columns(columns)[:, mask])
+        timestamps = np.concatenate(timestamps) if timestamps else np.empty(0, dtype=np.int64)
+        values = np.concatenate(values, axis=1) if values else \
+            np.empty((len(columns), 0), dtype=np.float32)
+        order = np.argsort(timestamps, kind='stable')
+        timestamps, values = timestamps[order], values[:, order].T.astype(np.float64)
+
+        if resolution == RESOLUTION_RAW:
+            present = ~np.isnan(values)
+            rollups = np.stack([present.astype(np.float64), np.where(present, values, 0),
+                                values, values], axis=1)
+        else:
+            rollups = values.reshape(len(timestamps), 4, len(names))
+
+        if step is None and len(timestamps) > HISTORY_MAX_POINTS:
+            step = math.ceil((end - start) / HISTORY_MAX_POINTS)
+
+        if step and step > resolution and len(timestamps):
+            # Merge rows into step-wide points, aligned to multiples of step
+            step = math.ceil(step)
+            points = timestamps - timestamps % step
+            timestamps, starts = np.unique(points, return_index=True)
+            rollups = np.stack([
+                np.add.reduceat(rollups[:, _COUNT], starts),
+                np.add.reduceat(rollups[:, _SUM], starts),
+                np.fmin.reduceat(rollups[:, _MIN], starts),
+                np.fmax.reduceat(rollups[:, _MAX], starts)
+            ], axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = rollups[:, _SUM] / rollups[:, _COUNT]
+
+        def column(array, index):
+            values = np.round(array[:, index], 3)
+            result = values.astype(object)
+            result[np.isnan(values)] = None
+            return result.tolist()
+
+        return {
+            'server_id': server_id,
+            'from': int(start),
+            'to': int(end),
+            'resolution': resolution,
+            'step': math.ceil(step) if step and step > resolution else resolution,
+            'timestamps': timestamps.tolist(),
+            'metrics': {
+                name: {
+                    'mean': column(means, index),
+                    'min': column(rollups[:, _MIN], index),
+                    'max': column(rollups[:, _MAX], index)
+                }
+                for index, name in enumerate(names)
+            }
+        }
+
+# Create a singleton instance
+metrics_history = MetricsHistory()
+
+# Do not lose the last partial batch on shutdown
+atexit.register(metrics_history.flush)
@@ -0,0 +1,97 @@
+import os
+import time
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, List, Optional
+from ssh_manager import ssh_manager
+from metrics_buffer import metrics_buffer
+from metrics_history import metrics_history
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds a collected sample is served to on-demand requests instead of collecting again
+METRICS_FRESHNESS = float(os.environ.get('METRICS_FRESHNESS', 10))
+
+# server_id -> (monotonic time collected, latest successful sample)
+_latest = {}
+
+# server_id -> Future of the collection in progress, shared by concurrent callers
+_inflight = {}
+
+# Callables invoked with (server_id, metrics) once per collection
+_listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+
+_lock = threading.Lock()
+
+def collect_metrics(server_id: str, max_age: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Return metrics for a connected server, collecting only when needed.
+
+    A sample collected within max_age seconds (METRICS_FRESHNESS by default)
+    is returned as is, marked 'cached'. Otherwise the server is asked once,
+    however many callers arrive while that collection runs; successful
+    samples are stored and every collection is passed to the listeners.
+    """
+    max_age = METRICS_FRESHNESS if max_age is None else max_age
+    with _lock:
+        latest = _latest.get(server_id)
+        if latest and time.monotonic() - latest[0] <= max_age:
+            return {**latest[1], 'cached': True}
+
+        future = _inflight.get(server_id)
+        owner = future is None
+        if owner:
+            future = _inflight[server_id] = Future()
+
+    if not owner:
+        return future.result()
+
+    try:
+        metrics = ssh_manager.get_server_metrics(server_id)
+        if metrics.get('success'):
+            record_metrics(server_id, metrics)
+            with _lock:
+                _latest[server_id] = (time.monotonic(), metrics)
+        future.set_result(metrics)
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(server_id, None)
+
+    for listener in list(_listeners):
+        try:
+            listener(server_id, metrics)
+        except Exception as e:
+            logger.error(f"Error publishing metrics for server {server_id}: {str(e)}")
+    return metrics
+
+def latest_metrics(server_id: str) -> Optional[Dict[str, Any]]:
+    """Return the last successful sample for a server, however old, or None."""
+    latest = _latest.get(server_id)
+    return latest[1] if latest else None
+
+def add_metrics_listener(listener: Callable[[str, Dict[str, Any]], None]) -> None:
+    """Call listener(server_id, metrics) after every collection."""
+    _listeners.append(listener)
+
+def forget_metrics(server_id: str) -> None:
+    """Drop a server's latest sample."""
+    with _lock:
+        _latest.pop(server_id, None)
+
+def record_metrics(server_id: str, metrics: Dict[str, Any]) -> None:
+    """Store a successful metrics sample in the in-memory ring buffer and the history store."""
+    try:
+        metrics_buffer.record(server_id, metrics)
+    except Exception as e:
+        logger.error(f"Error buffering metrics for server {server_id}: {str(e)}")
+
+    try:
+        metrics_history.record(server_id, metrics)
+    except Exception as e:
+        logger.error(f"Error storing metrics history for server {server_id}: {str(e)}")
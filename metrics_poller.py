@@ -0,0 +1,152 @@
+import os
+import time
+import heapq
+import random
+import threading
+import logging
+from typing import Dict, Any, List, Optional
+import db
+from ssh_manager import ssh_manager
+from fanout import FanOutExecutor, server_host_key
+from metrics_pipeline import collect_metrics
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds between polls of each server
+METRICS_POLL_INTERVAL = float(os.environ.get('METRICS_POLL_INTERVAL', 10))
+
+# Each poll is scheduled up to this fraction of the interval early or late,
+# so servers added together drift apart instead of being polled in lockstep
+METRICS_POLL_JITTER = float(os.environ.get('METRICS_POLL_JITTER', 0.1))
+
+# Servers polled at once
+METRICS_POLL_CONCURRENCY = int(os.environ.get('METRICS_POLL_CONCURRENCY', 16))
+
+class MetricsPoller:
+    """
+    Background scheduler that collects metrics from every server.
+
+    Each server has its own due time in a heap. New servers start at a random
+    offset within one interval, and every poll is rescheduled one jittered
+    interval after the last due time, so load spreads evenly across the
+    interval instead of arriving in bursts. Polls run on a fan-out executor,
+    one at a time per host, through collect_metrics: the sample is stored
+    once and pushed to its listeners, and on-demand requests within the
+    freshness window are served from it instead of reaching the server.
+    """
+
+    def __init__(self, manager, interval: float = METRICS_POLL_INTERVAL,
+                 jitter: float = METRICS_POLL_JITTER,
+                 concurrency: int = METRICS_POLL_CONCURRENCY):
+        self.manager = manager
+        self.interval = interval
+        self.jitter = jitter
+        self._executor = FanOutExecutor(max_workers=concurrency, per_host_limit=1)
+        self._servers = {}  # server_id -> server record
+        self._schedule = []  # heap of (due, server_id)
+        self._polling = set()  # server ids with a poll in progress
+        self._last_refresh = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.lock = threading.Lock()
+        self._stats = {'polls': 0, 'failures': 0, 'skipped': 0, 'last_poll': None}
+
+    def start(self) -> None:
+        """Start the scheduler thread if it is not already running."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='metrics-poller', daemon=True)
+        self._thread.start()
+        logger.info(f"Metrics polling started (every {self.interval}s, ±{self.jitter:.0%} jitter)")
+
+    def stop(self) -> None:
+        """Stop the scheduler thread; polls already running finish on their own."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _next_interval(self) -> float:
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                delay = self.run_once()
+            except Exception as e:
+                logger.error(f"Error scheduling metrics polls: {str(e)}")
+                delay = self.interval
+            self._stop.wait(delay)
+
+    def refresh(self, servers: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Sync the schedule with the server list (all servers in the database by default)."""
+        if servers is None:
+            servers = db.get_servers(include_credentials=True)
+        servers = {server['id']: server for server in servers}
+        now = time.monotonic()
+        with self.lock:
+            for server_id in servers.keys() - self._servers.keys():
+                heapq.heappush(self._schedule, (now + random.uniform(0, self.interval), server_id))
+            self._servers = servers
+            # Entries of removed servers are dropped when they come due
+            self._last_refresh = now
+
+    def run_once(self) -> float:
+        """Start every poll that is due; returns the seconds until the next one."""
+        if self._last_refresh is None or time.monotonic() - self._last_refresh >= self.interval:
+            self.refresh()
+
+        now = time.monotonic()
+        with self.lock:
+            while self._schedule and self._schedule[0][0] <= now:
+                due, server_id = heapq.heappop(self._schedule)
+                server = self._servers.get(server_id)
+                if server is None:
+                    continue
+
+                next_due = due + self._next_interval()
+                if next_due <= now:
+                    # Fell behind (e.g. a slow pass); restart the cadence from now
+                    next_due = now + self._next_interval()
+                heapq.heappush(self._schedule, (next_due, server_id))
+
+                if server_id in self._polling:
+                    # The previous poll of this server has not finished yet
+                    self._stats['skipped'] += 1
+                    continue
+                self._polling.add(server_id)
+                self._executor.submit(server_host_key(server), self._poll_one, server)
+
+            return max(self._schedule[0][0] - now, 0) if self._schedule else self.interval
+
+    def _poll_one(self, server: Dict[str, Any]) -> None:
+        success = False
+        try:
+            if self.manager.ensure_connected(server):
+                # A sample collected within half an interval (e.g. on demand) counts as this poll
+                success = collect_metrics(server['id'], max_age=self.interval / 2).get('success', False)
+        except Exception as e:
+            logger.error(f"Error polling metrics from server {server['id']}: {str(e)}")
+        finally:
+            with self.lock:
+                self._polling.discard(server['id'])
+                self._stats['polls'] += 1
+                self._stats['failures'] += not success
+                self._stats['last_poll'] = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return scheduler statistics."""
+        with self.lock:
+            return {
+                'running': bool(self._thread and self._thread.is_alive()),
+                'interval': self.interval,
+                'jitter': self.jitter,
+                'servers': len(self._servers),
+                'polling': len(self._polling),
+                **self._stats
+            }
+
+# Create a singleton instance
+metrics_poller = MetricsPoller(ssh_manager)
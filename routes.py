@@ -1,9 +1,23 @@
+import os
+import math
+import time
 import logging
 from flask import Blueprint, request, jsonify, current_app
 from typing import Dict, Any, List, Optional
 import db
 from ssh_manager import ssh_manager
 from ai_agent import ai_agent
+from fanout import fanout, server_host_key
+from warmup import connection_warmer, WARMUP_ENABLED
+from file_distribution import file_distributor
+from websocket import socketio
+from metrics import format_bytes
+from metrics_pipeline import collect_metrics, forget_metrics
+from history_writer import history_writer
+from metrics_poller import metrics_poller
+from metrics_buffer import metrics_buffer
+from metrics_history import metrics_history
+from downsample import chart_series, CHART_POINTS, CHART_MAX_POINTS, CHART_OVERSAMPLE
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -12,6 +26,13 @@ logger = logging.getLogger(__name__)
 # Create blueprint
 api = Blueprint('api', __name__, url_prefix='/api')
 
+# Largest page of command history returned at once
+COMMAND_HISTORY_MAX_LIMIT = 500
+
+# Largest page of search results, and the deepest a search may page
+COMMAND_SEARCH_MAX_LIMIT = 100
+COMMAND_SEARCH_MAX_OFFSET = 10000
+
 @api.route('/servers', methods=['GET'])
 def get_servers():
     """Get all configured servers."""
@@ -63,6 +84,10 @@ def add_server():
             port=data.get('port', 22)
         )
         
+        # Connect in the background so the first query does not pay for the handshake
+        if WARMUP_ENABLED:
+            connection_warmer.warm([db.get_server(server['id'])], reason='server_added')
+        
         return jsonify(server), 201
     except Exception as e:
         logger.error(f"Error adding server: {str(e)}")
@@ -101,6 +126,9 @@ def delete_server(server_id):
     try:
         # Disconnect if connected
         ssh_manager.disconnect(server_id)
+        metrics_buffer.remove(server_id)
+        metrics_history.remove(server_id)
+        forget_metrics(server_id)
         
         # Delete from database
         success = db.delete_server(server_id)
@@ -135,7 +163,7 @@ def connect_server(server_id):
         if success:
             return jsonify({'success': True}), 200
         
-        return jsonify({'error': 'Failed to connect to server'}), 500
+        return _connect_failed(server)
     except Exception as e:
         logger.error(f"Error connecting to server {server_id}: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -183,13 +211,13 @@ def execute_command(server_id):
             )
             
             if not success:
-                return jsonify({'error': 'Failed to connect to server'}), 500
+                return _connect_failed(server)
         
         # Execute the command
         result = ssh_manager.execute_command(server_id, command)
         
         # Log the command to history
-        db.add_command_history(
+        history_writer.add(
             server_id=server_id,
             command=command,
             output=result.get('stdout', '') + '\n' + result.get('stderr', ''),
@@ -203,7 +231,7 @@ def execute_command(server_id):
 
 @api.route('/servers/<server_id>/metrics', methods=['GET'])
 def get_server_metrics(server_id):
-    """Get metrics from a server."""
+    """Get metrics from a server, or its latest sample if still fresh."""
     try:
         # Get the server
         server = db.get_server(server_id)
@@ -223,30 +251,405 @@ def get_server_metrics(server_id):
             )
             
             if not success:
-                return jsonify({'error': 'Failed to connect to server'}), 500
+                return _connect_failed(server)
         
         # Get metrics
-        metrics = ssh_manager.get_server_metrics(server_id)
+        metrics = collect_metrics(server_id)
         
         return jsonify(metrics), 200
     except Exception as e:
         logger.error(f"Error getting metrics from server {server_id}: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def _buffer_query(server_id: str):
+    """Parse window and metrics arguments for the in-memory buffer endpoints."""
+    window = request.args.get('window', 3600, type=float)
+    names = [name for name in request.args.get('metrics', '').split(',') if name]
+    unknown = metrics_buffer.unknown(names)
+    if unknown:
+        return None, (jsonify({'error': f"Unknown metrics: {', '.join(unknown)}"}), 400)
+    
+    buffer = metrics_buffer.get(server_id)
+    if buffer is None:
+        return None, (jsonify({'error': 'No metrics collected for this server yet'}), 404)
+    
+    return (buffer, names or None, time.time() - window), None
+
+@api.route('/servers/<server_id>/metrics/summary', methods=['GET'])
+def get_server_metrics_summary(server_id):
+    """Get min/max/mean/p95 of recently collected metrics."""
+    try:
+        query, error = _buffer_query(server_id)
+        if error:
+            return error
+        buffer, names, since = query
+        
+        return jsonify({
+            'server_id': server_id,
+            'from': int(since),
+            'aggregates': buffer.aggregate(names, since)
+        }), 200
+    except Exception as e:
+        logger.error(f"Error summarizing metrics for server {server_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/servers/<server_id>/metrics/recent', methods=['GET'])
+def get_server_metrics_recent(server_id):
+    """Get recently collected metric samples, oldest first."""
+    try:
+        query, error = _buffer_query(server_id)
+        if error:
+            return error
+        buffer, names, since = query
+        
+        return jsonify({
+            'server_id': server_id,
+            'from': int(since),
+            'series': buffer.series(names, since)
+        }), 200
+    except Exception as e:
+        logger.error(f"Error retrieving recent metrics for server {server_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/servers/<server_id>/metrics/history', methods=['GET'])
+def get_server_metrics_history(server_id):
+    """
+    Get stored metrics between ?from= and ?to= (unix seconds; default the last hour).
+    
+    ?step= sets the seconds between points; the cheapest stored resolution
+    for it is read. ?metrics=a,b limits the metrics returned.
+    """
+    try:
+        now = time.time()
+        end = request.args.get('to', now, type=float)
+        start = request.args.get('from', end - 3600, type=float)
+        step = request.args.get('step', type=float)
+        names = [name for name in request.args.get('metrics', '').split(',') if name]
+        
+        if start > end:
+            return jsonify({'error': "'from' must not be after 'to'"}), 400
+        if step is not None and step <= 0:
+            return jsonify({'error': "'step' must be positive"}), 400
+        unknown = [name for name in names if name not in metrics_history.metrics]
+        if unknown:
+            return jsonify({'error': f"Unknown metrics: {', '.join(unknown)}"}), 400
+        
+        if not db.get_server(server_id):
+            return jsonify({'error': 'Server not found'}), 404
+        
+        return jsonify(metrics_history.query(server_id, start, end, step, names or None)), 200
+    except Exception as e:
+        logger.error(f"Error retrieving metrics history for server {server_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/servers/<server_id>/metrics/chart', methods=['GET'])
+def get_server_metrics_chart(server_id):
+    """
+    Get chart-ready metric series between ?from= and ?to= (default the last hour).
+    
+    Each series holds at most ?points= points, picked from the stored
+    history with LTTB so peaks and dips stay visible at any range.
+    """
+    try:
+        now = time.time()
+        end = request.args.get('to', now, type=float)
+        start = request.args.get('from', end - 3600, type=float)
+        points = request.args.get('points', CHART_POINTS, type=int)
+        names = [name for name in request.args.get('metrics', '').split(',') if name]
+        
+        if start >= end:
+            return jsonify({'error': "'from' must be before 'to'"}), 400
+        if not 3 <= points <= CHART_MAX_POINTS:
+            return jsonify({'error': f"'points' must be between 3 and {CHART_MAX_POINTS}"}), 400
+        unknown = [name for name in names if name not in metrics_history.metrics]
+        if unknown:
+            return jsonify({'error': f"Unknown metrics: {', '.join(unknown)}"}), 400
+        
+        if not db.get_server(server_id):
+            return jsonify({'error': 'Server not found'}), 404
+        
+        # Read a bounded number of stored points, however wide the range
+        step = (end - start) / (points * CHART_OVERSAMPLE)
+        history = metrics_history.query(server_id, start, end, step, names or None)
+        return jsonify(chart_series(history, points)), 200
+    except Exception as e:
+        logger.error(f"Error building metrics chart for server {server_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/servers/<server_id>/pool', methods=['GET'])
+def get_server_pool(server_id):
+    """Get SSH connection pool statistics for a server."""
+    try:
+        stats = ssh_manager.pool_stats(server_id)
+        
+        if stats is None:
+            return jsonify({'error': 'Server not connected or not found'}), 404
+        
+        return jsonify(stats), 200
+    except Exception as e:
+        logger.error(f"Error retrieving pool stats for server {server_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/servers/<server_id>/circuit', methods=['GET'])
+def get_server_circuit(server_id):
+    """Get the connect circuit breaker status for a server's host."""
+    try:
+        server = db.get_server(server_id)
+        if not server:
+            return jsonify({'error': 'Server not found'}), 404
+        
+        status = ssh_manager.host_status(server)
+        if status is None:
+            # No connect has failed yet
+            status = {
+                'host': f"{server['hostname']}:{server.get('port', 22)}",
+                'state': 'closed',
+                'available': True,
+                'failures': 0
+            }
+        
+        return jsonify(status), 200
+    except Exception as e:
+        logger.error(f"Error retrieving circuit status for server {server_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/metrics/poller', methods=['GET'])
+def get_metrics_poller_status():
+    """Get background metrics polling statistics."""
+    try:
+        return jsonify(metrics_poller.stats()), 200
+    except Exception as e:
+        logger.error(f"Error retrieving metrics poller status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/warmup', methods=['GET'])
+def get_warmup_status():
+    """Get progress and timings of recent connection warm-ups."""
+    try:
+        return jsonify(connection_warmer.status()), 200
+    except Exception as e:
+        logger.error(f"Error retrieving warm-up status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/warmup', methods=['POST'])
+def start_warmup():
+    """Warm up connections to every server."""
+    try:
+        run = connection_warmer.warm_all(reason='manual')
+        return jsonify(run), 202
+    except Exception as e:
+        logger.error(f"Error starting warm-up: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/files/distribute', methods=['POST'])
+def distribute_file():
+    """
+    Push one local file to a list of servers.
+    
+    Per-host progress is emitted as 'distribution_progress' Socket.IO events
+    while the upload runs; the response summarizes every target. With
+    "sync": true each host is sent only what differs from its current copy.
+    """
+    try:
+        data = request.json
+        
+        # Validate required fields
+        required_fields = ['local_path', 'remote_path', 'server_ids']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'Missing required field: {field}'}), 400
+        
+        if not os.path.isfile(data['local_path']):
+            return jsonify({'error': f"Local file not found: {data['local_path']}"}), 400
+        
+        servers = []
+        for server_id in data['server_ids']:
+            server = db.get_server(server_id)
+            if not server:
+                return jsonify({'error': f'Server not found: {server_id}'}), 404
+            servers.append(server)
+        
+        if not servers:
+            return jsonify({'error': 'No servers to distribute to'}), 400
+        
+        def emit_progress(progress: Dict[str, Any]):
+            socketio.emit('distribution_progress', progress)
+        
+        summary = file_distributor.distribute(
+            data['local_path'], data['remote_path'], servers, on_progress=emit_progress,
+            sync=bool(data.get('sync', False))
+        )
+        socketio.emit('distribution_complete', {
+            key: value for key, value in summary.items() if key != 'hosts'
+        })
+        
+        return jsonify(summary), 200
+    except Exception as e:
+        logger.error(f"Error distributing file: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/servers/<server_id>/sync', methods=['POST'])
+def sync_files(server_id):
+    """
+    Sync a local file or directory tree to a server.
+    
+    Only changed files are sent, as deltas where possible. For a directory,
+    "delete": true also removes remote files that an earlier sync wrote and
+    that no longer exist locally.
+    """
+    try:
+        data = request.json
+        
+        # Validate required fields
+        required_fields = ['local_path', 'remote_path']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'Missing required field: {field}'}), 400
+        
+        local_path = data['local_path']
+        if not os.path.exists(local_path):
+            return jsonify({'error': f'Local path not found: {local_path}'}), 400
+        
+        server = db.get_server(server_id)
+        if not server:
+            return jsonify({'error': 'Server not found'}), 404
+        
+        if not hasattr(ssh_manager, 'sync_file'):
+            return jsonify({'error': 'Delta sync is not supported by this SSH backend'}), 501
+        
+        if not ssh_manager.ensure_connected(server):
+            return _connect_failed(server)
+        
+        if os.path.isdir(local_path):
+            result = ssh_manager.sync_directory(server_id, local_path, data['remote_path'],
+                                                delete=bool(data.get('delete', False)))
+        else:
+            result = ssh_manager.sync_file(server_id, local_path, data['remote_path'])
+        
+        return jsonify(result), 200 if result['success'] else 500
+    except Exception as e:
+        logger.error(f"Error syncing files to server {server_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def _connect_failed(server: Dict[str, Any]):
+    """Build the response for a failed connect; hosts known to be down get a 503."""
+    status = ssh_manager.host_status(server)
+    if status and not status['available']:
+        response = jsonify({
+            'error': ssh_manager.connect_error(server),
+            'host_status': status
+        })
+        response.headers['Retry-After'] = str(max(1, math.ceil(status['retry_after'])))
+        return response, 503
+    
+    return jsonify({'error': 'Failed to connect to server'}), 500
+
 @api.route('/command/history', methods=['GET'])
 def get_command_history():
-    """Get command execution history."""
+    """
+    Get command execution history, newest first, one page at a time.
+    
+    Filters: ?server_id=, ?exit_code=, ?from= and ?to= (unix seconds) and
+    ?command= (command prefix). ?limit= sets the page size; pass the
+    response's next_cursor as ?cursor= to get the next page.
+    
+    Entries carry metadata and output_size only; the output itself is
+    served by /command/history/<id>/output.
+    """
     try:
-        server_id = request.args.get('server_id')
         limit = request.args.get('limit', 50, type=int)
+        if not 1 <= limit <= COMMAND_HISTORY_MAX_LIMIT:
+            return jsonify({'error': f"'limit' must be between 1 and {COMMAND_HISTORY_MAX_LIMIT}"}), 400
+        
+        # Include commands still waiting in the write-behind queue
+        history_writer.flush()
+        page = db.query_command_history(
+            server_id=request.args.get('server_id'),
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            exit_code=request.args.get('exit_code', type=int),
+            since=request.args.get('from', type=float),
+            until=request.args.get('to', type=float),
+            command_prefix=request.args.get('command')
+        )
         
-        history = db.get_command_history(server_id, limit)
-        
-        return jsonify(history), 200
+        return jsonify(page), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error retrieving command history: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@api.route('/command/history/<command_id>/output', methods=['GET'])
+def get_command_output(command_id):
+    """Get the full output of one command history entry."""
+    try:
+        history_writer.flush()
+        output = db.get_command_output(command_id)
+        if output is None:
+            return jsonify({'error': 'Command history entry not found'}), 404
+        
+        return jsonify(output), 200
+    except Exception as e:
+        logger.error(f"Error retrieving output of command {command_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/command/search', methods=['GET'])
+def search_commands():
+    """
+    Search commands and their output, best match first.
+    
+    ?q= is the words to find (all must match; "quoted" words as a phrase,
+    word* as a prefix). Filters: ?server_id=, ?exit_code=, ?from= and ?to=
+    (unix seconds) and ?field= (command or output). ?sort=recent lists
+    matches newest first instead. ?limit= sets the page size; pass the
+    response's next_offset as ?offset= to get the next page.
+    
+    Each result has command_highlight and output_snippet as HTML: the text
+    is escaped and matches are wrapped in <mark> tags.
+    """
+    try:
+        query = request.args.get('q', '')
+        if not query.strip():
+            return jsonify({'error': "Missing 'q' parameter"}), 400
+        
+        limit = request.args.get('limit', 20, type=int)
+        offset = request.args.get('offset', 0, type=int)
+        if not 1 <= limit <= COMMAND_SEARCH_MAX_LIMIT:
+            return jsonify({'error': f"'limit' must be between 1 and {COMMAND_SEARCH_MAX_LIMIT}"}), 400
+        if not 0 <= offset <= COMMAND_SEARCH_MAX_OFFSET:
+            return jsonify({'error': f"'offset' must be between 0 and {COMMAND_SEARCH_MAX_OFFSET}"}), 400
+        
+        # Include commands still waiting in the write-behind queue
+        history_writer.flush()
+        results = db.search_command_history(
+            query,
+            server_id=request.args.get('server_id'),
+            exit_code=request.args.get('exit_code', type=int),
+            since=request.args.get('from', type=float),
+            until=request.args.get('to', type=float),
+            field=request.args.get('field'),
+            sort=request.args.get('sort', 'rank'),
+            limit=limit,
+            offset=offset
+        )
+        
+        return jsonify(results), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error searching command history: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/command/history/writer', methods=['GET'])
+def get_command_history_writer_status():
+    """Get queue depth and flush latency of the command history writer."""
+    try:
+        return jsonify(history_writer.stats()), 200
+    except Exception as e:
+        logger.error(f"Error retrieving command history writer status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @api.route('/process', methods=['POST'])
 def process_query():
     """
@@ -268,6 +671,158 @@ def process_query():
         logger.error(f"Error processing query: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def _process_server_query(server: Dict[str, Any], intent: str, action: str) -> Optional[Dict[str, Any]]:
+    """Run a parsed query against a single server and return its result entry."""
+    server_id = server['id']
+    server_name = server['name']
+
+    # Ensure connection is established
+    if not ssh_manager.ensure_connected(server):
+        return {
+            'server': server_name,
+            'success': False,
+            'message': ssh_manager.connect_error(server)
+        }
+
+    if intent == 'metrics':
+        # Get metrics from server
+        if action == 'cpu':
+            metrics = collect_metrics(server_id)
+            if metrics['success']:
+                return {
+                    'server': server_name,
+                    'success': True,
+                    'message': f"CPU usage on {server_name}: {metrics.get('cpu_usage', 'Unknown')}%",
+                    'data': {
+                        'cpu_usage': metrics.get('cpu_usage')
+                    }
+                }
+            else:
+                return {
+                    'server': server_name,
+                    'success': False,
+                    'message': f"Failed to get CPU metrics from {server_name}",
+                    'error': metrics.get('error', 'Unknown error')
+                }
+
+        elif action == 'memory':
+            metrics = collect_metrics(server_id)
+            if metrics['success']:
+                return {
+                    'server': server_name,
+                    'success': True,
+                    'message': (
+                        f"Memory usage on {server_name}: {metrics.get('memory_percent', 'Unknown')}% "
+                        f"({format_bytes(metrics.get('memory_used'), 'Unknown')} / "
+                        f"{format_bytes(metrics.get('memory_total'), 'Unknown')})"
+                    ),
+                    'data': {
+                        'memory_percent': metrics.get('memory_percent'),
+                        'memory_used': metrics.get('memory_used'),
+                        'memory_total': metrics.get('memory_total')
+                    }
+                }
+            else:
+                return {
+                    'server': server_name,
+                    'success': False,
+                    'message': f"Failed to get memory metrics from {server_name}",
+                    'error': metrics.get('error', 'Unknown error')
+                }
+
+        elif action == 'disk':
+            metrics = collect_metrics(server_id)
+            if metrics['success']:
+                return {
+                    'server': server_name,
+                    'success': True,
+                    'message': (
+                        f"Disk usage on {server_name}: {metrics.get('disk_percent', 'Unknown')}% "
+                        f"({format_bytes(metrics.get('disk_used'), 'Unknown')} / "
+                        f"{format_bytes(metrics.get('disk_total'), 'Unknown')})"
+                    ),
+                    'data': {
+                        'disk_percent': metrics.get('disk_percent'),
+                        'disk_used': metrics.get('disk_used'),
+                        'disk_total': metrics.get('disk_total'),
+                        'disk_iops': metrics.get('disk_iops')
+                    }
+                }
+            else:
+                return {
+                    'server': server_name,
+                    'success': False,
+                    'message': f"Failed to get disk metrics from {server_name}",
+                    'error': metrics.get('error', 'Unknown error')
+                }
+
+        else:  # general metrics
+            metrics = collect_metrics(server_id)
+            if metrics['success']:
+                return {
+                    'server': server_name,
+                    'success': True,
+                    'message': (
+                        f"System metrics for {server_name}:\n"
+                        f"- CPU: {metrics.get('cpu_usage', 'Unknown')}%\n"
+                        f"- Memory: {metrics.get('memory_percent', 'Unknown')}% "
+                        f"({format_bytes(metrics.get('memory_used'), 'Unknown')} / "
+                        f"{format_bytes(metrics.get('memory_total'), 'Unknown')})\n"
+                        f"- Disk: {metrics.get('disk_percent', 'Unknown')}% "
+                        f"({format_bytes(metrics.get('disk_used'), 'Unknown')} / "
+                        f"{format_bytes(metrics.get('disk_total'), 'Unknown')})\n"
+                        f"- Load: {metrics.get('load_1', 'Unknown')} (1m), "
+                        f"{metrics.get('load_5', 'Unknown')} (5m), "
+                        f"{metrics.get('load_15', 'Unknown')} (15m)"
+                    ),
+                    'data': metrics
+                }
+            else:
+                return {
+                    'server': server_name,
+                    'success': False,
+                    'message': f"Failed to get metrics from {server_name}",
+                    'error': metrics.get('error', 'Unknown error')
+                }
+
+    elif intent == 'command':
+        # Execute command on server
+        command_result = ssh_manager.execute_command(server_id, action)
+
+        # Log command to history
+        history_writer.add(
+            server_id=server_id,
+            command=action,
+            output=command_result.get('stdout', '') + '\n' + command_result.get('stderr', ''),
+            exit_code=command_result.get('exit_code')
+        )
+
+        if command_result['success']:
+            return {
+                'server': server_name,
+                'success': True,
+                'message': f"Command executed successfully on {server_name}",
+                'data': {
+                    'command': action,
+                    'stdout': command_result.get('stdout', ''),
+                    'stderr': command_result.get('stderr', ''),
+                    'exit_code': command_result.get('exit_code')
+                }
+            }
+        else:
+            return {
+                'server': server_name,
+                'success': False,
+                'message': f"Failed to execute command on {server_name}",
+                'error': command_result.get('stderr', command_result.get('error', 'Unknown error')),
+                'data': {
+                    'command': action,
+                    'exit_code': command_result.get('exit_code')
+                }
+            }
+    
+    return None
+
 @api.route('/query', methods=['POST'])
 def natural_language_query():
     """
@@ -327,157 +882,26 @@ def natural_language_query():
             
             servers_to_process = matching_servers
         
-        # Process based on intent
-        results = []
+        # Process servers concurrently; total latency tracks the slowest host
+        results = [None] * len(servers_to_process)
+        indexed_servers = list(enumerate(servers_to_process))
+        
+        for (index, server), future in fanout.map_unordered(
+                lambda indexed: _process_server_query(indexed[1], intent, action),
+                indexed_servers,
+                key=lambda indexed: server_host_key(indexed[1])):
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                logger.error(f"Error processing query on server {server['name']}: {str(e)}")
+                results[index] = {
+                    'server': server['name'],
+                    'success': False,
+                    'message': f"Error processing query on {server['name']}",
+                    'error': str(e)
+                }
         
-        for server in servers_to_process:
-            server_id = server['id']
-            server_name = server['name']
-            
-            # Ensure connection is established
-            if not ssh_manager.get_connection(server_id):
-                connection_result = ssh_manager.connect(
-                    server_id=server_id,
-                    hostname=server['hostname'],
-                    username=server['username'],
-                    password=server.get('password'),
-                    key_path=server.get('key_path'),
-                    port=server.get('port', 22)
-                )
-                
-                if not connection_result:
-                    results.append({
-                        'server': server_name,
-                        'success': False,
-                        'message': f'Failed to connect to server {server_name}'
-                    })
-                    continue
-            
-            if intent == 'metrics':
-                # Get metrics from server
-                if action == 'cpu':
-                    metrics = ssh_manager.get_server_metrics(server_id)
-                    if metrics['success']:
-                        results.append({
-                            'server': server_name,
-                            'success': True,
-                            'message': f"CPU usage on {server_name}: {metrics.get('cpu_usage', 'Unknown')}%",
-                            'data': {
-                                'cpu_usage': metrics.get('cpu_usage')
-                            }
-                        })
-                    else:
-                        results.append({
-                            'server': server_name,
-                            'success': False,
-                            'message': f"Failed to get CPU metrics from {server_name}",
-                            'error': metrics.get('error', 'Unknown error')
-                        })
-                
-                elif action == 'memory':
-                    metrics = ssh_manager.get_server_metrics(server_id)
-                    if metrics['success']:
-                        results.append({
-                            'server': server_name,
-                            'success': True,
-                            'message': (
-                                f"Memory usage on {server_name}: {metrics.get('memory_percent', 'Unknown')}% "
-                                f"({metrics.get('memory_used', 'Unknown')}MB / {metrics.get('memory_total', 'Unknown')}MB)"
-                            ),
-                            'data': {
-                                'memory_percent': metrics.get('memory_percent'),
-                                'memory_used': metrics.get('memory_used'),
-                                'memory_total': metrics.get('memory_total')
-                            }
-                        })
-                    else:
-                        results.append({
-                            'server': server_name,
-                            'success': False,
-                            'message': f"Failed to get memory metrics from {server_name}",
-                            'error': metrics.get('error', 'Unknown error')
-                        })
-                
-                elif action == 'disk':
-                    metrics = ssh_manager.get_server_metrics(server_id)
-                    if metrics['success']:
-                        results.append({
-                            'server': server_name,
-                            'success': True,
-                            'message': f"Disk usage on {server_name}: {metrics.get('disk_percent', 'Unknown')}%",
-                            'data': {
-                                'disk_percent': metrics.get('disk_percent')
-                            }
-                        })
-                    else:
-                        results.append({
-                            'server': server_name,
-                            'success': False,
-                            'message': f"Failed to get disk metrics from {server_name}",
-                            'error': metrics.get('error', 'Unknown error')
-                        })
-                
-                else:  # general metrics
-                    metrics = ssh_manager.get_server_metrics(server_id)
-                    if metrics['success']:
-                        results.append({
-                            'server': server_name,
-                            'success': True,
-                            'message': (
-                                f"System metrics for {server_name}:\n"
-                                f"- CPU: {metrics.get('cpu_usage', 'Unknown')}%\n"
-                                f"- Memory: {metrics.get('memory_percent', 'Unknown')}% "
-                                f"({metrics.get('memory_used', 'Unknown')}MB / {metrics.get('memory_total', 'Unknown')}MB)\n"
-                                f"- Disk: {metrics.get('disk_percent', 'Unknown')}%\n"
-                                f"- Load: {metrics.get('load_1', 'Unknown')} (1m), "
-                                f"{metrics.get('load_5', 'Unknown')} (5m), "
-                                f"{metrics.get('load_15', 'Unknown')} (15m)"
-                            ),
-                            'data': metrics
-                        })
-                    else:
-                        results.append({
-                            'server': server_name,
-                            'success': False,
-                            'message': f"Failed to get metrics from {server_name}",
-                            'error': metrics.get('error', 'Unknown error')
-                        })
-            
-            elif intent == 'command':
-                # Execute command on server
-                command_result = ssh_manager.execute_command(server_id, action)
-                
-                # Log command to history
-                db.add_command_history(
-                    server_id=server_id,
-                    command=action,
-                    output=command_result.get('stdout', '') + '\n' + command_result.get('stderr', ''),
-                    exit_code=command_result.get('exit_code')
-                )
-                
-                if command_result['success']:
-                    results.append({
-                        'server': server_name,
-                        'success': True,
-                        'message': f"Command executed successfully on {server_name}",
-                        'data': {
-                            'command': action,
-                            'stdout': command_result.get('stdout', ''),
-                            'stderr': command_result.get('stderr', ''),
-                            'exit_code': command_result.get('exit_code')
-                        }
-                    })
-                else:
-                    results.append({
-                        'server': server_name,
-                        'success': False,
-                        'message': f"Failed to execute command on {server_name}",
-                        'error': command_result.get('stderr', command_result.get('error', 'Unknown error')),
-                        'data': {
-                            'command': action,
-                            'exit_code': command_result.get('exit_code')
-                        }
-                    })
+        results = [result for result in results if result is not None]
         
         # Compile the overall response
         overall_success = all(result['success'] for result in results)
@@ -0,0 +1,300 @@
+import struct
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+# Version byte at the start of every block
+BLOCK_VERSION = 1
+
+# Block header: version, sample count, column count; then one uint32 byte
+# length per stream (timestamps first, then each column)
+_HEADER = struct.Struct('<BIH')
+_LENGTH = struct.Struct('<I')
+
+class BitWriter:
+    """Append-only big-endian bit stream."""
+
+    __slots__ = ('buffer', 'acc', 'nbits')
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.acc = 0  # bits not yet flushed to buffer
+        self.nbits = 0
+
+    def write(self, value: int, nbits: int) -> None:
+        self.acc = (self.acc << nbits) | value
+        self.nbits += nbits
+        while self.nbits >= 8:
+            self.nbits -= 8
+            self.buffer.append((self.acc >> self.nbits) & 0xff)
+        self.acc &= (1 << self.nbits) - 1
+
+    def copy(self) -> 'BitWriter':
+        writer = BitWriter()
+        writer.buffer = bytearray(self.buffer)
+        writer.acc = self.acc
+        writer.nbits = self.nbits
+        return writer
+
+    def getvalue(self) -> bytes:
+        """Return the stream, zero-padded to a whole byte."""
+        if self.nbits:
+            return bytes(self.buffer) + bytes([(self.acc << (8 - self.nbits)) & 0xff])
+        return bytes(self.buffer)
+
+class BitReader:
+    """Reads a big-endian bit stream written by BitWriter."""
+
+    __slots__ = ('data', 'pos')
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def read(self, nbits: int) -> int:
+        pos = self.pos
+        end = (pos + nbits + 7) >> 3
+        chunk = int.from_bytes(self.data[pos >> 3:end], 'big')
+        self.pos = pos + nbits
+        return (chunk >> ((end << 3) - pos - nbits)) & ((1 << nbits) - 1)
+
+    def read_bit(self) -> int:
+        pos = self.pos
+        self.pos = pos + 1
+        return (self.data[pos >> 3] >> (7 - (pos & 7))) & 1
+
+class TimestampEncoder:
+    """
+    Delta-of-delta timestamp stream.
+
+    The first timestamp is stored in 32 bits. After that each timestamp is
+    stored as the change in the gap to its predecessor: regular sampling
+    costs one bit per timestamp, jitter a few more.
+    """
+
+    __slots__ = ('writer', 'previous', 'delta', 'count')
+
+    def __init__(self):
+        self.writer = BitWriter()
+        self.previous = 0
+        self.delta = 0
+        self.count = 0
+
+    def append(self, ts: int) -> None:
+        writer = self.writer
+        if self.count == 0:
+            writer.write(ts & 0xffffffff, 32)
+        else:
+            delta = ts - self.previous
+            dod = delta - self.delta
+            self.delta = delta
+            if dod == 0:
+                writer.write(0, 1)
+            elif -63 <= dod <= 64:
+                writer.write(0b10, 2)
+                writer.write(dod + 63, 7)
+            elif -255 <= dod <= 256:
+                writer.write(0b110, 3)
+                writer.write(dod + 255, 9)
+            elif -2047 <= dod <= 2048:
+                writer.write(0b1110, 4)
+                writer.write(dod + 2047, 12)
+            else:
+                writer.write(0b1111, 4)
+                writer.write(dod & 0xffffffff, 32)
+        self.previous = ts
+        self.count += 1
+
+    def copy(self) -> 'TimestampEncoder':
+        encoder = TimestampEncoder()
+        encoder.writer = self.writer.copy()
+        encoder.previous, encoder.delta, encoder.count = self.previous, self.delta, self.count
+        return encoder
+
+class FloatEncoder:
+    """
+    XOR-compressed float32 stream.
+
+    Each value is XORed with its predecessor. An unchanged value costs one
+    bit; otherwise only the meaningful bits of the XOR are stored, reusing
+    the previous leading/trailing zero counts when they still fit.
+    """
+
+    __slots__ = ('writer', 'previous', 'leading', 'trailing', 'count')
+
+    def __init__(self):
+        self.writer = BitWriter()
+        self.previous = 0
+        self.leading = -1  # -1: no window yet
+        self.trailing = 0
+        self.count = 0
+
+    def append(self, bits: int) -> None:
+        """Append a value given as its float32 bit pattern."""
+        writer = self.writer
+        if self.count == 0:
+            writer.write(bits, 32)
+        else:
+            xor = bits ^ self.previous
+            if xor == 0:
+                writer.write(0, 1)
+            else:
+                leading = min(32 - xor.bit_length(), 31)
+                trailing = (xor & -xor).bit_length() - 1
+                if self.leading >= 0 and leading >= self.leading and trailing >= self.trailing:
+                    writer.write(0b10, 2)
+                    writer.write(xor >> self.trailing, 32 - self.leading - self.trailing)
+                else:
+                    meaningful = 32 - leading - trailing
+                    writer.write(0b11, 2)
+                    writer.write(leading, 5)
+                    writer.write(meaningful - 1, 5)
+                    writer.write(xor >> trailing, meaningful)
+                    self.leading, self.trailing = leading, trailing
+        self.previous = bits
+        self.count += 1
+
+    def copy(self) -> 'FloatEncoder':
+        encoder = FloatEncoder()
+        encoder.writer = self.writer.copy()
+        encoder.previous, encoder.leading, encoder.trailing, encoder.count = \
+            self.previous, self.leading, self.trailing, self.count
+        return encoder
+
+class BlockEncoder:
+    """
+    Columnar block of samples: one timestamp stream plus one float stream per column.
+
+    Samples are encoded as they are appended, so growing a block costs the
+    same per sample however large it is, and to_bytes() only concatenates.
+    """
+
+    def __init__(self, width: int):
+        self.width = width
+        self.timestamps = TimestampEncoder()
+        self.columns = [FloatEncoder() for _ in range(width)]
+        self.last_ts = None
+
+    def __len__(self) -> int:
+        return self.timestamps.count
+
+    def append(self, ts: int, values: Sequence[float]) -> None:
+        """Append a sample; values holds one float per column, NaN for missing."""
+        self.timestamps.append(int(ts))
+        bits = np.asarray(values, dtype=np.float32).view(np.uint32).tolist()
+        for encoder, value in zip(self.columns, bits):
+            encoder.append(value)
+        self.last_ts = int(ts)
+
+    def to_bytes(self, extra: Optional[Tuple[int, Sequence[float]]] = None) -> bytes:
+        """Serialize the block; extra is a sample appended to the output only."""
+        timestamps, columns = self.timestamps, self.columns
+        if extra is not None:
+            timestamps = timestamps.copy()
+            columns = [column.copy() for column in columns]
+            timestamps.append(int(extra[0]))
+            bits = np.asarray(extra[1], dtype=np.float32).view(np.uint32).tolist()
+            for encoder, value in zip(columns, bits):
+                encoder.append(value)
+
+        streams = [timestamps.writer.getvalue()] + [column.writer.getvalue() for column in columns]
+        header = _HEADER.pack(BLOCK_VERSION, timestamps.count, self.width)
+        lengths = b''.join(_LENGTH.pack(len(stream)) for stream in streams)
+        return header + lengths + b''.join(streams)
+
+def encode_block(timestamps: Sequence[int], columns: np.ndarray) -> bytes:
+    """Encode timestamps and a (columns x samples) array into one block."""
+    columns = np.asarray(columns, dtype=np.float32)
+    encoder = BlockEncoder(columns.shape[0])
+    for index, ts in enumerate(timestamps):
+        encoder.append(ts, columns[:, index])
+    return encoder.to_bytes()
+
+def _decode_timestamps(data: bytes, count: int) -> List[int]:
+    reader = BitReader(data)
+    read, read_bit = reader.read, reader.read_bit
+    previous = read(32)
+    timestamps = [previous]
+    delta = 0
+    for _ in range(count - 1):
+        if not read_bit():
+            dod = 0
+        elif not read_bit():
+            dod = read(7) - 63
+        elif not read_bit():
+            dod = read(9) - 255
+        elif not read_bit():
+            dod = read(12) - 2047
+        else:
+            dod = read(32)
+            if dod >= 1 << 31:
+                dod -= 1 << 32
+        delta += dod
+        previous += delta
+        timestamps.append(previous)
+    return timestamps
+
+def _decode_floats(data: bytes, count: int) -> List[int]:
+    reader = BitReader(data)
+    read, read_bit = reader.read, reader.read_bit
+    previous = read(32)
+    values = [previous]
+    leading = trailing = 0
+    for _ in range(count - 1):
+        if read_bit():
+            if read_bit():
+                leading = read(5)
+                trailing = 32 - leading - read(5) - 1
+            previous ^= read(32 - leading - trailing) << trailing
+        values.append(previous)
+    return values
+
+class Block:
+    """
+    Lazily decoded block.
+
+    Only the header is parsed up front. Timestamps and each column are
+    decoded the first time they are asked for, so a query touching two
+    metrics of a ten-metric block decodes three of its eleven streams.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        version, self.count, self.width = _HEADER.unpack_from(data)
+        if version != BLOCK_VERSION:
+            raise ValueError(f'Unsupported block version {version}')
+        offset = _HEADER.size + _LENGTH.size * (self.width + 1)
+        self._streams = []
+        for index in range(self.width + 1):
+            length, = _LENGTH.unpack_from(data, _HEADER.size + _LENGTH.size * index)
+            self._streams.append((offset, offset + length))
+            offset += length
+        self._timestamps = None
+        self._columns = {}
+
+    def _stream(self, index: int) -> bytes:
+        start, end = self._streams[index]
+        return self.data[start:end]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        if self._timestamps is None:
+            self._timestamps = np.array(
+                _decode_timestamps(self._stream(0), self.count) if self.count else [], dtype=np.int64
+            )
+        return self._timestamps
+
+    def column(self, index: int) -> np.ndarray:
+        """Return a column as float32; columns beyond the block's width are all NaN."""
+        if index >= self.width:
+            return np.full(self.count, np.nan, dtype=np.float32)
+        column = self._columns.get(index)
+        if column is None:
+            bits = _decode_floats(self._stream(index + 1), self.count) if self.count else []
+            column = self._columns[index] = np.array(bits, dtype=np.uint32).view(np.float32)
+        return column
+
+    def columns(self, indices: Sequence[int]) -> np.ndarray:
+        """Return the given columns as a (len(indices) x samples) array."""
+        if not indices:
+            return np.empty((0, self.count), dtype=np.float32)
+        return np.stack([self.column(index) for index in indices])
@@ -5,12 +5,15 @@ import time
 import sqlite3
 import paramiko
 from paramiko.ssh_exception import SSHException
+from key_loader import load_private_key
+from metrics import COLLECTOR_SCRIPT, RateTracker, parse_collector_output
 
 class ServerManager:
     def __init__(self, db_path='infrawhiz.db'):
         self.db_path = db_path
         self.servers = {}
         self.connections = {}
+        self.metric_rates = RateTracker()  # previous counters per server, for rates
         self._init_db()
         self._load_servers()
 
@@ -115,7 +118,7 @@ class ServerManager:
         
         try:
             if server['key_path']:
-                key = paramiko.RSAKey.from_private_key_file(server['key_path'])
+                key = load_private_key(server['key_path'])
                 client.connect(
                     hostname=server['hostname'],
                     port=server['port'],
@@ -161,56 +164,19 @@ class ServerManager:
             }
 
     def get_metrics(self, server_id):
-        # Basic metrics collection using shell commands
+        # Basic metrics collection using a single collector script
         metrics = {}
         
         try:
-            # CPU usage
-            cpu_result = self.execute_command(server_id, "top -bn1 | grep 'Cpu(s)' | awk '{print $2 + $4}'")
-            if cpu_result['exit_code'] == 0:
-                metrics['cpu_usage'] = float(cpu_result['stdout'].strip())
-            
-            # Memory usage
-            mem_result = self.execute_command(server_id, "free -m | grep Mem | awk '{print $3,$2}'")
-            if mem_result['exit_code'] == 0:
-                used, total = map(int, mem_result['stdout'].strip().split())
-                metrics['memory_used'] = used
-                metrics['memory_total'] = total
-                metrics['memory_percent'] = round(used / total * 100, 1)
-            
-            # Disk usage
-            disk_result = self.execute_command(server_id, "df -h / | tail -1 | awk '{print $3,$2,$5}'")
-            if disk_result['exit_code'] == 0:
-                used, total, percent = disk_result['stdout'].strip().split()
-                metrics['disk_used'] = used
-                metrics['disk_total'] = total
-                metrics['disk_percent'] = float(percent.replace('%', ''))
-            
-            # Load average
-            load_result = self.execute_command(server_id, "cat /proc/loadavg | awk '{print $1,$2,$3}'")
-            if load_result['exit_code'] == 0:
-                load1, load5, load15 = map(float, load_result['stdout'].strip().split())
-                metrics['load_1'] = load1
-                metrics['load_5'] = load5
-                metrics['load_15'] = load15
-            
-            # Uptime
-            uptime_result = self.execute_command(server_id, "uptime -p")
-            if uptime_result['exit_code'] == 0:
-                metrics['uptime'] = uptime_result['stdout'].strip()
-            
-            # Network
-            net_result = self.execute_command(
-                server_id, 
-                "cat /proc/net/dev | grep -v lo | grep ':' | awk '{print $1, $2, $10}' | head -1"
-            )
-            if net_result['exit_code'] == 0 and net_result['stdout'].strip():
-                interface, rx, tx = net_result['stdout'].strip().split()
-                metrics['network_interface'] = interface.replace(':', '')
-                metrics['network_rx'] = int(rx)
-                metrics['network_tx'] = int(tx)
+            result = self.execute_command(server_id, COLLECTOR_SCRIPT)
+            if not result['stdout'] and result['exit_code'] != 0:
+                return {'error': result['stderr']}
             
             metrics['timestamp'] = time.time()
+            parse_collector_output(result['stdout'], metrics)
+            
+            # Turn the raw /proc counters into CPU usage and rates
+            self.metric_rates.apply(server_id, metrics)
             return metrics
         except Exception as e:
             return {'error': str(e)}
\ No newline at end of file
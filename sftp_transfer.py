@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import logging
+import weakref
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Iterator, Optional
+import paramiko
+from ssh_pool import HostPool, LANE_TRANSFER
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Files are moved in parts of this many bytes; a part is the unit of
+# parallelism and of resume
+TRANSFER_PART_SIZE = int(os.environ.get('TRANSFER_PART_SIZE', 8 * 1024 * 1024))
+
+# Parts transferred at once, each over its own SFTP channel
+TRANSFER_PARALLELISM = int(os.environ.get('TRANSFER_PARALLELISM', 4))
+
+# Bytes per SFTP read/write request (paramiko caps reads at 32 KiB)
+TRANSFER_BLOCK_SIZE = 32768
+
+# Read requests kept in flight per channel when downloading
+TRANSFER_MAX_REQUESTS = int(os.environ.get('TRANSFER_MAX_REQUESTS', 64))
+
+# Where upload resume state is kept; download state sits next to the target
+TRANSFER_STATE_DIR = os.environ.get(
+    'TRANSFER_STATE_DIR', os.path.join(tempfile.gettempdir(), 'infrawhiz-transfers')
+)
+
+# Suffix of in-progress files; they are renamed into place when complete
+PARTIAL_SUFFIX = '.partial'
+
+class SFTPSessionCache:
+    """
+    Idle SFTP sessions per SSH client, reused across transfers.
+
+    Opening the SFTP subsystem costs a channel open and a version handshake.
+    Sessions are keyed weakly by client, so they go away with the transport.
+    """
+
+    def __init__(self):
+        self._idle = weakref.WeakKeyDictionary()  # SSHClient -> [SFTPClient]
+        self.lock = threading.Lock()
+        self._stats = {'opened': 0, 'reused': 0}
+
+    @contextmanager
+    def session(self, client: paramiko.SSHClient) -> Iterator[paramiko.SFTPClient]:
+        """Context manager yielding an SFTP session on client."""
+        sftp = None
+        with self.lock:
+            idle = self._idle.get(client, [])
+            while idle and sftp is None:
+                candidate = idle.pop()
+                if candidate.get_channel().closed:
+                    candidate.close()
+                else:
+                    sftp = candidate
+                    self._stats['reused'] += 1
+
+        if sftp is None:
+            sftp = client.open_sftp()
+            with self.lock:
+                self._stats['opened'] += 1
+
+        try:
+            yield sftp
+        except BaseException:
+            # The session may be mid-request; do not hand it to anyone else
+            sftp.close()
+            raise
+
+        with self.lock:
+            self._idle.setdefault(client, []).append(sftp)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache statistics."""
+        with self.lock:
+            return {
+                'idle': sum(len(sessions) for sessions in self._idle.values()),
+                **self._stats
+            }
+
+class _TransferState:
+    """Completed parts of a transfer, persisted to a JSON sidecar file."""
+
+    def __init__(self, path: str, source: Dict[str, Any], part_count: int):
+        self.path = path
+        self.source = source
+        self.part_count = part_count
+        self.done = set()
+        self.lock = threading.Lock()
+
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get('source') == source and saved.get('part_size') == TRANSFER_PART_SIZE:
+                self.done = set(saved['done'])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def complete(self, index: int) -> None:
+        with self.lock:
+            self.done.add(index)
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'source': self.source, 'part_size': TRANSFER_PART_SIZE,
+                           'done': sorted(self.done)}, f)
+            os.replace(tmp_path, self.path)
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+class SFTPTransfer:
+    """
+    Parallel, pipelined and resumable SFTP transfers for one host.
+
+    A file is split into TRANSFER_PART_SIZE parts. Up to TRANSFER_PARALLELISM
+    parts move at once, each on a channel leased from the host's pool, so a
+    large file spreads across the pool's transports. Downloads prefetch up to
+    TRANSFER_MAX_REQUESTS reads per part and uploads pipeline their writes.
+    Data goes to a .partial file that is renamed into place at the end.
+    Finished parts are recorded in a sidecar, and an interrupted transfer of
+    an unchanged source resumes with the parts it has not finished yet.
+    """
+
+    def __init__(self, pool: HostPool, sessions: SFTPSessionCache,
+                 parallelism: int = TRANSFER_PARALLELISM):
+        self.pool = pool
+        self.sessions = sessions
+        self.parallelism = max(parallelism, 1)
+
+    @contextmanager
+    def _sftp(self) -> Iterator[paramiko.SFTPClient]:
+        with self.pool.lease(LANE_TRANSFER) as client:
+            with self.sessions.session(client) as sftp:
+                yield sftp
+
+    def upload(self, server_id: str, local_path: str, remote_path: str,
+               source: Optional[memoryview] = None,
+               on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """
+        Upload local_path to remote_path.
+
+        Args:
+            source: The file's contents already in memory, e.g. a memoryview of an
+                mmap shared by uploads to many hosts; blocks are sliced from it
+                instead of read from the file.
+            on_progress: Called with the byte count of every block written.
+        """
+        stat = os.stat(local_path)
+        size = stat.st_size if source is None else len(source)
+        origin = {'path': os.path.abspath(local_path), 'size': size, 'mtime_ns': stat.st_mtime_ns}
+        key = hashlib.sha1(f'{server_id}\0{origin["path"]}\0{remote_path}'.encode()).hexdigest()
+        state = _TransferState(os.path.join(TRANSFER_STATE_DIR, f'{key}.json'), origin,
+                               self._part_count(size))
+        partial_path = remote_path + PARTIAL_SUFFIX
+
+        with self._sftp() as sftp:
+            if state.done:
+                try:
+                    sftp.stat(partial_path)
+                except IOError:
+                    # The partial file is gone; start over
+                    state.done = set()
+            if not state.done:
+                # Fresh start: create (or truncate) the remote partial file
+                sftp.open(partial_path, 'wb').close()
+
+        fd = os.open(local_path, os.O_RDONLY)
+        try:
+            def send_part(sftp, offset, length):
+                with sftp.open(partial_path, 'r+b') as remote:
+                    remote.set_pipelined(True)
+                    remote.seek(offset)
+                    end = offset + length
+                    while offset < end:
+                        length = min(TRANSFER_BLOCK_SIZE, end - offset)
+                        if source is not None:
+                            block = source[offset:offset + length]
+                        else:
+                            block = os.pread(fd, length, offset)
+                        if not block:
+                            raise IOError(f'{local_path} shrank during upload')
+                        remote.write(block)
+                        offset += len(block)
+                        if on_progress:
+                            on_progress(len(block))
+                # Closing waits for every pipelined write to be acknowledged
+
+            result = self._run_parts(state, size, send_part)
+        finally:
+            os.close(fd)
+
+        with self._sftp() as sftp:
+            try:
+                sftp.posix_rename(partial_path, remote_path)
+            except IOError:
+                # Server without the posix-rename extension
+                try:
+                    sftp.remove(remote_path)
+                except IOError:
+                    pass
+                sftp.rename(partial_path, remote_path)
+
+        state.remove()
+        return result
+
+    def download(self, server_id: str, remote_path: str, local_path: str) -> Dict[str, Any]:
+        """Download remote_path to local_path."""
+        with self._sftp() as sftp:
+            attributes = sftp.stat(remote_path)
+        size = attributes.st_size or 0
+        source = {'server_id': server_id, 'path': remote_path, 'size': size,
+                  'mtime': attributes.st_mtime}
+        partial_path = local_path + PARTIAL_SUFFIX
+        state = _TransferState(partial_path + '.json', source, self._part_count(size))
+
+        if not state.done or not os.path.exists(partial_path):
+            state.done = set()
+            with open(partial_path, 'wb'):
+                pass
+
+        fd = os.open(partial_path, os.O_WRONLY)
+        try:
+            def fetch_part(sftp, offset, length):
+                blocks = [(block, min(TRANSFER_BLOCK_SIZE, offset + length - block))
+                          for block in range(offset, offset + length, TRANSFER_BLOCK_SIZE)]
+                with sftp.open(remote_path, 'rb') as remote:
+                    for (block_offset, _), data in zip(
+                            blocks, remote.readv(blocks, TRANSFER_MAX_REQUESTS)):
+                        os.pwrite(fd, data, block_offset)
+                os.fsync(fd)
+
+            result = self._run_parts(state, size, fetch_part)
+        finally:
+            os.close(fd)
+
+        os.replace(partial_path, local_path)
+        state.remove()
+        return result
+
+    def _part_count(self, size: int) -> int:
+        return max(1, -(-size // TRANSFER_PART_SIZE))
+
+    def _run_parts(self, state: _TransferState, size: int, transfer_part) -> Dict[str, Any]:
+        """Move every unfinished part with transfer_part(sftp, offset, length)."""
+        todo = [index for index in range(state.part_count) if index not in state.done]
+        resumed_bytes = sum(min(TRANSFER_PART_SIZE, size - index * TRANSFER_PART_SIZE)
+                            for index in state.done)
+        if state.done:
+            logger.info(f"Resuming transfer of {state.source['path']} at "
+                        f"{len(state.done)}/{state.part_count} parts")
+
+        queue = list(reversed(todo))
+        queue_lock = threading.Lock()
+
+        def worker():
+            # Each worker holds one channel and SFTP session for all its parts
+            with self._sftp() as sftp:
+                while True:
+                    with queue_lock:
+                        if not queue:
+                            return
+                        index = queue.pop()
+                    offset = index * TRANSFER_PART_SIZE
+                    try:
+                        transfer_part(sftp, offset, min(TRANSFER_PART_SIZE, size - offset))
+                    except BaseException:
+                        # Let the other workers stop after their current part
+                        with queue_lock:
+                            queue.clear()
+                        raise
+                    state.complete(index)
+
+        start = time.perf_counter()
+        workers = min(self.parallelism, len(todo))
+        if workers:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sftp') as executor:
+                futures = [executor.submit(worker) for _ in range(workers)]
+                errors = [future.exception() for future in futures if future.exception()]
+            if errors:
+                raise errors[0]
+        elapsed = time.perf_counter() - start
+
+        transferred = size - resumed_bytes
+        return {
+            'bytes': size,
+            'bytes_transferred': transferred,
+            'resumed_bytes': resumed_bytes,
+            'parts': state.part_count,
+            'elapsed': round(elapsed, 3),
+            'throughput_mb_s': round(transferred / elapsed / 1e6, 2) if elapsed > 0 else None
+        }
@@ -1,94 +1,266 @@
 import os
+import codecs
+import select
+import socket
 import paramiko
 import time
 import threading
 import logging
-from typing import Dict, List, Optional, Any, Tuple, Union
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Tuple, Union, Callable, Iterator
+from ssh_pool import HostPool, LANE_INTERACTIVE, LANE_METRICS, LANE_TRANSFER
+from circuit_breaker import CircuitBreakerRegistry, unavailable_message
+from key_loader import load_private_key
+from ssh_shell import PersistentShell
+from sftp_transfer import SFTPSessionCache, SFTPTransfer
+from file_sync import FileSync
+from metrics import METRIC_COMMANDS, COLLECTOR_SCRIPT, RateTracker, parse_metric, parse_collector_output
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class SSHManager:
+# Metrics collection mode: 'batched' runs all collectors in one exec,
+# 'per_command' runs one exec per metric
+METRICS_MODE = os.environ.get('METRICS_MODE', 'batched')
+
+# How interactive commands run: 'exec' opens a channel per command, 'shell'
+# pipelines them through one persistent shell channel per host
+EXEC_MODE = os.environ.get('SSH_EXEC_MODE', 'exec')
+
+# Maximum bytes read from an exec channel per chunk
+STREAM_CHUNK_SIZE = 32768
+
+# Bytes of trailing output kept per stream in a streamed command's result
+STREAM_TAIL_BYTES = int(os.environ.get('STREAM_TAIL_BYTES', 65536))
+
+# Seconds between SSH keepalive messages on idle transports (0 disables)
+SSH_KEEPALIVE_INTERVAL = int(os.environ.get('SSH_KEEPALIVE_INTERVAL', 30))
+
+# Number of locks that per-server connection state is striped across
+LOCK_STRIPES = 64
+
+class _Flight:
+    """A connection attempt in progress that concurrent callers can wait on."""
+    
     def __init__(self):
-        self.connections = {}  # Dictionary to store active SSH connections
-        self.lock = threading.Lock()  # Lock for thread safety
+        self.done = threading.Event()
+        self.result = False
+
+class SSHManager:
+    def __init__(self, metrics_mode: str = METRICS_MODE, exec_mode: str = EXEC_MODE):
+        # Active SSH connections. Lookups read this dict without locking;
+        # changes for a server happen under that server's stripe lock.
+        self.connections = {}
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._flights = {}  # server_id -> _Flight for connects in progress
+        self.breakers = CircuitBreakerRegistry()  # fail fast for unreachable hosts
+        self._shells = {}  # server_id -> PersistentShell, for exec_mode 'shell'
+        self.sftp_sessions = SFTPSessionCache()
+        self.metrics_mode = metrics_mode
+        self.metric_rates = RateTracker()  # previous counters per server, for rates
+        self.exec_mode = exec_mode
+    
+    def _lock_for(self, server_id: str) -> threading.Lock:
+        """Return the stripe lock guarding a server's connection state."""
+        return self._stripes[hash(server_id) % LOCK_STRIPES]
     
     def connect(self, server_id: str, hostname: str, username: str, 
                 password: Optional[str] = None, key_path: Optional[str] = None, 
-                port: int = 22) -> bool:
-        """Establish an SSH connection to a server and store it."""
-        try:
-            # Create a new SSH client
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                port: int = 22, reconnect: bool = True) -> bool:
+        """
+        Establish a pool of SSH connections to a server and store it.
+        
+        Concurrent calls for the same server share a single handshake. With
+        reconnect=False an existing connection is reused instead of replaced.
+        Returns False without connecting while the host's circuit is open.
+        """
+        with self._lock_for(server_id):
+            if not reconnect and server_id in self.connections:
+                return True
             
-            # Connect using either password or key
-            if key_path and os.path.exists(key_path):
-                private_key = paramiko.RSAKey.from_private_key_file(key_path)
-                client.connect(
-                    hostname=hostname,
-                    port=port,
-                    username=username,
-                    pkey=private_key,
-                    timeout=10
-                )
-            elif password:
-                client.connect(
-                    hostname=hostname,
-                    port=port,
-                    username=username,
-                    password=password,
-                    timeout=10
-                )
+            flight = self._flights.get(server_id)
+            if flight:
+                leader = False
             else:
-                logger.error(f"No valid authentication method provided for {hostname}")
-                return False
-                
+                flight = self._flights[server_id] = _Flight()
+                leader = True
+        
+        if not leader:
+            # Another caller is already connecting to this server
+            flight.done.wait()
+            return flight.result
+        
+        try:
+            flight.result = self._establish(server_id, hostname, username,
+                                            password, key_path, port)
+        finally:
+            with self._lock_for(server_id):
+                del self._flights[server_id]
+            flight.done.set()
+        
+        return flight.result
+    
+    def _establish(self, server_id: str, hostname: str, username: str,
+                   password: Optional[str], key_path: Optional[str], port: int) -> bool:
+        """Open a new connection pool and swap it in for any existing one."""
+        if not (key_path and os.path.exists(key_path)) and not password:
+            logger.error(f"No valid authentication method provided for {hostname}")
+            return False
+        
+        breaker = self.breakers.get(hostname, port)
+        if not breaker.allow():
+            status = breaker.status()
+            logger.warning(f"Not connecting to {hostname}: host unavailable "
+                           f"(retry in {status['retry_after']}s): {status['last_error']}")
+            return False
+        
+        try:
+            # Open the pool's initial transports
+            pool = HostPool(
+                lambda: self._open_client(hostname, username, password, key_path, port)
+            )
+            pool.fill()
+            
             # Store the connection
-            with self.lock:
-                if server_id in self.connections:
-                    # Close existing connection if present
-                    self.disconnect(server_id)
+            with self._lock_for(server_id):
+                previous = self.connections.get(server_id)
                 self.connections[server_id] = {
-                    'client': client,
+                    'pool': pool,
+                    'host': (hostname, port),  # circuit breaker key
                     'last_used': time.time()
                 }
             
+            # Close existing connection if present
+            if previous:
+                previous['pool'].close()
+            
+            breaker.record_success()
             logger.info(f"Successfully connected to {hostname}")
             return True
             
+        except paramiko.AuthenticationException as e:
+            # The host answered; only unreachable hosts trip the breaker
+            breaker.record_success()
+            logger.error(f"Failed to connect to {hostname}: {str(e)}")
+            return False
         except Exception as e:
+            breaker.record_failure(str(e) or type(e).__name__)
             logger.error(f"Failed to connect to {hostname}: {str(e)}")
             return False
     
+    def _open_client(self, hostname: str, username: str, password: Optional[str],
+                     key_path: Optional[str], port: int) -> paramiko.SSHClient:
+        """Open a single authenticated SSH client. Raises on failure."""
+        # Create a new SSH client
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        
+        # Connect using either password or key
+        if key_path and os.path.exists(key_path):
+            private_key = load_private_key(key_path)
+            client.connect(
+                hostname=hostname,
+                port=port,
+                username=username,
+                pkey=private_key,
+                timeout=10
+            )
+        else:
+            client.connect(
+                hostname=hostname,
+                port=port,
+                username=username,
+                password=password,
+                timeout=10
+            )
+        
+        # Keep NAT/firewall state alive and surface dead peers early
+        client.get_transport().set_keepalive(SSH_KEEPALIVE_INTERVAL)
+        
+        # Send small writes (exec requests, pipelined commands) immediately
+        client.get_transport().sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        
+        return client
+    
     def disconnect(self, server_id: str) -> bool:
         """Close an SSH connection."""
-        with self.lock:
-            if server_id in self.connections:
-                try:
-                    self.connections[server_id]['client'].close()
-                    del self.connections[server_id]
-                    return True
-                except Exception as e:
-                    logger.error(f"Error disconnecting from server {server_id}: {str(e)}")
+        with self._lock_for(server_id):
+            entry = self.connections.pop(server_id, None)
+            shell = self._shells.pop(server_id, None)
+        
+        if shell:
+            shell['shell'].close()
+        
+        if not entry:
             return False
+        
+        try:
+            entry['pool'].close()
+        except Exception as e:
+            logger.error(f"Error disconnecting from server {server_id}: {str(e)}")
+        return True
     
     def get_connection(self, server_id: str) -> Optional[paramiko.SSHClient]:
         """Get an active SSH connection or None if not connected."""
-        with self.lock:
-            if server_id in self.connections:
-                # Update last used time
-                self.connections[server_id]['last_used'] = time.time()
-                return self.connections[server_id]['client']
-            return None
+        pool = self.get_pool(server_id)
+        return pool.primary() if pool else None
+    
+    def get_pool(self, server_id: str) -> Optional[HostPool]:
+        """Get the connection pool for a server or None if not connected."""
+        # Lock-free: a single dict read is atomic, and entries are replaced, never mutated
+        entry = self.connections.get(server_id)
+        if entry:
+            # Update last used time
+            entry['last_used'] = time.time()
+            return entry['pool']
+        return None
+    
+    def pool_stats(self, server_id: str) -> Optional[Dict[str, Any]]:
+        """Get connection pool statistics for a server."""
+        entry = self.connections.get(server_id)
+        return entry['pool'].stats() if entry else None
     
+    def host_status(self, server: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Get the circuit breaker status for a server record's host, if it has one."""
+        return self.breakers.status(server['hostname'], server.get('port', 22))
+    
+    def connect_error(self, server: Dict[str, Any]) -> str:
+        """Describe why a server record could not be connected to."""
+        status = self.host_status(server)
+        if status and not status['available']:
+            return unavailable_message(server['name'], status)
+        return f"Failed to connect to server {server['name']}"
+    
+    def ensure_connected(self, server: Dict[str, Any]) -> bool:
+        """Connect to a server record from the database unless already connected."""
+        if self.get_connection(server['id']):
+            return True
+
+        return self.connect(
+            server_id=server['id'],
+            hostname=server['hostname'],
+            username=server['username'],
+            password=server.get('password'),
+            key_path=server.get('key_path'),
+            port=server.get('port', 22),
+            reconnect=False
+        )
+
     def execute_command(self, server_id: str, command: str, 
-                        timeout: int = 30) -> Dict[str, Any]:
-        """Execute a command on the connected server."""
-        client = self.get_connection(server_id)
+                        timeout: int = 30, lane: str = LANE_INTERACTIVE,
+                        mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Execute a command on the connected server.
         
-        if not client:
+        mode overrides the manager's exec_mode. In 'shell' mode interactive
+        commands are pipelined through the host's persistent shell; other
+        lanes always use their own exec channel.
+        """
+        pool = self.get_pool(server_id)
+        
+        if not pool:
             return {
                 'success': False,
                 'error': 'Not connected to server',
@@ -97,14 +269,36 @@ class SSHManager:
                 'exit_code': -1
             }
         
+        if (mode or self.exec_mode) == 'shell' and lane == LANE_INTERACTIVE:
+            shell = self._shell_for(server_id, pool)
+            if shell:
+                try:
+                    return shell.run(command, timeout)
+                except Exception as e:
+                    logger.error(f"Error executing command on server {server_id}: {str(e)}")
+                    return {
+                        'success': False,
+                        'error': str(e),
+                        'stdout': '',
+                        'stderr': f'Error: {str(e)}',
+                        'exit_code': -1
+                    }
+        
         try:
-            # Execute the command
-            stdin, stdout, stderr = client.exec_command(command, timeout=timeout)
-            exit_code = stdout.channel.recv_exit_status()
+            # Execute the command, draining stdout and stderr while it runs so
+            # large outputs never stall on a full channel window
+            output = {'stdout': [], 'stderr': []}
+            with pool.lease(lane) as client:
+                channel = client.get_transport().open_session(timeout=timeout)
+                channel.exec_command(command)
+                exit_code = self._pump_channel(
+                    channel, lambda stream, data: output[stream].append(data),
+                    timeout=timeout
+                )
             
             # Read output
-            stdout_data = stdout.read().decode('utf-8')
-            stderr_data = stderr.read().decode('utf-8')
+            stdout_data = b''.join(output['stdout']).decode('utf-8')
+            stderr_data = b''.join(output['stderr']).decode('utf-8')
             
             return {
                 'success': exit_code == 0,
@@ -113,6 +307,16 @@ class SSHManager:
                 'exit_code': exit_code
             }
             
+        except TimeoutError as e:
+            # The channel is closed; return whatever the command printed so far
+            logger.error(f"Error executing command on server {server_id}: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'stdout': b''.join(output['stdout']).decode('utf-8', errors='replace'),
+                'stderr': b''.join(output['stderr']).decode('utf-8', errors='replace'),
+                'exit_code': -1
+            }
         except Exception as e:
             logger.error(f"Error executing command on server {server_id}: {str(e)}")
             return {
@@ -123,6 +327,163 @@ class SSHManager:
                 'exit_code': -1
             }
     
+    def _shell_for(self, server_id: str, pool: HostPool) -> Optional[PersistentShell]:
+        """Return the server's persistent shell, opening one if needed. None on failure."""
+        entry = self._shells.get(server_id)
+        if entry and entry['pool'] is pool and entry['shell'].is_active():
+            return entry['shell']
+        
+        # Open outside the stripe lock; the shell keeps one channel of the
+        # pool reserved for its lifetime
+        try:
+            slot = pool.acquire(LANE_INTERACTIVE)
+        except Exception as e:
+            logger.error(f"Failed to open shell on server {server_id}: {str(e)}")
+            return None
+        try:
+            shell = PersistentShell(slot['client'], on_close=lambda: pool.release(slot))
+        except Exception as e:
+            pool.release(slot)
+            logger.error(f"Failed to open shell on server {server_id}: {str(e)}")
+            return None
+        
+        with self._lock_for(server_id):
+            current = self._shells.get(server_id)
+            if current and current['pool'] is pool and current['shell'].is_active():
+                # Another caller opened one first
+                stale, shell = shell, current['shell']
+            else:
+                self._shells[server_id] = {'pool': pool, 'shell': shell}
+                stale = current['shell'] if current else None
+        
+        if stale:
+            stale.close()
+        return shell
+    
+    def execute_command_stream(self, server_id: str, command: str,
+                               on_output: Callable[[str, str], None],
+                               timeout: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Execute a command and pass its output to on_output(stream, text) as it arrives.
+        
+        stream is 'stdout' or 'stderr'. Only the last STREAM_TAIL_BYTES of each
+        stream are kept for the returned result, so memory use stays bounded no
+        matter how much the command prints. timeout is the number of seconds
+        without any output after which the command is abandoned.
+        """
+        pool = self.get_pool(server_id)
+        
+        if not pool:
+            return {
+                'success': False,
+                'error': 'Not connected to server',
+                'stdout': '',
+                'stderr': 'SSH connection not established',
+                'exit_code': -1
+            }
+        
+        decoders = {
+            'stdout': codecs.getincrementaldecoder('utf-8')(errors='replace'),
+            'stderr': codecs.getincrementaldecoder('utf-8')(errors='replace')
+        }
+        tails = {'stdout': deque(), 'stderr': deque()}
+        sizes = {'stdout': 0, 'stderr': 0}
+        kept = {'stdout': 0, 'stderr': 0}
+        
+        def handle_chunk(stream: str, data: bytes):
+            sizes[stream] += len(data)
+            
+            # Keep a bounded tail of raw output for the result
+            tails[stream].append(data)
+            kept[stream] += len(data)
+            while kept[stream] - len(tails[stream][0]) >= STREAM_TAIL_BYTES:
+                kept[stream] -= len(tails[stream].popleft())
+            
+            text = decoders[stream].decode(data)
+            if text:
+                on_output(stream, text)
+        
+        try:
+            with pool.lease(LANE_INTERACTIVE) as client:
+                channel = client.get_transport().open_session(timeout=10)
+                channel.exec_command(command)
+                exit_code = self._pump_channel(channel, handle_chunk, idle_timeout=timeout)
+            
+            for stream, decoder in decoders.items():
+                text = decoder.decode(b'', final=True)
+                if text:
+                    on_output(stream, text)
+            
+            stdout_tail = b''.join(tails['stdout'])[-STREAM_TAIL_BYTES:]
+            stderr_tail = b''.join(tails['stderr'])[-STREAM_TAIL_BYTES:]
+            
+            return {
+                'success': exit_code == 0,
+                'stdout': stdout_tail.decode('utf-8', errors='replace'),
+                'stderr': stderr_tail.decode('utf-8', errors='replace'),
+                'exit_code': exit_code,
+                'stdout_bytes': sizes['stdout'],
+                'stderr_bytes': sizes['stderr'],
+                'truncated': any(size > STREAM_TAIL_BYTES for size in sizes.values())
+            }
+            
+        except Exception as e:
+            logger.error(f"Error streaming command on server {server_id}: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'stdout': '',
+                'stderr': f'Error: {str(e)}',
+                'exit_code': -1
+            }
+    
+    def _pump_channel(self, channel: paramiko.Channel,
+                      on_chunk: Callable[[str, bytes], None],
+                      idle_timeout: Optional[float] = None,
+                      timeout: Optional[float] = None) -> int:
+        """
+        Read stdout and stderr from an exec channel until the command exits.
+        
+        Data is handed to on_chunk(stream, data) in chunks of at most
+        STREAM_CHUNK_SIZE bytes. Returns the command's exit status. Raises
+        TimeoutError after idle_timeout seconds without output, or once the
+        command has run for timeout seconds; the channel is closed either way.
+        """
+        try:
+            last_activity = time.monotonic()
+            deadline = last_activity + timeout if timeout else None
+            
+            while True:
+                # Checked first so a command that never stops printing still ends
+                if deadline and time.monotonic() > deadline:
+                    raise TimeoutError(f'Command timed out after {timeout} seconds')
+                
+                got_data = False
+                if channel.recv_ready():
+                    on_chunk('stdout', channel.recv(STREAM_CHUNK_SIZE))
+                    got_data = True
+                if channel.recv_stderr_ready():
+                    on_chunk('stderr', channel.recv_stderr(STREAM_CHUNK_SIZE))
+                    got_data = True
+                
+                if got_data:
+                    last_activity = time.monotonic()
+                    continue
+                
+                if channel.exit_status_ready():
+                    # Pick up anything that arrived alongside the exit status
+                    if not channel.recv_ready() and not channel.recv_stderr_ready():
+                        return channel.recv_exit_status()
+                    continue
+                
+                if idle_timeout and time.monotonic() - last_activity > idle_timeout:
+                    raise TimeoutError(f'No output for {idle_timeout} seconds')
+                
+                # Wait for more data (or the exit status) to arrive
+                select.select([channel], [], [], 0.1)
+        finally:
+            channel.close()
+    
     def get_server_metrics(self, server_id: str) -> Dict[str, Any]:
         """Collect basic metrics from the server."""
         metrics = {
@@ -130,64 +491,26 @@ class SSHManager:
             'timestamp': time.time()
         }
         
-        # Commands to collect metrics
-        commands = {
-            'cpu': "top -bn1 | grep 'Cpu(s)' | awk '{print $2 + $4}'",
-            'memory': "free -m | grep Mem | awk '{print $3,$2}'",
-            'disk': "df -h / | tail -1 | awk '{print $3,$2,$5}'",
-            'load': "cat /proc/loadavg | awk '{print $1,$2,$3}'",
-            'uptime': "uptime -p",
-            'network': "cat /proc/net/dev | grep -v lo | grep ':' | awk '{print $1, $2, $10}' | head -1"
-        }
-        
         client = self.get_connection(server_id)
         if not client:
             metrics['error'] = 'Not connected to server'
             return metrics
         
         try:
-            # CPU usage
-            result = self.execute_command(server_id, commands['cpu'])
-            if result['success']:
-                metrics['cpu_usage'] = float(result['stdout'].strip())
-            
-            # Memory usage
-            result = self.execute_command(server_id, commands['memory'])
-            if result['success']:
-                used, total = map(int, result['stdout'].strip().split())
-                metrics['memory_used'] = used
-                metrics['memory_total'] = total
-                metrics['memory_percent'] = round(used / total * 100, 1)
-            
-            # Disk usage
-            result = self.execute_command(server_id, commands['disk'])
-            if result['success']:
-                used, total, percent = result['stdout'].strip().split()
-                metrics['disk_used'] = used
-                metrics['disk_total'] = total
-                metrics['disk_percent'] = float(percent.replace('%', ''))
-            
-            # Load average
-            result = self.execute_command(server_id, commands['load'])
-            if result['success']:
-                load1, load5, load15 = map(float, result['stdout'].strip().split())
-                metrics['load_1'] = load1
-                metrics['load_5'] = load5
-                metrics['load_15'] = load15
-            
-            # Uptime
-            result = self.execute_command(server_id, commands['uptime'])
-            if result['success']:
-                metrics['uptime'] = result['stdout'].strip()
-            
-            # Network
-            result = self.execute_command(server_id, commands['network'])
-            if result['success'] and result['stdout'].strip():
-                interface, rx, tx = result['stdout'].strip().split()
-                metrics['network_interface'] = interface.replace(':', '')
-                metrics['network_rx'] = int(rx)
-                metrics['network_tx'] = int(tx)
+            if self.metrics_mode == 'batched':
+                # Run every collector in a single exec round trip
+                result = self.execute_command(server_id, COLLECTOR_SCRIPT, lane=LANE_METRICS)
+                if not result['stdout'] and not result['success']:
+                    raise RuntimeError(result.get('error') or result['stderr'] or 'Metrics collection failed')
+                parse_collector_output(result['stdout'], metrics)
+            else:
+                # One exec per metric
+                for name, command in METRIC_COMMANDS.items():
+                    result = self.execute_command(server_id, command, lane=LANE_METRICS)
+                    if result['success']:
+                        parse_metric(name, result['stdout'], metrics)
             
+            self.metric_rates.apply(server_id, metrics)
             metrics['success'] = True
             return metrics
             
@@ -201,42 +524,53 @@ class SSHManager:
         current_time = time.time()
         closed_count = 0
         
-        with self.lock:
-            server_ids = list(self.connections.keys())
-            
-            for server_id in server_ids:
-                last_used = self.connections[server_id]['last_used']
-                if current_time - last_used > max_idle_time:
-                    if self.disconnect(server_id):
-                        closed_count += 1
+        for server_id, entry in list(self.connections.items()):
+            if current_time - entry['last_used'] > max_idle_time:
+                with self._lock_for(server_id):
+                    # Skip entries replaced or used since the snapshot
+                    if self.connections.get(server_id) is not entry or \
+                            current_time - entry['last_used'] <= max_idle_time:
+                        continue
+                    del self.connections[server_id]
+                    shell = self._shells.pop(server_id, None)
+                if shell:
+                    shell['shell'].close()
+                entry['pool'].close()
+                closed_count += 1
+            else:
+                # Shrink pools that grew for a burst back towards their minimum
+                entry['pool'].trim(max_idle_time)
         
         return closed_count
 
     def upload_file(self, server_id: str, local_path: str, 
-                   remote_path: str) -> Dict[str, Any]:
-        """Upload a file to the remote server."""
-        client = self.get_connection(server_id)
+                   remote_path: str, source: Optional[memoryview] = None,
+                   on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """
+        Upload a file to the remote server.
         
-        if not client:
+        Large files are sent as parallel, pipelined parts; an interrupted
+        upload of an unchanged file resumes where it stopped. source, if
+        given, holds the file's contents so they are not read again, and
+        on_progress is called with the byte count of every block sent.
+        """
+        pool = self.get_pool(server_id)
+        
+        if not pool:
             return {
                 'success': False,
                 'error': 'Not connected to server'
             }
         
         try:
-            # Open SFTP session
-            sftp = client.open_sftp()
-            
-            # Upload the file
-            sftp.put(local_path, remote_path)
-            
-            # Close SFTP session
-            sftp.close()
+            transfer = SFTPTransfer(pool, self.sftp_sessions)
+            stats = transfer.upload(server_id, local_path, remote_path, source, on_progress)
             
             return {
                 'success': True,
                 'local_path': local_path,
-                'remote_path': remote_path
+                'remote_path': remote_path,
+                **stats
             }
             
         except Exception as e:
@@ -250,29 +584,29 @@ class SSHManager:
     
     def download_file(self, server_id: str, remote_path: str, 
                      local_path: str) -> Dict[str, Any]:
-        """Download a file from the remote server."""
-        client = self.get_connection(server_id)
+        """
+        Download a file from the remote server.
         
-        if not client:
+        Large files are fetched as parallel, prefetched parts; an interrupted
+        download of an unchanged file resumes where it stopped.
+        """
+        pool = self.get_pool(server_id)
+        
+        if not pool:
             return {
                 'success': False,
                 'error': 'Not connected to server'
             }
         
         try:
-            # Open SFTP session
-            sftp = client.open_sftp()
-            
-            # Download the file
-            sftp.get(remote_path, local_path)
-            
-            # Close SFTP session
-            sftp.close()
+            transfer = SFTPTransfer(pool, self.sftp_sessions)
+            stats = transfer.download(server_id, remote_path, local_path)
             
             return {
                 'success': True,
                 'local_path': local_path,
-                'remote_path': remote_path
+                'remote_path': remote_path,
+                **stats
             }
             
         except Exception as e:
@@ -283,6 +617,58 @@ class SSHManager:
                 'local_path': local_path,
                 'remote_path': remote_path
             }
+    
+    @contextmanager
+    def sftp_session(self, server_id: str) -> Iterator[paramiko.SFTPClient]:
+        """Context manager yielding a cached SFTP session on the server's transfer lane."""
+        pool = self.get_pool(server_id)
+        if not pool:
+            raise ConnectionError('Not connected to server')
+        
+        with pool.lease(LANE_TRANSFER) as client:
+            with self.sftp_sessions.session(client) as sftp:
+                yield sftp
+    
+    def sync_file(self, server_id: str, local_path: str, remote_path: str) -> Dict[str, Any]:
+        """
+        Upload a file only if the remote copy differs, sending just the changed blocks.
+        
+        The result's 'action' is 'skipped', 'delta' or 'uploaded'.
+        """
+        if not self.get_pool(server_id):
+            return {
+                'success': False,
+                'error': 'Not connected to server'
+            }
+        
+        return FileSync(self, server_id).sync_file(local_path, remote_path)
+    
+    def sync_directory(self, server_id: str, local_dir: str, remote_dir: str,
+                       delete: bool = False) -> Dict[str, Any]:
+        """Sync a directory tree to the server, skipping files unchanged since the last sync."""
+        if not self.get_pool(server_id):
+            return {
+                'success': False,
+                'error': 'Not connected to server'
+            }
+        
+        try:
+            return FileSync(self, server_id).sync_directory(local_dir, remote_dir, delete)
+        except Exception as e:
+            logger.error(f"Error syncing {local_dir} to server {server_id}: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'local_path': local_dir,
+                'remote_path': remote_dir
+            }
+
+# SSH backend: 'paramiko' (threaded) or 'asyncssh' (asyncio event loop)
+SSH_BACKEND = os.environ.get('SSH_BACKEND', 'paramiko')
 
 # Create a singleton instance
-ssh_manager = SSHManager() 
\ No newline at end of file
+if SSH_BACKEND == 'asyncssh':
+    from async_ssh_manager import AsyncSSHManager
+    ssh_manager = AsyncSSHManager()
+else:
+    ssh_manager = SSHManager()
@@ -0,0 +1,245 @@
+import os
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, List, Optional
+import paramiko
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Transports kept open per host, and the most a host may grow to
+POOL_MIN_TRANSPORTS = int(os.environ.get('POOL_MIN_TRANSPORTS', 1))
+POOL_MAX_TRANSPORTS = int(os.environ.get('POOL_MAX_TRANSPORTS', 3))
+
+# Channels opened at once on one transport (OpenSSH's MaxSessions defaults to 10)
+POOL_MAX_CHANNELS = int(os.environ.get('POOL_MAX_CHANNELS', 8))
+
+# Seconds an exec request waits for a free channel before giving up
+POOL_ACQUIRE_TIMEOUT = float(os.environ.get('POOL_ACQUIRE_TIMEOUT', 30))
+
+# Request classes; each gets its own queue and they are served round-robin
+LANE_INTERACTIVE = 'interactive'
+LANE_METRICS = 'metrics'
+LANE_TRANSFER = 'transfer'
+LANES = (LANE_INTERACTIVE, LANE_METRICS, LANE_TRANSFER)
+
+class PoolTimeout(Exception):
+    """Raised when no channel becomes available within the acquire timeout."""
+
+class HostPool:
+    """
+    Pool of SSH transports to a single host.
+
+    Each transport carries at most max_channels concurrent channels. When every
+    transport is saturated the pool opens another, up to max_transports; beyond
+    that, requests wait. Waiting requests are queued per lane and the lanes are
+    served round-robin, so a flood of interactive commands cannot starve the
+    metric polls for the same host.
+    """
+
+    def __init__(self, factory: Callable[[], paramiko.SSHClient],
+                 min_transports: int = POOL_MIN_TRANSPORTS,
+                 max_transports: int = POOL_MAX_TRANSPORTS,
+                 max_channels: int = POOL_MAX_CHANNELS):
+        self.factory = factory
+        self.min_transports = min_transports
+        self.max_transports = max(max_transports, min_transports, 1)
+        self.max_channels = max_channels
+        self.lock = threading.Lock()
+        self._available = threading.Condition(self.lock)
+        self._slots = []  # [{'client': SSHClient, 'channels': int, 'last_used': float}]
+        self._growing = 0  # transports currently being opened
+        self._queues = {lane: deque() for lane in LANES}
+        self._next_lane = 0
+        self._closed = False
+        self._stats = {'acquired': 0, 'waited': 0, 'timeouts': 0, 'opened': 0}
+
+    def fill(self) -> None:
+        """Open transports until min_transports are available. Raises on failure."""
+        while True:
+            with self.lock:
+                if len(self._slots) + self._growing >= max(self.min_transports, 1):
+                    return
+                self._growing += 1
+            self._open_slot(channels=0)
+
+    def _open_slot(self, channels: int) -> Dict[str, Any]:
+        """Open a transport outside the lock; the caller has reserved growth."""
+        try:
+            client = self.factory()
+        except Exception:
+            with self._available:
+                self._growing -= 1
+                self._available.notify_all()
+            raise
+
+        with self._available:
+            self._growing -= 1
+            slot = {'client': client, 'channels': channels, 'last_used': time.time()}
+            if self._closed:
+                client.close()
+                raise ConnectionError('Pool is closed')
+            self._slots.append(slot)
+            self._stats['opened'] += 1
+            self._available.notify_all()
+            return slot
+
+    def _head_ticket(self) -> Optional[object]:
+        """Return the ticket whose turn it is, rotating fairly between lanes."""
+        for offset in range(len(LANES)):
+            queue = self._queues[LANES[(self._next_lane + offset) % len(LANES)]]
+            if queue:
+                return queue[0]
+        return None
+
+    def _free_slot(self) -> Optional[Dict[str, Any]]:
+        """Return the least loaded live transport with a free channel."""
+        # Drop transports that died since they were last used
+        dead = [slot for slot in self._slots
+                if slot['channels'] == 0 and not _is_active(slot['client'])]
+        for slot in dead:
+            self._slots.remove(slot)
+            slot['client'].close()
+
+        candidates = [slot for slot in self._slots if slot['channels'] < self.max_channels]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda slot: slot['channels'])
+
+    def acquire(self, lane: str = LANE_INTERACTIVE,
+                timeout: Optional[float] = POOL_ACQUIRE_TIMEOUT) -> Dict[str, Any]:
+        """Reserve a channel on some transport and return its slot."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        ticket = object()
+        queue = self._queues[lane]
+
+        with self._available:
+            queue.append(ticket)
+            waited = False
+            try:
+                while True:
+                    if self._closed:
+                        raise ConnectionError('Pool is closed')
+
+                    if self._head_ticket() is ticket:
+                        slot = self._free_slot()
+                        if slot:
+                            slot['channels'] += 1
+                            slot['last_used'] = time.time()
+                            self._grant(lane, waited)
+                            return slot
+
+                        if len(self._slots) + self._growing < self.max_transports:
+                            # Grow the pool; the new transport's first channel is ours
+                            self._growing += 1
+                            self._grant(lane, waited)
+                            break
+
+                    remaining = deadline - time.monotonic() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(f'No SSH channel available within {timeout} seconds')
+                    waited = True
+                    self._available.wait(remaining)
+            except BaseException:
+                if ticket in queue:
+                    queue.remove(ticket)
+                    self._available.notify_all()
+                raise
+
+        return self._open_slot(channels=1)
+
+    def _grant(self, lane: str, waited: bool) -> None:
+        """Dequeue the head ticket of a lane and move the round-robin past it."""
+        self._queues[lane].popleft()
+        self._next_lane = (LANES.index(lane) + 1) % len(LANES)
+        self._stats['acquired'] += 1
+        if waited:
+            self._stats['waited'] += 1
+        self._available.notify_all()
+
+    def release(self, slot: Dict[str, Any]) -> None:
+        """Return a channel reserved with acquire()."""
+        with self._available:
+            slot['channels'] -= 1
+            slot['last_used'] = time.time()
+            if slot['channels'] == 0 and not _is_active(slot['client']) and slot in self._slots:
+                self._slots.remove(slot)
+                slot['client'].close()
+            self._available.notify_all()
+
+    @contextmanager
+    def lease(self, lane: str = LANE_INTERACTIVE,
+              timeout: Optional[float] = POOL_ACQUIRE_TIMEOUT) -> Iterator[paramiko.SSHClient]:
+        """Context manager yielding a client with one channel reserved on it."""
+        slot = self.acquire(lane, timeout)
+        try:
+            yield slot['client']
+        finally:
+            self.release(slot)
+
+    def prune(self) -> int:
+        """Drop dead idle transports and return the number of live ones."""
+        with self.lock:
+            self._free_slot()
+            return sum(1 for slot in self._slots if _is_active(slot['client']))
+
+    def primary(self) -> Optional[paramiko.SSHClient]:
+        """Return any live client, without reserving a channel."""
+        with self.lock:
+            for slot in self._slots:
+                if _is_active(slot['client']):
+                    return slot['client']
+        return None
+
+    def clients(self) -> List[paramiko.SSHClient]:
+        """Return all pooled clients."""
+        with self.lock:
+            return [slot['client'] for slot in self._slots]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool statistics."""
+        with self.lock:
+            return {
+                'transports': len(self._slots),
+                'opening': self._growing,
+                'idle_transports': sum(1 for slot in self._slots if slot['channels'] == 0),
+                'channels_in_use': sum(slot['channels'] for slot in self._slots),
+                'channel_capacity': len(self._slots) * self.max_channels,
+                'waiters': {lane: len(queue) for lane, queue in self._queues.items()},
+                'min_transports': self.min_transports,
+                'max_transports': self.max_transports,
+                'max_channels': self.max_channels,
+                **self._stats
+            }
+
+    def trim(self, max_idle_time: float) -> int:
+        """Close transports above min_transports that have been idle too long."""
+        now = time.time()
+        with self.lock:
+            idle = [slot for slot in self._slots
+                    if slot['channels'] == 0 and now - slot['last_used'] > max_idle_time]
+            surplus = max(0, len(self._slots) - self.min_transports)
+            trimmed = sorted(idle, key=lambda slot: slot['last_used'])[:surplus]
+            for slot in trimmed:
+                self._slots.remove(slot)
+        for slot in trimmed:
+            slot['client'].close()
+        return len(trimmed)
+
+    def close(self) -> None:
+        """Close every transport and wake any waiters."""
+        with self._available:
+            self._closed = True
+            slots, self._slots = self._slots, []
+            self._available.notify_all()
+        for slot in slots:
+            slot['client'].close()
+
+def _is_active(client: paramiko.SSHClient) -> bool:
+    transport = client.get_transport()
+    return transport is not None and transport.is_active()
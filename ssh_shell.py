@@ -0,0 +1,179 @@
+import os
+import uuid
+import shlex
+import select
+import threading
+import logging
+from collections import deque
+from typing import Callable, Dict, Any, Optional
+import paramiko
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Shell started on the remote side; it reads commands from the channel's stdin
+SHELL_COMMAND = os.environ.get('SSH_SHELL_COMMAND', '/bin/sh')
+
+# Prefix of the sentinel lines that end each command's output
+SENTINEL = '@@infrawhiz-shell'
+
+# Maximum bytes read from the shell channel per chunk
+SHELL_CHUNK_SIZE = 32768
+
+class ShellClosed(Exception):
+    """Raised for commands that were pending when the shell session ended."""
+
+class _PendingCommand:
+    """A command written to the shell whose output has not fully arrived."""
+
+    def __init__(self, marker: str):
+        self.marker = marker
+        self.output = {'stdout': [], 'stderr': []}
+        self.finished = {'stdout': False, 'stderr': False}
+        self.exit_code = -1
+        self.error = None
+        self.done = threading.Event()
+
+class PersistentShell:
+    """
+    Long-lived shell on one SSH channel that runs commands back to back.
+
+    Each command is written to the shell's stdin followed by sentinel lines on
+    stdout and stderr carrying a unique marker and the exit code. A reader
+    thread splits the two streams on those sentinels, so many commands can be
+    pipelined over the channel without paying for a channel open and a remote
+    shell start each. Commands run in a subshell with stdin from /dev/null:
+    `cd`, `exit` and syntax errors cannot affect the session or later commands.
+    """
+
+    def __init__(self, client: paramiko.SSHClient, timeout: float = 10,
+                 on_close: Optional[Callable[[], None]] = None):
+        self.on_close = on_close
+        self.channel = client.get_transport().open_session(timeout=timeout)
+        self.channel.exec_command(SHELL_COMMAND)
+        self._pending = deque()
+        self._buffers = {'stdout': b'', 'stderr': b''}
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.commands_run = 0
+        self._reader = threading.Thread(target=self._read_loop, name='ssh-shell', daemon=True)
+        self._reader.start()
+
+    def is_active(self) -> bool:
+        """Return True while the shell can accept commands."""
+        return not self._closed and not self.channel.closed
+
+    def run(self, command: str, timeout: Optional[float] = 30) -> Dict[str, Any]:
+        """Run a command in the shell and return its output and exit code."""
+        pending = _PendingCommand(uuid.uuid4().hex)
+        script = (
+            f"( eval {shlex.quote(command)} ) </dev/null; "
+            f"printf '\\n{SENTINEL} %s %d\\n' {pending.marker} $?; "
+            f"printf '\\n{SENTINEL} %s\\n' {pending.marker} >&2\n"
+        )
+
+        # Queue order must match write order: sentinels come back in that order
+        with self._write_lock:
+            with self._lock:
+                if self._closed:
+                    raise ShellClosed('Shell session is closed')
+                self._pending.append(pending)
+            try:
+                self.channel.sendall(script.encode('utf-8'))
+            except Exception as e:
+                self.close(str(e))
+                raise
+
+        if not pending.done.wait(timeout):
+            # The command may still be running; the session is no longer usable
+            self.close(f'Command timed out after {timeout} seconds')
+            raise TimeoutError(f'Command timed out after {timeout} seconds')
+
+        if pending.error:
+            raise ShellClosed(pending.error)
+
+        return {
+            'success': pending.exit_code == 0,
+            'stdout': b''.join(pending.output['stdout']).decode('utf-8', errors='replace'),
+            'stderr': b''.join(pending.output['stderr']).decode('utf-8', errors='replace'),
+            'exit_code': pending.exit_code
+        }
+
+    def _read_loop(self) -> None:
+        channel = self.channel
+        try:
+            while True:
+                if channel.recv_ready():
+                    data = channel.recv(SHELL_CHUNK_SIZE)
+                    if not data:
+                        break
+                    self._feed('stdout', data)
+                elif channel.recv_stderr_ready():
+                    self._feed('stderr', channel.recv_stderr(SHELL_CHUNK_SIZE))
+                elif channel.closed or channel.exit_status_ready() or channel.eof_received:
+                    break
+                else:
+                    select.select([channel], [], [], 0.5)
+        except Exception as e:
+            logger.debug(f"Shell reader stopped: {str(e)}")
+        self.close('Shell session ended')
+
+    def _feed(self, stream: str, data: bytes) -> None:
+        """Append stream data and complete every command whose sentinel has arrived."""
+        with self._lock:
+            buffer = self._buffers[stream] + data
+            while True:
+                pending = next((p for p in self._pending if not p.finished[stream]), None)
+                if pending is None:
+                    # Stray output, e.g. from a command that was backgrounded
+                    buffer = b''
+                    break
+
+                sentinel = f'\n{SENTINEL} {pending.marker}'.encode()
+                index = buffer.find(sentinel)
+                if index < 0:
+                    # Hand over everything that cannot be the start of a sentinel
+                    keep = len(sentinel) - 1
+                    if len(buffer) > keep:
+                        pending.output[stream].append(buffer[:-keep])
+                        buffer = buffer[-keep:]
+                    break
+
+                line_end = buffer.find(b'\n', index + len(sentinel))
+                if line_end < 0:
+                    # Sentinel line not complete yet
+                    if index:
+                        pending.output[stream].append(buffer[:index])
+                        buffer = buffer[index:]
+                    break
+
+                pending.output[stream].append(buffer[:index])
+                if stream == 'stdout':
+                    pending.exit_code = int(buffer[index + len(sentinel):line_end] or -1)
+                buffer = buffer[line_end + 1:]
+                pending.finished[stream] = True
+
+                if all(pending.finished.values()):
+                    self._pending.remove(pending)
+                    self.commands_run += 1
+                    pending.done.set()
+            self._buffers[stream] = buffer
+
+    def close(self, reason: str = 'Shell session closed') -> None:
+        """Close the shell and fail any commands still pending."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            pending, self._pending = list(self._pending), deque()
+        for command in pending:
+            command.error = reason
+            command.done.set()
+        try:
+            self.channel.close()
+        except Exception:
+            pass
+        if self.on_close:
+            self.on_close()
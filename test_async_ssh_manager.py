@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import time
+import socket
+import logging
+import unittest
+from async_ssh_manager import AsyncSSHManager
+from local_ssh_server import LocalSSHServer
+
+logging.getLogger('asyncssh').setLevel(logging.CRITICAL)
+logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+class TestAsyncSSHManager(unittest.TestCase):
+    """Test cases for the asyncssh backend against a local SSH server."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalSSHServer().start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+    
+    def setUp(self):
+        self.ssh = AsyncSSHManager()
+        self.assertTrue(self.ssh.connect('local', '127.0.0.1', 'test', password='x', port=self.server.port))
+    
+    def tearDown(self):
+        self.ssh.disconnect('local')
+    
+    def test_execute_command(self):
+        """Test that stdout, stderr and exit codes come back in the SSHManager shape."""
+        result = self.ssh.execute_command('local', 'echo out; echo err >&2; exit 3')
+        self.assertEqual(result['stdout'], 'out\n')
+        self.assertEqual(result['stderr'], 'err\n')
+        self.assertEqual(result['exit_code'], 3)
+        self.assertFalse(result['success'])
+        
+        self.assertTrue(self.ssh.execute_command('local', 'true')['success'])
+        self.assertEqual(self.ssh.execute_command('other', 'true')['error'], 'Not connected to server')
+    
+    def test_timeout(self):
+        """Test that a command running past its timeout fails fast and keeps its partial output."""
+        start = time.monotonic()
+        result = self.ssh.execute_command('local', 'echo started; sleep 5', timeout=1)
+        self.assertLess(time.monotonic() - start, 4)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['exit_code'], -1)
+        self.assertIn('timed out', result['error'])
+        self.assertEqual(result['stdout'], 'started\n')
+        
+        # The connection is still usable
+        self.assertEqual(self.ssh.execute_command('local', 'echo again')['stdout'], 'again\n')
+    
+    def test_connect_failure(self):
+        """Test that an unreachable host returns False and leaves no connection behind."""
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        
+        self.assertFalse(self.ssh.connect('closed', '127.0.0.1', 'test', password='x', port=port))
+        self.assertIsNone(self.ssh.get_connection('closed'))
+        self.assertFalse(self.ssh.connect('nokey', '127.0.0.1', 'test', port=self.server.port))
+        self.assertEqual(self.ssh.execute_command('closed', 'true')['exit_code'], -1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import socket
+import threading
+import time
+import unittest
+from circuit_breaker import CircuitBreaker, CircuitBreakerRegistry, probe
+from connection_maintenance import ConnectionMaintainer
+from test_ssh_manager import FakeSSHManager, server
+
+class UnreachableSSHManager(FakeSSHManager):
+    """FakeSSHManager whose hosts refuse connections until reachable is set."""
+    
+    def __init__(self):
+        super().__init__(handshake_time=0)
+        self.reachable = False
+    
+    def _open_client(self, hostname, username, password, key_path, port):
+        if not self.reachable:
+            with self.counter_lock:
+                self.handshakes += 1
+            raise ConnectionRefusedError('Connection refused')
+        return super()._open_client(hostname, username, password, key_path, port)
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Tests for the per-host connect circuit breaker."""
+    
+    def test_negative_cache(self):
+        """Test that a single failure fails fast until the negative TTL expires."""
+        breaker = CircuitBreaker('a', 22, failure_threshold=3, negative_ttl=0.05)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure('timed out')
+        
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.status()['state'], 'closed')
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+    
+    def test_open_half_open_close(self):
+        """Test the closed -> open -> half-open -> closed transitions."""
+        breaker = CircuitBreaker('a', 22, failure_threshold=2, negative_ttl=0, reset_timeout=0.05)
+        breaker.record_failure('timed out')
+        breaker.record_failure('timed out')
+        self.assertEqual(breaker.status()['state'], 'open')
+        self.assertFalse(breaker.allow())
+        
+        time.sleep(0.06)
+        # Only one trial connect is let through
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.status()['state'], 'half_open')
+        
+        breaker.record_success()
+        self.assertEqual(breaker.status()['state'], 'closed')
+        self.assertTrue(breaker.allow())
+    
+    def test_failed_trial_backs_off(self):
+        """Test that a failed half-open trial re-opens with a longer timeout."""
+        breaker = CircuitBreaker('a', 22, failure_threshold=1, reset_timeout=0.05, max_reset_timeout=10)
+        breaker.record_failure('timed out')
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure('timed out')
+        
+        self.assertEqual(breaker.status()['state'], 'open')
+        self.assertGreater(breaker.status()['retry_after'], 0.05)
+    
+    def test_manager_fails_fast(self):
+        """Test that SSHManager stops dialling a host once its circuit is open."""
+        manager = UnreachableSSHManager()
+        manager.breakers = CircuitBreakerRegistry(failure_threshold=2, negative_ttl=0, reset_timeout=60)
+        
+        for _ in range(5):
+            self.assertFalse(manager.ensure_connected(server('a')))
+        
+        self.assertEqual(manager.handshakes, 2)
+        self.assertFalse(manager.host_status(server('a'))['available'])
+        self.assertIn('unreachable', manager.connect_error(dict(server('a'), name='a')))
+    
+    def test_probe_closes_circuit(self):
+        """Test that a background probe closes the circuit when the host answers."""
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(8)
+        port = listener.getsockname()[1]
+        
+        def answer():
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                except OSError:
+                    return
+                conn.sendall(b'SSH-2.0-test\r\n')
+                conn.close()
+        threading.Thread(target=answer, daemon=True).start()
+        
+        try:
+            self.assertTrue(probe('127.0.0.1', port))
+            
+            manager = UnreachableSSHManager()
+            manager.breakers = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=60)
+            host = dict(server('a'), hostname='127.0.0.1', port=port)
+            self.assertFalse(manager.ensure_connected(host))
+            self.assertEqual(manager.host_status(host)['state'], 'open')
+            
+            ConnectionMaintainer(manager).run_once()
+            
+            self.assertEqual(manager.host_status(host)['state'], 'closed')
+            manager.reachable = True
+            self.assertTrue(manager.ensure_connected(host))
+        finally:
+            listener.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import db
+
+class TestCommandHistoryQueries(unittest.TestCase):
+    """Test cases for indexed, cursor-paginated command history."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        patcher = mock.patch.object(db, 'DB_PATH', os.path.join(self.tmpdir, 'test.db'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        db.init_db()
+        
+        # 60 commands over two servers, three per second so pages split ties
+        self.start = 1_700_000_000
+        db.add_command_history_rows([
+            (f'id-{i:03d}', f's{i % 2}', ['df -h', 'uptime', 'systemctl restart nginx'][i % 3],
+             'out', i % 4, db.utc_timestamp(self.start + i // 3))
+            for i in range(60)
+        ])
+    
+    def tearDown(self):
+        db.close_connection()
+        shutil.rmtree(self.tmpdir)
+    
+    def pages(self, **filters):
+        ids, cursor = [], None
+        while True:
+            page = db.query_command_history(limit=7, cursor=cursor, **filters)
+            ids.extend(row['id'] for row in page['history'])
+            cursor = page['next_cursor']
+            if not cursor:
+                return ids
+    
+    def test_cursor_pages_cover_everything_once(self):
+        """Test that following cursors returns every row once, newest first."""
+        ids = self.pages()
+        self.assertEqual(len(ids), 60)
+        self.assertEqual(len(set(ids)), 60)
+        self.assertEqual(ids[:3], ['id-059', 'id-058', 'id-057'])
+        self.assertEqual(len(self.pages(server_id='s1')), 30)
+        
+        with self.assertRaises(ValueError):
+            db.query_command_history(cursor='not a cursor')
+    
+    def test_filters(self):
+        """Test exit code, time range and command prefix filters."""
+        self.assertEqual(len(self.pages(exit_code=3)), 15)
+        self.assertEqual(len(self.pages(since=self.start + 5, until=self.start + 9)), 15)
+        
+        restarts = self.pages(command_prefix='systemctl')
+        self.assertEqual(len(restarts), 20)
+        self.assertEqual(self.pages(command_prefix='systemctl', server_id='s0', exit_code=0),
+                         ['id-056', 'id-044', 'id-032', 'id-020', 'id-008'])
+    
+    def test_listings_use_indexes(self):
+        """Test that server listings read the index in order instead of sorting the table."""
+        with db.get_connection() as conn:
+            plan = ' '.join(row[3] for row in conn.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM command_history WHERE server_id = ? '
+                'AND (executed_at, id) < (?, ?) ORDER BY executed_at DESC, id DESC LIMIT 8',
+                ('s1', db.utc_timestamp(self.start + 10), 'id-030')
+            ))
+        self.assertIn('idx_command_history_server_time', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+    
+    def test_exit_code_filters_use_index(self):
+        """Test that exit code filters read the exit code index instead of walking the history."""
+        db.add_command_history_rows([('oom-kill', 's1', 'java -jar app.jar', 'Killed', 137,
+                                      db.utc_timestamp(self.start + 1))])
+        self.assertEqual(self.pages(exit_code=137), ['oom-kill'])
+        self.assertEqual(self.pages(exit_code=137, server_id='s0'), [])
+        self.assertEqual(len(self.pages(exit_code=1, server_id='s1')), 15)
+        
+        with db.get_connection() as conn:
+            self.assertEqual(db._history_table(conn, None, 137, None),
+                             'command_history INDEXED BY idx_command_history_exit_code')
+            self.assertEqual(db._history_table(conn, 's1', 0, None),
+                             'command_history INDEXED BY idx_command_history_exit_code')
+            with mock.patch.object(db, 'HISTORY_FILTER_SORT_ROWS', 10):
+                # Too common to sort: walk the time index and stop after a page
+                self.assertEqual(db._history_table(conn, None, 0, None),
+                                 'command_history INDEXED BY idx_command_history_time')
+            plan = ' '.join(row[3] for row in conn.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM command_history INDEXED BY idx_command_history_exit_code '
+                'WHERE server_id = ? AND exit_code = ? ORDER BY executed_at DESC, id DESC LIMIT 8',
+                ('s1', 1)
+            ))
+        self.assertNotIn('TEMP B-TREE', plan)
+    
+    def test_output_deduplicated_and_fetched_lazily(self):
+        """Test that repeated output is stored once, compressed, and only returned on request."""
+        report = 'Filesystem Size Used Avail Use% Mounted on\n' * 100
+        db.add_command_history_rows([(f'df-{i}', 's0', 'df -h', report, 0, db.utc_timestamp(self.start + 100))
+                                     for i in range(50)])
+        
+        with db.get_connection() as conn:
+            size, data = conn.execute('SELECT size, data FROM command_outputs WHERE size = ?',
+                                      (len(report),)).fetchone()
+            copies = conn.execute('SELECT COUNT(*) FROM command_outputs').fetchone()[0]
+        self.assertEqual(copies, 2)  # 'out' from setUp and the report
+        self.assertLess(len(data), size / 10)
+        
+        entry = db.query_command_history(limit=1)['history'][0]
+        self.assertNotIn('output', entry)
+        self.assertEqual(entry['output_size'], len(report))
+        self.assertEqual(db.get_command_output(entry['id'])['output'], report)
+        self.assertIsNone(db.get_command_output('missing'))
+    
+    def test_inline_output_migrated(self):
+        """Test that a database with inline output is moved to the output table on startup."""
+        with db.get_connection() as conn:
+            conn.execute('DROP TABLE command_history')
+            conn.execute('CREATE TABLE command_history (id TEXT PRIMARY KEY, server_id TEXT NOT NULL, '
+                         'command TEXT NOT NULL, output TEXT, exit_code INTEGER, '
+                         'executed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+            conn.execute("INSERT INTO command_history (id, server_id, command, output, exit_code) "
+                         "VALUES ('old', 's0', 'uptime', 'up 3 days', 0)")
+            conn.commit()
+        
+        db.init_db()
+        self.assertEqual(db.get_command_output('old')['output'], 'up 3 days')
+        with db.get_connection() as conn:
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(command_history)')}
+        self.assertNotIn('output', columns)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+import db
+
+class TestCommandSearch(unittest.TestCase):
+    """Test cases for full-text search over command history."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'test.db')
+        patcher = mock.patch.object(db, 'DB_PATH', self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        db.init_db()
+        
+        self.start = 1_700_000_000
+        db.add_command_history_rows([
+            ('oom', 'web1', 'dmesg | tail', 'Out of memory: Killed process 4121 (java)', 0,
+             db.utc_timestamp(self.start)),
+            ('restart', 'web2', 'systemctl restart nginx', '', 0, db.utc_timestamp(self.start + 60)),
+            ('status', 'web2', 'systemctl status nginx', 'nginx.service failed; restart pending', 3,
+             db.utc_timestamp(self.start + 120)),
+        ] + [
+            (f'uptime-{i}', 'web1', 'uptime', 'up 3 days, load average: 0.1', 0,
+             db.utc_timestamp(self.start + 180 + i))
+            for i in range(30)
+        ])
+    
+    def tearDown(self):
+        db.close_connection()
+        shutil.rmtree(self.tmpdir)
+    
+    def ids(self, query, **kwargs):
+        return [row['id'] for row in db.search_command_history(query, **kwargs)['results']]
+    
+    def test_ranked_and_highlighted(self):
+        """Test that matches in commands rank first and come back highlighted."""
+        results = db.search_command_history('restart nginx')['results']
+        self.assertEqual([row['id'] for row in results], ['restart', 'status'])
+        self.assertEqual(results[0]['command_highlight'], 'systemctl <mark>restart</mark> <mark>nginx</mark>')
+        self.assertIsNone(results[0]['output_snippet'])
+        self.assertIn('<mark>restart</mark> pending', results[1]['output_snippet'])
+        self.assertGreater(results[0]['score'], results[1]['score'])
+        
+        hit = db.search_command_history('"out of memory"')['results'][0]
+        self.assertEqual(hit['id'], 'oom')
+        self.assertEqual(hit['server_id'], 'web1')
+        self.assertIn('<mark>Out of memory</mark>', hit['output_snippet'])
+    
+    def test_highlights_escaped(self):
+        """Test that output from hosts is HTML-escaped around the <mark> tags."""
+        db.add_command_history('web3', 'cat /tmp/x.html', '<script>alert(1)</script> OOM & "more"')
+        hit = db.search_command_history('OOM')['results'][0]
+        self.assertEqual(hit['output_snippet'],
+                         '&lt;script&gt;alert(1)&lt;/script&gt; <mark>OOM</mark> &amp; &quot;more&quot;')
+        
+        hit = db.search_command_history('script')['results'][0]
+        self.assertTrue(hit['output_snippet'].startswith('&lt;<mark>script</mark>&gt;'))
+        self.assertNotIn('<script', hit['output_snippet'])
+        self.assertEqual(hit['command_highlight'], 'cat /tmp/x.html')
+    
+    def test_filters_and_pages(self):
+        """Test filters, field restriction, prefixes and offset paging."""
+        self.assertEqual(self.ids('nginx', server_id='web1'), [])
+        self.assertEqual(self.ids('nginx', exit_code=3), ['status'])
+        self.assertEqual(self.ids('nginx', field='output'), ['status'])
+        self.assertEqual(self.ids('mem*'), ['oom'])
+        self.assertEqual(self.ids('systemctl', since=self.start + 90, until=self.start + 150), ['status'])
+        # FTS5 operators in user input are searched for literally
+        self.assertEqual(self.ids('nginx OR uptime'), [])
+        
+        ids, offset = [], 0
+        while offset is not None:
+            page = db.search_command_history('load', sort='recent', limit=7, offset=offset)
+            ids.extend(row['id'] for row in page['results'])
+            offset = page['next_offset']
+        self.assertEqual(ids, [f'uptime-{i}' for i in reversed(range(30))])
+        
+        with self.assertRaises(ValueError):
+            db.search_command_history('  ')
+        with self.assertRaises(ValueError):
+            db.search_command_history('nginx', field='server')
+    
+    def test_existing_history_indexed(self):
+        """Test that history recorded before the index existed is searchable after startup."""
+        db.close_connection()
+        conn = sqlite3.connect(self.path)
+        conn.execute('DROP TABLE command_search')
+        conn.commit()
+        conn.close()
+        
+        db.init_db()
+        self.assertEqual(self.ids('java'), ['oom'])
+        db.add_command_history('web3', 'free -m', 'Mem: 1024 1000 24')
+        self.assertEqual(len(self.ids('mem*')), 2)
+    
+    def test_results_survive_vacuum(self):
+        """Test that search results and highlights still match their entries once rowids change."""
+        with db.get_connection() as conn:
+            # Remove the first entry and its index row, leaving a gap
+            conn.execute("INSERT INTO command_search (command_search, rowid, command, output) "
+                         "SELECT 'delete', entry, command, output FROM command_search_content "
+                         "WHERE entry = (SELECT entry FROM command_history WHERE id = 'oom')")
+            conn.execute("DELETE FROM command_history WHERE id = 'oom'")
+            # VACUUM may renumber rowids; a dump and reload always does
+            conn.execute('CREATE TEMP TABLE saved AS SELECT * FROM command_history')
+            conn.execute('DELETE FROM command_history')
+            conn.execute('INSERT INTO command_history SELECT * FROM saved')
+            conn.commit()
+            conn.execute('VACUUM')
+        
+        results = db.search_command_history('restart nginx')['results']
+        self.assertEqual([row['id'] for row in results], ['restart', 'status'])
+        self.assertEqual(results[0]['command_highlight'], 'systemctl <mark>restart</mark> <mark>nginx</mark>')
+        self.assertIn('<mark>restart</mark> pending', results[1]['output_snippet'])
+        self.assertEqual(self.ids('java'), [])
+        
+        db.add_command_history('web3', 'tail app.log', 'nginx upstream timed out')
+        self.assertEqual(len(self.ids('nginx', sort='recent')), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import time
+import logging
+import unittest
+from unittest import mock
+import ssh_manager as ssh_manager_module
+from ssh_manager import SSHManager
+from command_stream import run_streamed
+from local_ssh_server import LocalSSHServer
+
+logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+class TestCommandStream(unittest.TestCase):
+    """Test cases for streaming command output from an exec channel."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalSSHServer().start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+    
+    def setUp(self):
+        self.ssh = SSHManager()
+        self.assertTrue(self.ssh.connect('local', '127.0.0.1', 'test', password='x', port=self.server.port))
+        self.chunks = []
+    
+    def tearDown(self):
+        self.ssh.disconnect('local')
+    
+    def stream(self, command):
+        return self.ssh.execute_command_stream('local', command,
+                                               lambda stream, text: self.chunks.append((stream, text)))
+    
+    def text(self, stream):
+        return ''.join(text for name, text in self.chunks if name == stream)
+    
+    def test_chunks_decoded_across_reads(self):
+        """Test that a UTF-8 character split between reads arrives whole, with stderr and exit code."""
+        # The euro sign's three bytes arrive in two separate reads
+        result = self.stream(r"printf 'price: \342\202'; sleep 0.3; printf '\254 5\n'; "
+                             r"echo warn >&2; exit 3")
+        
+        self.assertEqual(self.text('stdout'), 'price: € 5\n')
+        self.assertEqual(self.text('stderr'), 'warn\n')
+        self.assertGreaterEqual(len([chunk for chunk in self.chunks if chunk[0] == 'stdout']), 2)
+        self.assertNotIn('�', self.text('stdout'))
+        
+        self.assertEqual(result['exit_code'], 3)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['stdout'], 'price: € 5\n')
+        self.assertEqual(result['stdout_bytes'], len('price: € 5\n'.encode()))
+        self.assertFalse(result['truncated'])
+    
+    def test_tail_kept_when_truncated(self):
+        """Test that output past STREAM_TAIL_BYTES is streamed in full but only its tail is kept."""
+        lines = ''.join(f'line {i:04d}\n' for i in range(500))
+        with mock.patch.object(ssh_manager_module, 'STREAM_TAIL_BYTES', 1000):
+            result = self.stream("i=0; while [ $i -lt 500 ]; do printf 'line %04d\\n' $i; "
+                                 "i=$((i + 1)); [ $((i % 100)) -eq 0 ] && sleep 0.05; done; true")
+        
+        self.assertEqual(self.text('stdout'), lines)
+        self.assertTrue(result['success'])
+        self.assertTrue(result['truncated'])
+        self.assertEqual(result['stdout_bytes'], len(lines))
+        self.assertEqual(result['stdout'], lines[-1000:])
+        self.assertEqual(result['stderr'], '')
+    
+    def test_execute_command_timeout(self):
+        """Test that execute_command abandons a hung command after its timeout and keeps partial output."""
+        start = time.monotonic()
+        result = self.ssh.execute_command('local', 'echo started; sleep 60', timeout=1)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['exit_code'], -1)
+        self.assertEqual(result['error'], 'Command timed out after 1 seconds')
+        self.assertEqual(result['stdout'], 'started\n')
+        
+        # Steady output does not extend the deadline either
+        result = self.ssh.execute_command('local', 'while true; do echo y; sleep 0.01; done', timeout=1)
+        self.assertEqual(result['exit_code'], -1)
+        self.assertTrue(result['stdout'].startswith('y\n'))
+        
+        # The lease was released, so the pool still serves commands
+        self.assertEqual(self.ssh.execute_command('local', 'echo again')['stdout'], 'again\n')
+
+class TestStreamEvents(unittest.TestCase):
+    """Test cases for the Socket.IO events of a streamed execute_action."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalSSHServer().start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+    
+    def setUp(self):
+        self.ssh = SSHManager()
+        self.assertTrue(self.ssh.connect('local', '127.0.0.1', 'test', password='x', port=self.server.port))
+        self.events = []
+    
+    def tearDown(self):
+        self.ssh.disconnect('local')
+    
+    def emit(self, event, data):
+        self.events.append((event, data))
+    
+    def test_events_in_order(self):
+        """Test that command_started, every command_output and command_complete arrive in order."""
+        result = run_streamed(self.ssh, self.emit, 'local', 'echo one; sleep 0.2; echo two; exit 4',
+                              action='run', execution_id='exec-1')
+        
+        names = [event for event, _ in self.events]
+        self.assertEqual(names[0], 'command_started')
+        self.assertEqual(names[-1], 'command_complete')
+        self.assertGreaterEqual(len(names), 4)
+        self.assertEqual(set(names[1:-1]), {'command_output'})
+        
+        payloads = [data for _, data in self.events]
+        self.assertTrue(all(payload['execution_id'] == 'exec-1' for payload in payloads))
+        self.assertTrue(all(payload['server_id'] == 'local' for payload in payloads))
+        self.assertEqual(payloads[0]['command'], 'echo one; sleep 0.2; echo two; exit 4')
+        self.assertEqual(''.join(payload['data'] for payload in payloads[1:-1]), 'one\ntwo\n')
+        self.assertEqual(payloads[-1]['exit_code'], 4)
+        self.assertFalse(payloads[-1]['success'])
+        self.assertEqual(payloads[-1]['stdout_bytes'], 8)
+        self.assertEqual(result['stdout'], 'one\ntwo\n')
+    
+    def test_execution_id_generated(self):
+        """Test that a run without an execution_id gets one shared by all of its events."""
+        run_streamed(self.ssh, self.emit, 'local', 'echo hi')
+        ids = {data['execution_id'] for _, data in self.events}
+        self.assertEqual(len(ids), 1)
+        self.assertTrue(ids.pop())
+
+if __name__ == '__main__':
+    unittest.main()
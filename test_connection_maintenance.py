@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import time
+import unittest
+from unittest import mock
+from connection_maintenance import ConnectionMaintainer
+from test_ssh_manager import FakeSSHManager, server
+
+class TestConnectionMaintainer(unittest.TestCase):
+    """Tests for the background SSH connection maintainer."""
+    
+    def kill_transports(self, manager, server_id):
+        for client in manager.get_pool(server_id).clients():
+            client.close()
+    
+    def test_reconnects_hot_host(self):
+        """Test that a recently used host with dead transports is reconnected."""
+        manager = FakeSSHManager(handshake_time=0)
+        manager.ensure_connected(server('a'))
+        self.kill_transports(manager, 'a')
+        
+        maintainer = ConnectionMaintainer(manager)
+        maintainer.run_once()
+        
+        self.assertIsNotNone(manager.get_connection('a'))
+        self.assertEqual(manager.handshakes, 2)
+        self.assertEqual(maintainer.stats()['reconnected'], 1)
+    
+    def test_drops_cold_host(self):
+        """Test that a dead connection to a host not used recently is dropped."""
+        manager = FakeSSHManager(handshake_time=0)
+        manager.ensure_connected(server('a'))
+        self.kill_transports(manager, 'a')
+        manager.connections['a']['last_used'] = time.time() - 1000
+        
+        maintainer = ConnectionMaintainer(manager, hot_window=300, idle_timeout=3600)
+        maintainer.run_once()
+        
+        self.assertNotIn('a', manager.connections)
+        self.assertEqual(maintainer.stats()['dropped'], 1)
+    
+    def test_backoff_after_failed_reconnect(self):
+        """Test that a failed reconnect is not retried before its backoff expires."""
+        manager = FakeSSHManager(handshake_time=0)
+        manager.ensure_connected(server('a'))
+        self.kill_transports(manager, 'a')
+        
+        def refuse(*args):
+            manager.handshakes += 1
+            raise ConnectionError('refused')
+        manager._open_client = refuse
+        
+        maintainer = ConnectionMaintainer(manager)
+        maintainer.run_once()
+        maintainer.run_once()
+        
+        self.assertEqual(manager.handshakes, 2)
+        self.assertEqual(maintainer.stats()['reconnect_failures'], 1)
+        self.assertEqual(maintainer.stats()['backing_off'], 1)
+        self.assertEqual(manager.breakers.get('a.example', 22).failures, 1)
+    
+    def test_open_circuit_skips_reconnect(self):
+        """Test that hosts with an open circuit are not refilled while the others are, in parallel."""
+        manager = FakeSSHManager(handshake_time=0.3)
+        for server_id in ('a', 'b', 'c'):
+            manager.ensure_connected(server(server_id))
+            self.kill_transports(manager, server_id)
+        breaker = manager.breakers.get('a.example', 22)
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure('timed out')
+        
+        maintainer = ConnectionMaintainer(manager)
+        with mock.patch('connection_maintenance.probe', return_value=False):
+            start = time.monotonic()
+            maintainer.run_once()
+            elapsed = time.monotonic() - start
+        
+        self.assertEqual(manager.handshakes, 5)
+        self.assertLess(elapsed, 0.55)
+        self.assertEqual(maintainer.stats()['reconnected'], 2)
+        self.assertEqual(breaker.status()['state'], 'open')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import db
+
+class TestConnectionLayer(unittest.TestCase):
+    """Test cases for the per-thread SQLite connection layer."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        patcher = mock.patch.object(db, 'DB_PATH', os.path.join(self.tmpdir, 'test.db'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        db.init_db()
+    
+    def tearDown(self):
+        db.close_connection()
+        shutil.rmtree(self.tmpdir)
+    
+    def test_connection_reused_per_thread_in_wal_mode(self):
+        """Test that a thread reuses one WAL connection and other threads get their own."""
+        with db.get_connection() as first, db.get_connection() as nested:
+            self.assertIs(first, nested)
+            self.assertEqual(first.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        with db.get_connection() as again:
+            self.assertIs(again, first)
+        
+        other = []
+        
+        def use_connection():
+            with db.get_connection() as conn:
+                other.append(conn)
+            db.close_connection()
+        
+        thread = threading.Thread(target=use_connection)
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], first)
+    
+    def test_connection_closed_when_thread_exits(self):
+        """Test that a worker thread's connection is closed when the thread exits without closing it."""
+        closed = []
+        original = db._ThreadConnection.__del__
+    
+        def record_close(held):
+            original(held)
+            closed.append(threading.current_thread().ident)
+        
+        with mock.patch.object(db._ThreadConnection, '__del__', record_close):
+            thread = threading.Thread(target=db.get_servers)
+            thread.start()
+            thread.join()
+            # The thread's local data is released just after join() returns
+            deadline = time.monotonic() + 2
+            while not closed and time.monotonic() < deadline:
+                time.sleep(0.01)
+        
+        self.assertEqual(closed, [thread.ident])
+    
+    def test_uncommitted_work_rolled_back_by_outermost_block(self):
+        """Test that nested blocks keep the outer transaction and a forgotten commit does not leak."""
+        with db.get_connection() as conn:
+            conn.execute("INSERT INTO servers (id, name, hostname, username) VALUES ('a', 'a', 'h', 'u')")
+            # A nested helper call must not roll back the caller's transaction
+            self.assertIsNotNone(db.get_server('a'))
+            conn.commit()
+        
+        with db.get_connection() as conn:
+            conn.execute("INSERT INTO servers (id, name, hostname, username) VALUES ('b', 'b', 'h', 'u')")
+        
+        self.assertEqual([server['id'] for server in db.get_servers()], ['a'])
+
+if __name__ == '__main__':
+    unittest.main()
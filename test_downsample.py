@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import unittest
+import numpy as np
+from downsample import lttb, downsample, chart_series
+
+class TestDownsample(unittest.TestCase):
+    """Test cases for LTTB chart downsampling."""
+    
+    def test_keeps_peaks_and_dips(self):
+        """Test that single-sample spikes survive heavy downsampling."""
+        x = np.arange(30000) * 60
+        y = np.random.default_rng(5).normal(50, 1, 30000)
+        y[7000], y[21000] = 100, 0
+        
+        keep = lttb(x, y, 200)
+        self.assertEqual(len(keep), 200)
+        self.assertEqual((keep[0], keep[-1]), (0, 29999))
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        self.assertIn(7000, keep)
+        self.assertIn(21000, keep)
+    
+    def test_short_series_and_gaps(self):
+        """Test that series under budget pass through and missing values are dropped."""
+        series = downsample([10, 20, 30, 40], [1.0, None, float('nan'), 4.0], 100)
+        self.assertEqual(series, {'timestamps': [10, 40], 'values': [1.0, 4.0],
+                                  'min': [1.0, 4.0], 'max': [1.0, 4.0]})
+        self.assertEqual(lttb(np.arange(5), np.zeros(5), 2).tolist(), [0, 4])
+    
+    def test_payload_size_independent_of_range(self):
+        """Test that chart series hold the point budget whatever the source length."""
+        for length in (2000, 50000):
+            history = {
+                'server_id': 's1', 'from': 0, 'to': length, 'resolution': 0,
+                'timestamps': list(range(length)),
+                'metrics': {'cpu_usage': {'mean': np.sin(np.arange(length) / 50).tolist()}}
+            }
+            chart = chart_series(history, 300)
+            cpu = chart['series']['cpu_usage']
+            self.assertEqual(chart['source_points'], length)
+            self.assertEqual(len(cpu['timestamps']), 300)
+            self.assertEqual((min(cpu['min']), max(cpu['max'])), (-1.0, 1.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+import unittest
+from fanout import FanOutExecutor
+
+class TestFanOutExecutor(unittest.TestCase):
+    """Test cases for the bounded-concurrency fan-out executor."""
+    
+    def setUp(self):
+        self.executor = FanOutExecutor(max_workers=8, per_host_limit=2)
+    
+    def tearDown(self):
+        self.executor.shutdown()
+    
+    def _tracking_task(self, delay=0.05):
+        """Build a task that records peak concurrency overall and per host."""
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0, 'host_active': {}, 'host_peak': {}}
+        
+        def task(item):
+            host = item['host']
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+                state['host_active'][host] = state['host_active'].get(host, 0) + 1
+                state['host_peak'][host] = max(state['host_peak'].get(host, 0), state['host_active'][host])
+            time.sleep(delay)
+            with lock:
+                state['active'] -= 1
+                state['host_active'][host] -= 1
+            return item['id']
+        
+        return task, state
+    
+    def test_latency_tracks_slowest_host(self):
+        """Test that total time is close to the slowest task, not the sum."""
+        items = [{'id': i, 'host': f'host{i}', 'delay': 0.02 * (i % 4)} for i in range(8)]
+        start = time.monotonic()
+        results = list(self.executor.map_unordered(
+            lambda item: time.sleep(item['delay']) or item['id'],
+            items, key=lambda item: item['host']))
+        elapsed = time.monotonic() - start
+        self.assertEqual(sorted(future.result() for _, future in results), list(range(8)))
+        self.assertLess(elapsed, 0.2)
+    
+    def test_results_in_completion_order(self):
+        """Test that faster hosts are yielded first."""
+        items = [{'id': 'slow', 'delay': 0.1}, {'id': 'fast', 'delay': 0.0}]
+        order = [item['id'] for item, _ in self.executor.map_unordered(
+            lambda item: time.sleep(item['delay']), items, key=lambda item: item['id'])]
+        self.assertEqual(order, ['fast', 'slow'])
+    
+    def test_global_cap(self):
+        """Test that no more than max_workers tasks run at once."""
+        task, state = self._tracking_task()
+        items = [{'id': i, 'host': f'host{i}'} for i in range(20)]
+        list(self.executor.map_unordered(task, items, key=lambda item: item['host']))
+        self.assertLessEqual(state['peak'], 8)
+    
+    def test_per_host_cap(self):
+        """Test that tasks for one host are capped while other hosts proceed."""
+        task, state = self._tracking_task()
+        items = [{'id': i, 'host': 'busy'} for i in range(6)] + [{'id': 'other', 'host': 'idle'}]
+        results = list(self.executor.map_unordered(task, items, key=lambda item: item['host']))
+        self.assertEqual(len(results), 7)
+        self.assertEqual(state['host_peak']['busy'], 2)
+        self.assertEqual(self.executor.stats()['active'], 0)
+    
+    def test_exception_captured_in_future(self):
+        """Test that a failing task does not break the fan-out."""
+        def task(item):
+            if item == 'bad':
+                raise RuntimeError('boom')
+            return item
+        
+        results = {item: future for item, future in self.executor.map_unordered(task, ['good', 'bad'], key=str)}
+        self.assertEqual(results['good'].result(), 'good')
+        self.assertRaises(RuntimeError, results['bad'].result)
+
+if __name__ == "__main__":
+    unittest.main()
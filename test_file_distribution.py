@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import logging
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import sftp_transfer
+from ssh_manager import SSHManager
+from file_distribution import FileDistributor
+from local_ssh_server import LocalSSHServer
+
+logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+PART_SIZE = 256 * 1024
+
+class TestFileDistribution(unittest.TestCase):
+    """Test cases for pushing one file to many servers."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalSSHServer().start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        patcher = mock.patch.multiple(sftp_transfer, TRANSFER_PART_SIZE=PART_SIZE,
+                                      TRANSFER_STATE_DIR=os.path.join(self.tmpdir, 'state'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.source = os.path.join(self.tmpdir, 'artifact.bin')
+        self.data = os.urandom(PART_SIZE * 3 + 100)
+        with open(self.source, 'wb') as f:
+            f.write(self.data)
+        
+        self.ssh = SSHManager()
+        self.distributor = FileDistributor(self.ssh, concurrency=2, progress_interval=0)
+    
+    def tearDown(self):
+        for server_id in list(self.ssh.connections):
+            self.ssh.disconnect(server_id)
+        shutil.rmtree(self.tmpdir)
+    
+    def target(self, server_id, port=None):
+        return {'id': server_id, 'name': server_id, 'hostname': '127.0.0.1', 'username': 'test',
+                'password': 'x', 'port': port or self.server.port}
+    
+    def test_distribute_to_many(self):
+        """Test that every target receives an identical copy and reports progress."""
+        events = []
+        events_lock = threading.Lock()
+        
+        def on_progress(progress):
+            with events_lock:
+                events.append(progress)
+        
+        remote = os.path.join(self.tmpdir, 'remote-{}.bin')
+        servers = [self.target(f'host{i}') for i in range(3)]
+        summaries = []
+        for server in servers:
+            # Each target writes to its own path on the shared stand-in server
+            summaries.append(self.distributor.distribute(
+                self.source, remote.format(server['id']), [server], on_progress=on_progress
+            ))
+        
+        for server, summary in zip(servers, summaries):
+            self.assertTrue(summary['success'], summary)
+            self.assertEqual(summary['bytes_sent'], len(self.data))
+            host = summary['hosts'][0]
+            self.assertEqual(host['state'], 'done')
+            self.assertIsNotNone(host['throughput_mb_s'])
+            with open(remote.format(server['id']), 'rb') as f:
+                self.assertEqual(f.read(), self.data)
+        
+        host0 = [event for event in events if event['server_id'] == 'host0']
+        self.assertEqual(host0[0]['state'], 'connecting')
+        self.assertEqual(host0[-1]['state'], 'done')
+        self.assertEqual(host0[-1]['bytes_sent'], len(self.data))
+        sent = [event['bytes_sent'] for event in host0]
+        self.assertEqual(sent, sorted(sent))
+    
+    def test_parallel_targets_and_failures(self):
+        """Test that one unreachable target fails alone while the rest succeed."""
+        remote = os.path.join(self.tmpdir, 'shared.bin')
+        servers = [self.target('good'), self.target('bad', port=1)]
+        
+        summary = self.distributor.distribute(self.source, remote, servers)
+        
+        self.assertFalse(summary['success'])
+        self.assertEqual((summary['succeeded'], summary['failed']), (1, 1))
+        hosts = {host['server_id']: host for host in summary['hosts']}
+        self.assertEqual(hosts['good']['state'], 'done')
+        self.assertEqual(hosts['bad']['state'], 'failed')
+        self.assertTrue(hosts['bad']['error'])
+        with open(remote, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_sync_sends_only_changes(self):
+        """Test that a synced distribution skips hosts already up to date and patches changed ones."""
+        remote = os.path.join(self.tmpdir, 'synced.bin')
+        server = self.target('host0')
+        
+        first = self.distributor.distribute(self.source, remote, [server], sync=True)
+        self.assertTrue(first['success'], first)
+        self.assertEqual(first['hosts'][0]['action'], 'uploaded')
+        
+        again = self.distributor.distribute(self.source, remote, [server], sync=True)
+        self.assertEqual((again['hosts'][0]['action'], again['bytes_sent']), ('skipped', 0))
+        
+        changed = self.data[:1000] + b'patched' + self.data[1000:]
+        with open(self.source, 'wb') as f:
+            f.write(changed)
+        patched = self.distributor.distribute(self.source, remote, [server], sync=True)
+        self.assertEqual(patched['hosts'][0]['action'], 'delta')
+        self.assertLess(patched['bytes_sent'], len(changed) // 10)
+        with open(remote, 'rb') as f:
+            self.assertEqual(f.read(), changed)
+
+if __name__ == '__main__':
+    unittest.main()
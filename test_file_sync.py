@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import random
+import shutil
+import logging
+import tempfile
+import subprocess
+import unittest
+from file_sync import REMOTE_HELPER, compute_delta
+from ssh_manager import SSHManager
+from local_ssh_server import LocalSSHServer
+
+logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+def random_bytes(size, seed):
+    rng = random.Random(seed)
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+class TestDeltaEncoding(unittest.TestCase):
+    """Test cases for the rsync-style delta encoder and the remote helper."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    
+    def helper(self, *args):
+        result = subprocess.run(['python3', '-c', REMOTE_HELPER, *args],
+                                capture_output=True, check=True)
+        return result.stdout.decode()
+    
+    def test_delta_round_trip(self):
+        """Test that shifted, edited and appended data is rebuilt from a small delta."""
+        block_size = 2048
+        old = random_bytes(200_000, 1)
+        new = old[:50_000] + b'inserted' + old[50_000:120_000] + random_bytes(3000, 2) + old[123_000:] + b'tail'
+        
+        basis = os.path.join(self.tmpdir, 'basis')
+        with open(basis, 'wb') as f:
+            f.write(old)
+        signatures = json.loads(self.helper('sig', basis, str(block_size)))
+        
+        delta, matched = compute_delta(new, signatures, block_size)
+        self.assertLess(len(delta), 12_000)
+        self.assertGreater(matched, 90)
+        
+        delta_path = os.path.join(self.tmpdir, 'delta')
+        out_path = os.path.join(self.tmpdir, 'out')
+        with open(delta_path, 'wb') as f:
+            f.write(delta)
+        self.helper('patch', basis, delta_path, out_path, str(block_size))
+        with open(out_path, 'rb') as f:
+            self.assertEqual(f.read(), new)
+
+class TestFileSync(unittest.TestCase):
+    """Test cases for syncing files and trees to a host."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalSSHServer().start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.local = os.path.join(self.tmpdir, 'local')
+        self.remote = os.path.join(self.tmpdir, 'remote')
+        os.makedirs(os.path.join(self.local, 'conf.d'))
+        for i in range(10):
+            with open(os.path.join(self.local, 'conf.d', f'{i}.conf'), 'w') as f:
+                f.write(f'setting_{i} = on\n' * 50)
+        with open(os.path.join(self.local, 'bundle.bin'), 'wb') as f:
+            f.write(random_bytes(100_000, 3))
+        
+        self.ssh = SSHManager()
+        self.assertTrue(self.ssh.connect('local', '127.0.0.1', 'test', password='x', port=self.server.port))
+    
+    def tearDown(self):
+        self.ssh.disconnect('local')
+        shutil.rmtree(self.tmpdir)
+    
+    def test_directory_sync(self):
+        """Test that unchanged trees cost nothing and changed files are delta-synced."""
+        result = self.ssh.sync_directory('local', self.local, self.remote)
+        self.assertTrue(result['success'], result)
+        self.assertEqual((result['files'], result['uploaded']), (11, 11))
+        
+        result = self.ssh.sync_directory('local', self.local, self.remote)
+        self.assertEqual((result['unchanged'], result['bytes_sent']), (11, 0))
+        
+        bundle = os.path.join(self.local, 'bundle.bin')
+        with open(bundle, 'rb') as f:
+            data = f.read()
+        with open(bundle, 'wb') as f:
+            f.write(data[:40_000] + b'patched' + data[40_000:])
+        
+        result = self.ssh.sync_directory('local', self.local, self.remote)
+        self.assertEqual((result['unchanged'], result['delta']), (10, 1))
+        self.assertLess(result['bytes_sent'], 10_000)
+        with open(os.path.join(self.remote, 'bundle.bin'), 'rb') as f:
+            self.assertEqual(f.read(), data[:40_000] + b'patched' + data[40_000:])
+    
+    def test_delete_limited_to_manifest(self):
+        """Test that remote edits are noticed and delete only removes files an earlier sync wrote."""
+        self.assertTrue(self.ssh.sync_directory('local', self.local, self.remote)['success'])
+        with open(os.path.join(self.remote, 'operator.log'), 'w') as f:
+            f.write('not ours\n')
+        with open(os.path.join(self.remote, 'conf.d', '5.conf'), 'w') as f:
+            f.write('edited on the host\n')
+        os.remove(os.path.join(self.local, 'conf.d', '0.conf'))
+        
+        # Without delete the file stays, and stays in the manifest
+        result = self.ssh.sync_directory('local', self.local, self.remote)
+        self.assertEqual((result['uploaded'], result['deleted']), (1, 0))
+        self.assertTrue(os.path.exists(os.path.join(self.remote, 'conf.d', '0.conf')))
+        
+        result = self.ssh.sync_directory('local', self.local, self.remote, delete=True)
+        self.assertEqual(result['deleted'], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.remote, 'conf.d', '0.conf')))
+        self.assertTrue(os.path.exists(os.path.join(self.remote, 'operator.log')))
+        with open(os.path.join(self.remote, 'conf.d', '5.conf')) as f:
+            self.assertEqual(f.read(), 'setting_5 = on\n' * 50)
+    
+    def test_file_sync_fast_paths(self):
+        """Test the size/mtime and checksum skips for a single file."""
+        local = os.path.join(self.local, 'conf.d', '1.conf')
+        remote = os.path.join(self.tmpdir, '1.conf')
+        
+        self.assertEqual(self.ssh.sync_file('local', local, remote)['action'], 'uploaded')
+        self.assertEqual(self.ssh.sync_file('local', local, remote)['reason'], 'size_mtime')
+        
+        # Same content with a new mtime is caught by the checksum
+        stat = os.stat(local)
+        os.utime(local, (stat.st_atime, stat.st_mtime + 60))
+        self.assertEqual(self.ssh.sync_file('local', local, remote)['reason'], 'checksum')
+        self.assertEqual(self.ssh.sync_file('local', local, remote)['reason'], 'size_mtime')
+        
+        # A missing local file is reported, not raised
+        result = self.ssh.sync_file('local', os.path.join(self.local, 'missing.conf'), remote)
+        self.assertFalse(result['success'])
+        self.assertIn('No such file', result['error'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import db
+from history_writer import HistoryWriter
+
+class TestHistoryWriter(unittest.TestCase):
+    """Test cases for the write-behind command history queue."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        patcher = mock.patch.object(db, 'DB_PATH', os.path.join(self.tmpdir, 'test.db'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        db.init_db()
+    
+    def tearDown(self):
+        db.close_connection()
+        shutil.rmtree(self.tmpdir)
+    
+    def count(self):
+        with db.get_connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM command_history').fetchone()[0]
+    
+    def test_rows_written_in_batches(self):
+        """Test that queued rows are written in batches and flush() makes them visible."""
+        writer = HistoryWriter(batch_size=100, flush_ms=1000)
+        ids = [writer.add('s1', f'echo {i}', str(i), 0) for i in range(250)]
+        self.assertTrue(writer.flush(timeout=5))
+        writer.close()
+        
+        self.assertEqual(self.count(), 250)
+        stats = writer.stats()
+        self.assertEqual((stats['written'], stats['depth'], stats['failed']), (250, 0, 0))
+        self.assertLess(stats['batches'], 10)
+        self.assertIsNotNone(stats['avg_flush_ms'])
+        
+        row = db.get_command_history('s1', limit=1000)[-1]
+        self.assertIn(row['id'], ids)
+        self.assertRegex(row['executed_at'], r'^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d$')
+    
+    def test_interval_flush(self):
+        """Test that a partial batch is written once it has waited flush_ms."""
+        writer = HistoryWriter(batch_size=1000, flush_ms=50)
+        writer.add('s1', 'uptime', 'up', 0)
+        deadline = time.monotonic() + 2
+        while self.count() == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.count(), 1)
+        writer.close()
+    
+    def test_backpressure_falls_back_to_direct_writes(self):
+        """Test that a full queue blocks briefly and then writes on the caller's thread."""
+        release = threading.Event()
+        original = db.add_command_history_rows
+        
+        def stalled(rows):
+            if threading.current_thread().name == 'history-writer':
+                release.wait(5)
+            original(rows)
+        
+        writer = HistoryWriter(batch_size=1, flush_ms=0, queue_size=2, put_timeout=0.05)
+        with mock.patch.object(db, 'add_command_history_rows', stalled):
+            for i in range(6):
+                writer.add('s1', f'echo {i}', '', 0)
+            stats = writer.stats()
+            self.assertGreater(stats['blocked_puts'], 0)
+            self.assertGreater(stats['direct_writes'], 0)
+            
+            release.set()
+            writer.close()
+        self.assertEqual(self.count(), 6)
+    
+    def test_failing_row_does_not_sink_batch(self):
+        """Test that a failed batch is retried, then written row by row around a bad row."""
+        original = db.add_command_history_rows
+        calls = []
+        
+        def flaky(rows):
+            calls.append(len(rows))
+            if len(calls) == 1:
+                raise sqlite3.OperationalError('database is locked')
+            if any(row[2] == 'bad' for row in rows):
+                raise ValueError('bad row')
+            original(rows)
+        
+        writer = HistoryWriter(batch_size=100, flush_ms=1000)
+        with mock.patch.object(db, 'add_command_history_rows', flaky):
+            writer.add('s1', 'echo 0', '', 0)
+            writer.flush(timeout=5)
+            self.assertEqual(calls, [1, 1])
+            
+            for command in ('echo 1', 'bad', 'echo 2', 'echo 3'):
+                writer.add('s1', command, '', 0)
+            writer.close()
+        
+        self.assertEqual(calls[2:], [4, 4, 1, 1, 1, 1])
+        self.assertEqual(self.count(), 4)
+        stats = writer.stats()
+        self.assertEqual((stats['written'], stats['failed']), (4, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import unittest
+import paramiko
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from key_loader import PrivateKeyCache
+
+def write_ed25519_key(path):
+    key = ed25519.Ed25519PrivateKey.generate()
+    with open(path, 'wb') as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.OpenSSH,
+            serialization.NoEncryption()
+        ))
+
+class TestPrivateKeyCache(unittest.TestCase):
+    """Test cases for the parsed private-key cache."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    
+    def test_key_types(self):
+        """Test that RSA, ECDSA and Ed25519 keys are all detected."""
+        paths = {name: os.path.join(self.tmpdir, name) for name in ('rsa', 'ecdsa', 'ed25519')}
+        paramiko.RSAKey.generate(1024).write_private_key_file(paths['rsa'])
+        paramiko.ECDSAKey.generate().write_private_key_file(paths['ecdsa'])
+        write_ed25519_key(paths['ed25519'])
+        
+        cache = PrivateKeyCache()
+        self.assertIsInstance(cache.load(paths['rsa']), paramiko.RSAKey)
+        self.assertIsInstance(cache.load(paths['ecdsa']), paramiko.ECDSAKey)
+        self.assertIsInstance(cache.load(paths['ed25519']), paramiko.Ed25519Key)
+    
+    def test_cache_hit_and_invalidation(self):
+        """Test that a key is parsed once and re-parsed after the file changes."""
+        path = os.path.join(self.tmpdir, 'id_ed25519')
+        write_ed25519_key(path)
+        
+        cache = PrivateKeyCache()
+        first = cache.load(path)
+        self.assertIs(cache.load(path), first)
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (1, 1))
+        
+        # Replace the key; a different mtime invalidates the entry
+        write_ed25519_key(path)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        second = cache.load(path)
+        self.assertIsNot(second, first)
+        self.assertNotEqual(second.asbytes(), first.asbytes())
+        self.assertEqual(cache.stats()['misses'], 2)
+    
+    def test_disabled(self):
+        """Test that a disabled cache parses on every load."""
+        path = os.path.join(self.tmpdir, 'id_ed25519')
+        write_ed25519_key(path)
+        
+        cache = PrivateKeyCache(enabled=False)
+        cache.load(path)
+        cache.load(path)
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses'], cache.stats()['keys']), (0, 2, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import unittest
+import subprocess
+from unittest import mock
+from metrics import (COLLECTOR_SCRIPT, RateTracker, build_collector_script, split_sections,
+                     parse_metric, parse_collector_output)
+from server_manager import ServerManager
+
+class TestMetricsCollector(unittest.TestCase):
+    """Test cases for the single-exec metrics collector script and its parser."""
+    
+    def test_split_sections(self):
+        """Test splitting sectioned output with per-section exit codes."""
+        output = (
+            "@@infrawhiz begin cpu\n12.5\n@@infrawhiz end cpu 0\n"
+            "@@infrawhiz begin uptime\n@@infrawhiz end uptime 127\n"
+        )
+        sections = split_sections(output)
+        self.assertEqual(sections['cpu'], ('12.5', 0))
+        self.assertEqual(sections['uptime'], ('', 127))
+    
+    def test_truncated_section_dropped(self):
+        """Test that a section without an end marker is ignored."""
+        sections = split_sections("@@infrawhiz begin cpu\n12.5\n")
+        self.assertEqual(sections, {})
+    
+    def test_parse_collector_output(self):
+        """Test parsing a full collector output into the metrics dict."""
+        output = (
+            "@@infrawhiz begin cpu\ncpu  700 0 300 8000 1000 0 0 0 0 0\n@@infrawhiz end cpu 0\n"
+            "@@infrawhiz begin memory\nMemTotal:       2048 kB\nMemFree:         256 kB\n"
+            "MemAvailable:    1536 kB\n@@infrawhiz end memory 0\n"
+            "@@infrawhiz begin disk\nFilesystem 1-blocks Used Available Capacity Mounted on\n"
+            "/dev/vda 20000 5000 15000 25% /\n@@infrawhiz end disk 0\n"
+            "@@infrawhiz begin load\n0.10 0.20 0.30 1/100 4242\n@@infrawhiz end load 0\n"
+            "@@infrawhiz begin uptime\n7380.5 1000.0\n@@infrawhiz end uptime 0\n"
+            "@@infrawhiz begin network\nInter-|   Receive |  Transmit\n"
+            " face |bytes packets|bytes packets\n"
+            "    lo: 999 1 0 0 0 0 0 0 999 1 0 0 0 0 0 0\n"
+            "  eth0: 100 1 0 0 0 0 0 0 200 2 0 0 0 0 0 0\n@@infrawhiz end network 0\n"
+        )
+        metrics = RateTracker().apply('s1', parse_collector_output(output, {}))
+        self.assertEqual(metrics['cpu_usage'], 10.0)
+        self.assertEqual(metrics['memory_total'], 2048 * 1024)
+        self.assertEqual(metrics['memory_used'], 512 * 1024)
+        self.assertEqual(metrics['memory_percent'], 25.0)
+        self.assertEqual(metrics['disk_used'], 5000)
+        self.assertEqual(metrics['disk_percent'], 25.0)
+        self.assertEqual(metrics['load_15'], 0.3)
+        self.assertEqual(metrics['uptime'], 'up 2 hours, 3 minutes')
+        self.assertEqual(list(metrics['network_interfaces']), ['eth0'])
+        self.assertEqual(metrics['network_tx'], 200)
+        self.assertNotIn('counters', metrics)
+    
+    def test_rates_from_deltas(self):
+        """Test that CPU usage, network rates and IOPS come from the previous sample."""
+        tracker = RateTracker()
+        
+        def sample(timestamp, busy, idle, rx, reads, writes):
+            metrics = {'timestamp': timestamp}
+            parse_metric('cpu', f"cpu  {busy} 0 0 {idle} 0 0 0 0", metrics)
+            parse_metric('network', f"eth0: {rx} 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0", metrics)
+            parse_metric('diskstats', (
+                f"   8 0 sda {reads} 0 80 0 {writes} 0 160 0 0 0 0 0 0 0 0\n"
+                f"   8 1 sda1 {reads} 0 80 0 {writes} 0 160 0 0 0 0 0 0 0 0\n"
+                "   7 0 loop0 5000 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0"
+            ), metrics)
+            return tracker.apply('s1', metrics)
+        
+        first = sample(100.0, 100, 900, 1000, 10, 10)
+        self.assertEqual(first['cpu_usage'], 10.0)  # since boot
+        self.assertIsNone(first['network_interfaces']['eth0']['rx_bytes_per_sec'])
+        self.assertNotIn('disk_iops', first)
+        self.assertEqual(list(first['disks']), ['sda'])
+        
+        second = sample(102.0, 400, 1000, 5000, 50, 70)
+        self.assertEqual(second['rate_interval'], 2.0)
+        self.assertEqual(second['cpu_usage'], 75.0)
+        self.assertEqual(second['network_rx_rate'], 2000.0)
+        self.assertEqual(second['disk_iops'], 50.0)
+        self.assertEqual(second['disks']['sda']['read_iops'], 20.0)
+        
+        # Counters reset by a reboot give no rate rather than a negative one
+        third = sample(104.0, 10, 10, 10, 1, 1)
+        self.assertIsNone(third['network_interfaces']['eth0']['rx_bytes_per_sec'])
+        self.assertEqual(third['disk_iops'], 0)
+    
+    def test_failed_section_skipped(self):
+        """Test that a section with a non-zero exit code is not parsed."""
+        output = "@@infrawhiz begin cpu\ngarbage\n@@infrawhiz end cpu 1\n"
+        metrics = parse_collector_output(output, {})
+        self.assertNotIn('cpu_usage', metrics)
+    
+    def test_script_runs_locally(self):
+        """Test that the generated script runs in a shell and every section is closed."""
+        script = build_collector_script({'one': 'echo 1', 'fail': 'false'})
+        output = subprocess.run(['/bin/sh', '-c', script], capture_output=True, text=True).stdout
+        sections = split_sections(output)
+        self.assertEqual(sections['one'], ('1', 0))
+        self.assertEqual(sections['fail'][1], 1)
+        self.assertIn('cpu', split_sections(
+            subprocess.run(['/bin/sh', '-c', COLLECTOR_SCRIPT], capture_output=True, text=True).stdout
+        ))
+    
+    def test_server_manager_rates(self):
+        """Test that ServerManager.get_metrics turns the collector's counters into rates."""
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        manager = ServerManager(db_path=os.path.join(tmpdir, 'servers.db'))
+        
+        def collector_output(busy, idle, rx):
+            return (
+                f"@@infrawhiz begin cpu\ncpu  {busy} 0 0 {idle} 0 0 0 0\n@@infrawhiz end cpu 0\n"
+                f"@@infrawhiz begin network\neth0: {rx} 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0\n"
+                "@@infrawhiz end network 0\n"
+            )
+        
+        samples = [collector_output(100, 900, 1000), collector_output(400, 1000, 5000)]
+        with mock.patch.object(manager, 'execute_command',
+                               side_effect=[{'stdout': out, 'stderr': '', 'exit_code': 0} for out in samples]), \
+                mock.patch('server_manager.time.time', side_effect=[100.0, 102.0]):
+            first = manager.get_metrics('s1')
+            second = manager.get_metrics('s1')
+        
+        self.assertEqual(first['cpu_usage'], 10.0)
+        self.assertNotIn('counters', first)
+        self.assertEqual(second['cpu_usage'], 75.0)
+        self.assertEqual(second['network_rx_rate'], 2000.0)
+        self.assertNotIn('counters', second)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import unittest
+import numpy as np
+from metrics_buffer import MetricRingBuffer, MetricsBuffer, METRICS_BUFFER_SAMPLES, BUFFERED_METRICS
+
+class TestMetricRingBuffer(unittest.TestCase):
+    """Test cases for the per-server metrics ring buffer."""
+    
+    def test_wraparound_keeps_newest(self):
+        """Test that a full buffer overwrites the oldest samples and stays ordered."""
+        buffer = MetricRingBuffer(capacity=5, metrics=('cpu_usage',))
+        for i in range(8):
+            buffer.append(1000 + i, {'cpu_usage': i})
+        
+        series = buffer.series()
+        self.assertEqual(series['timestamps'], [1003, 1004, 1005, 1006, 1007])
+        self.assertEqual(series['cpu_usage'], [3.0, 4.0, 5.0, 6.0, 7.0])
+        self.assertEqual(buffer.series(since=1006)['timestamps'], [1006, 1007])
+    
+    def test_aggregates_match_numpy(self):
+        """Test window aggregates against plain NumPy, skipping missing values."""
+        buffer = MetricRingBuffer(capacity=100, metrics=('cpu_usage', 'load_1', 'disk_iops'))
+        values = np.random.default_rng(1).uniform(0, 100, 150)
+        for i, value in enumerate(values):
+            buffer.append(i, {'cpu_usage': value, 'load_1': value / 10 if i % 2 else None})
+        
+        aggregates = buffer.aggregate(since=100)
+        window = values[100:].astype(np.float32).astype(np.float64)
+        cpu = aggregates['cpu_usage']
+        self.assertEqual(cpu['count'], 50)
+        self.assertAlmostEqual(cpu['min'], window.min(), places=3)
+        self.assertAlmostEqual(cpu['max'], window.max(), places=3)
+        self.assertAlmostEqual(cpu['mean'], window.mean(), places=3)
+        self.assertAlmostEqual(cpu['p95'], np.percentile(window, 95), places=3)
+        self.assertEqual(aggregates['load_1']['count'], 25)
+        self.assertEqual(aggregates['disk_iops'], {'count': 0, 'min': None, 'max': None,
+                                                   'mean': None, 'p95': None})
+    
+    def test_memory_footprint(self):
+        """Test that a day of 10-second samples for 1,000 servers stays under 400 MB."""
+        registry = MetricsBuffer()
+        registry.record('s1', {'timestamp': 1, 'cpu_usage': 5})
+        per_server = registry.stats()['memory_bytes']
+        self.assertEqual(per_server, METRICS_BUFFER_SAMPLES * (4 + 4 * len(BUFFERED_METRICS)))
+        self.assertLess(per_server * 1000, 400 * 1024 * 1024)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+import db
+import metrics_history
+from metrics_history import MetricsHistory, BLOCK_SPANS
+from series_codec import Block
+
+class TestMetricsHistory(unittest.TestCase):
+    """Test cases for the SQLite metrics time-series store."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        patcher = mock.patch.object(db, 'DB_PATH', os.path.join(self.tmpdir, 'test.db'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        db.init_db()
+        
+        # Two hours of 10-second samples ending at a whole hour
+        self.end = int(time.time()) // 3600 * 3600
+        self.start = self.end - 7200
+        self.timestamps = np.arange(self.start, self.end, 10)
+        self.cpu = np.random.default_rng(7).uniform(0, 100, len(self.timestamps)).astype(np.float32)
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    
+    def fill(self, history):
+        for ts, cpu in zip(self.timestamps, self.cpu):
+            history.record('s1', {'timestamp': float(ts), 'cpu_usage': float(cpu), 'load_1': 1.0})
+        history.flush()
+    
+    def test_rollups_and_resolution_choice(self):
+        """Test that a wide step reads a rollup whose aggregates match the raw samples."""
+        history = MetricsHistory(batch_size=50)
+        self.fill(history)
+        
+        result = history.query('s1', self.start, self.end - 1, step=300, metrics=['cpu_usage'])
+        self.assertEqual(result['resolution'], 300)
+        self.assertEqual(len(result['timestamps']), 24)
+        cpu = result['metrics']['cpu_usage']
+        first = self.cpu[:30].astype(np.float64)
+        self.assertAlmostEqual(cpu['mean'][0], first.mean(), places=2)
+        self.assertAlmostEqual(cpu['min'][0], first.min(), places=3)
+        self.assertAlmostEqual(cpu['max'][0], first.max(), places=3)
+        
+        # A step between rollups is served from the finer one, merged up
+        result = history.query('s1', self.start, self.end - 1, step=600, metrics=['cpu_usage'])
+        self.assertEqual((result['resolution'], result['step']), (300, 600))
+        self.assertAlmostEqual(result['metrics']['cpu_usage']['mean'][0],
+                               self.cpu[:60].astype(np.float64).mean(), places=2)
+        
+        raw = history.query('s1', self.end - 60, self.end - 1)
+        self.assertEqual(raw['resolution'], 0)
+        self.assertEqual(raw['timestamps'], list(range(self.end - 60, self.end, 10)))
+        self.assertEqual(raw['metrics']['disk_iops']['mean'], [None] * 6)
+    
+    def test_history_survives_restart(self):
+        """Test that a new store instance reads flushed history and extends open buckets."""
+        history = MetricsHistory()
+        for ts, cpu in zip(self.timestamps[:3], self.cpu[:3]):
+            history.record('s1', {'timestamp': float(ts), 'cpu_usage': float(cpu)})
+        history.flush()
+        
+        restarted = MetricsHistory()
+        restarted.record('s1', {'timestamp': float(self.timestamps[3]), 'cpu_usage': float(self.cpu[3])})
+        result = restarted.query('s1', self.start, self.start + 59, step=60, metrics=['cpu_usage'])
+        self.assertEqual(result['resolution'], 60)
+        self.assertAlmostEqual(result['metrics']['cpu_usage']['mean'][0],
+                               self.cpu[:4].astype(np.float64).mean(), places=2)
+    
+    def test_retention(self):
+        """Test that each resolution is pruned to its own retention."""
+        retention = {0: 1800, 60: 3600, 300: 86400, 3600: 86400}
+        history = MetricsHistory(retention=retention)
+        with mock.patch.object(metrics_history, 'HISTORY_PRUNE_INTERVAL', 0):
+            self.fill(history)
+            history.record('s1', {'timestamp': float(self.end), 'cpu_usage': 1.0})
+            history.flush()
+        
+        oldest, counts = {}, {}
+        with db.get_connection() as conn:
+            for row in conn.execute('SELECT resolution, data FROM metric_blocks'):
+                timestamps = Block(row['data']).timestamps
+                resolution = row['resolution']
+                oldest[resolution] = min(oldest.get(resolution, timestamps[0]), timestamps[0])
+                counts[resolution] = counts.get(resolution, 0) + len(timestamps)
+        
+        # Whole blocks go once their newest sample is past retention
+        now = time.time()
+        self.assertGreaterEqual(oldest.get(0, now), now - 1800 - BLOCK_SPANS[0] - 1)
+        self.assertGreaterEqual(oldest.get(60, now), now - 3600 - BLOCK_SPANS[60] - 1)
+        self.assertLess(counts.get(0, 0), len(self.timestamps))
+        self.assertEqual(oldest[300], self.start)
+        self.assertEqual(counts[300], 25)
+    
+    def test_record_not_blocked_by_write(self):
+        """Test that samples are recorded while another thread's batch is still being written."""
+        history = MetricsHistory(batch_size=1000)
+        for server_id in ('s1', 's2'):
+            history.record(server_id, {'timestamp': float(self.start), 'cpu_usage': 1.0})
+        
+        writing, release = threading.Event(), threading.Event()
+        original = db.get_connection
+        
+        def stalled():
+            if threading.current_thread().name == 'writer':
+                writing.set()
+                release.wait(5)
+            return original()
+        
+        with mock.patch.object(db, 'get_connection', stalled):
+            writer = threading.Thread(target=history.flush, name='writer')
+            writer.start()
+            self.assertTrue(writing.wait(5))
+            
+            start = time.monotonic()
+            for ts in range(self.start + 10, self.start + 110, 10):
+                history.record('s2', {'timestamp': float(ts), 'cpu_usage': 2.0})
+            self.assertLess(time.monotonic() - start, 1)
+            release.set()
+            writer.join()
+        
+        result = history.query('s2', self.start, self.start + 100, metrics=['cpu_usage'])
+        self.assertEqual(result['metrics']['cpu_usage']['mean'], [1.0] + [2.0] * 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+import unittest
+from unittest import mock
+import metrics_pipeline
+from metrics_pipeline import collect_metrics, forget_metrics
+from metrics_poller import MetricsPoller
+
+class TestMetricsPoller(unittest.TestCase):
+    """Test cases for shared metrics collection and the background poller."""
+    
+    def setUp(self):
+        self.calls = 0
+        
+        def get_server_metrics(server_id):
+            self.calls += 1
+            time.sleep(0.1)
+            return {'success': True, 'timestamp': time.time(), 'cpu_usage': self.calls}
+        
+        for target, attribute, value in [
+            (metrics_pipeline.ssh_manager, 'get_server_metrics', get_server_metrics),
+            (metrics_pipeline, 'record_metrics', mock.Mock()),
+            (metrics_pipeline, '_listeners', [])
+        ]:
+            patcher = mock.patch.object(target, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(forget_metrics, 's1')
+    
+    def test_concurrent_requests_share_one_collection(self):
+        """Test that concurrent and fresh requests reuse one sample, pushed once."""
+        published = []
+        metrics_pipeline.add_metrics_listener(lambda server_id, metrics: published.append(server_id))
+        
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(collect_metrics('s1')))
+                   for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(self.calls, 1)
+        self.assertEqual({result['cpu_usage'] for result in results}, {1})
+        self.assertEqual(published, ['s1'])
+        metrics_pipeline.record_metrics.assert_called_once()
+        
+        cached = collect_metrics('s1')
+        self.assertTrue(cached['cached'])
+        self.assertEqual(self.calls, 1)
+        
+        self.assertEqual(collect_metrics('s1', max_age=0)['cpu_usage'], 2)
+        self.assertEqual(published, ['s1', 's1'])
+    
+    def test_schedule_is_jittered_and_spread(self):
+        """Test that servers start spread over one interval and reschedule within the jitter."""
+        poller = MetricsPoller(mock.Mock(), interval=10, jitter=0.1)
+        poller._executor = mock.Mock()
+        servers = [{'id': f's{i}', 'hostname': f'h{i}'} for i in range(200)]
+        patcher = mock.patch('metrics_poller.db.get_servers', return_value=servers)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        poller.refresh()
+        
+        now = time.monotonic()
+        first = sorted(due - now for due, _ in poller._schedule)
+        self.assertLessEqual(first[-1], 10)
+        self.assertLess(first[0], 1)
+        self.assertGreater(first[-1], 9)
+        
+        with mock.patch('metrics_poller.time.monotonic', return_value=now + 10):
+            poller.run_once()
+        self.assertEqual(poller._executor.submit.call_count, 200)
+        following = [due - now - 10 for due, _ in poller._schedule]
+        self.assertTrue(all(-1 <= delay <= 11 for delay in following))
+        
+        # Servers still being polled are not submitted again
+        with mock.patch('metrics_poller.time.monotonic', return_value=now + 30):
+            poller.run_once()
+        self.assertEqual(poller._executor.submit.call_count, 200)
+        self.assertEqual(poller.stats()['skipped'], 200)
+
+if __name__ == '__main__':
+    unittest.main()
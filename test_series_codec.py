@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import unittest
+import numpy as np
+from series_codec import Block, BlockEncoder, encode_block
+
+class TestSeriesCodec(unittest.TestCase):
+    """Test cases for the delta-of-delta / XOR metric block codec."""
+    
+    def test_round_trip(self):
+        """Test that timestamps and values decode bit-exactly, including gaps and NaN."""
+        rng = np.random.default_rng(3)
+        timestamps = 1_700_000_000 + np.cumsum(rng.choice([9, 10, 10, 11, 600, 100000], 500))
+        columns = rng.uniform(-1e6, 1e6, (3, 500)).astype(np.float32)
+        columns[1] = np.round(columns[1] / 1e6, 1)
+        columns[2, ::7] = np.nan
+        columns[0, 5] = np.inf
+        
+        block = Block(encode_block(timestamps, columns))
+        self.assertEqual(block.timestamps.tolist(), timestamps.tolist())
+        np.testing.assert_array_equal(block.columns([0, 1, 2]).view(np.uint32), columns.view(np.uint32))
+    
+    def test_regular_series_compress(self):
+        """Test that steady 10-second samples cost far less than raw float32."""
+        timestamps = np.arange(0, 3600, 10) + 1_700_000_000
+        columns = np.stack([np.full(360, 42.5), np.repeat(np.arange(36) / 10, 10)])
+        data = encode_block(timestamps, columns)
+        self.assertLess(len(data), 360 * 4 * 3 / 10)
+    
+    def test_lazy_columns_and_extra(self):
+        """Test that to_bytes(extra) leaves the encoder untouched and missing columns read as NaN."""
+        encoder = BlockEncoder(2)
+        encoder.append(100, [1.0, 2.0])
+        encoder.append(110, [1.5, 2.0])
+        block = Block(encoder.to_bytes(extra=(120, [3.0, 4.0])))
+        self.assertEqual(block.timestamps.tolist(), [100, 110, 120])
+        self.assertEqual(block.column(0).tolist(), [1.0, 1.5, 3.0])
+        self.assertTrue(np.isnan(block.column(5)).all())
+        
+        self.assertEqual(len(encoder), 2)
+        encoder.append(130, [2.0, 2.0])
+        self.assertEqual(Block(encoder.to_bytes()).column(1).tolist(), [2.0, 2.0, 2.0])
+
+if __name__ == '__main__':
+    unittest.main()
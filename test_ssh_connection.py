@@ -59,8 +59,8 @@ def test_ssh_connection(hostname, username, password=None, key_path=None, port=2
         print("✅ Metrics collected successfully!")
         print("CPU Usage: {:.1f}%".format(metrics.get('cpu_usage', 0)))
         print("Memory: {}/{} MB ({:.1f}%)".format(
-            metrics.get('memory_used', 0),
-            metrics.get('memory_total', 0),
+            metrics.get('memory_used', 0) // (1024 * 1024),
+            metrics.get('memory_total', 0) // (1024 * 1024),
             metrics.get('memory_percent', 0)
         ))
         print("Disk Usage: {}".format(metrics.get('disk_percent', 0)))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import time
+import random
+import threading
+import unittest
+from ssh_manager import SSHManager
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+    
+    def is_active(self):
+        return self.active
+
+class FakeClient:
+    def __init__(self):
+        self.transport = FakeTransport()
+    
+    def get_transport(self):
+        return self.transport
+    
+    def close(self):
+        self.transport.active = False
+
+class FakeSSHManager(SSHManager):
+    """SSHManager whose handshakes are simulated and counted."""
+    
+    def __init__(self, handshake_time=0.02):
+        super().__init__()
+        self.handshake_time = handshake_time
+        self.handshakes = 0
+        self.counter_lock = threading.Lock()
+    
+    def _open_client(self, hostname, username, password, key_path, port):
+        with self.counter_lock:
+            self.handshakes += 1
+        time.sleep(self.handshake_time)
+        return FakeClient()
+
+def server(server_id):
+    return {'id': server_id, 'hostname': f'{server_id}.example', 'username': 'root', 'password': 'x'}
+
+class TestSSHManagerConcurrency(unittest.TestCase):
+    """Stress tests for the lock-striped SSHManager connection registry."""
+    
+    def run_threads(self, target, count, timeout=10):
+        threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout)
+            self.assertFalse(thread.is_alive(), "thread deadlocked")
+    
+    def test_reconnect_existing_server(self):
+        """Test that reconnecting an existing server id does not deadlock."""
+        manager = FakeSSHManager(handshake_time=0)
+        self.assertTrue(manager.ensure_connected(server('a')))
+        first = manager.get_connection('a')
+        
+        done = threading.Event()
+        threading.Thread(target=lambda: manager.connect('a', 'a.example', 'root', password='x') and done.set()).start()
+        self.assertTrue(done.wait(5))
+        
+        self.assertIsNot(manager.get_connection('a'), first)
+        self.assertFalse(first.get_transport().is_active())
+    
+    def test_single_flight_connect(self):
+        """Test that concurrent callers for one host trigger a single handshake."""
+        manager = FakeSSHManager(handshake_time=0.1)
+        results = []
+        self.run_threads(lambda i: results.append(manager.ensure_connected(server('a'))), 50)
+        self.assertEqual(results, [True] * 50)
+        self.assertEqual(manager.handshakes, 1)
+    
+    def test_cleanup_idle_connections(self):
+        """Test that idle cleanup closes connections without deadlocking."""
+        manager = FakeSSHManager(handshake_time=0)
+        for i in range(5):
+            manager.ensure_connected(server(f's{i}'))
+        self.assertEqual(manager.cleanup_idle_connections(max_idle_time=-1), 5)
+        self.assertEqual(manager.connections, {})
+    
+    def test_stress_connect_get_disconnect(self):
+        """Hammer connect/get/disconnect/cleanup on a few hosts from many threads."""
+        manager = FakeSSHManager(handshake_time=0.001)
+        server_ids = [f's{i}' for i in range(4)]
+        errors = []
+        
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(200):
+                    server_id = rng.choice(server_ids)
+                    op = rng.random()
+                    if op < 0.4:
+                        manager.ensure_connected(server(server_id))
+                    elif op < 0.6:
+                        manager.connect(server_id, 'h', 'root', password='x')
+                    elif op < 0.9:
+                        manager.get_connection(server_id)
+                        manager.pool_stats(server_id)
+                    elif op < 0.98:
+                        manager.disconnect(server_id)
+                    else:
+                        manager.cleanup_idle_connections(max_idle_time=0)
+            except Exception as e:
+                errors.append(e)
+        
+        self.run_threads(worker, 32, timeout=30)
+        self.assertEqual(errors, [])
+        self.assertEqual(manager._flights, {})
+        
+        # Every registered pool is still usable
+        for server_id, entry in manager.connections.items():
+            self.assertIsNotNone(entry['pool'].primary())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+import unittest
+from ssh_pool import HostPool, PoolTimeout, LANE_INTERACTIVE, LANE_METRICS
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+    
+    def is_active(self):
+        return self.active
+
+class FakeClient:
+    def __init__(self):
+        self.transport = FakeTransport()
+        self.closed = False
+    
+    def get_transport(self):
+        return self.transport
+    
+    def close(self):
+        self.closed = True
+        self.transport.active = False
+
+class TestHostPool(unittest.TestCase):
+    """Test cases for the per-host SSH transport pool."""
+    
+    def make_pool(self, **kwargs):
+        self.opened = []
+        
+        def factory():
+            client = FakeClient()
+            self.opened.append(client)
+            return client
+        
+        return HostPool(factory, **kwargs)
+    
+    def test_fill_opens_min_transports(self):
+        """Test that fill() opens min_transports clients."""
+        pool = self.make_pool(min_transports=2, max_transports=4, max_channels=2)
+        pool.fill()
+        self.assertEqual(pool.stats()['transports'], 2)
+        self.assertEqual(pool.stats()['idle_transports'], 2)
+    
+    def test_grows_when_saturated(self):
+        """Test that a new transport is opened only when channels run out."""
+        pool = self.make_pool(min_transports=1, max_transports=3, max_channels=2)
+        pool.fill()
+        slots = [pool.acquire() for _ in range(5)]
+        stats = pool.stats()
+        self.assertEqual(stats['transports'], 3)
+        self.assertEqual(stats['channels_in_use'], 5)
+        for slot in slots:
+            pool.release(slot)
+        self.assertEqual(pool.stats()['channels_in_use'], 0)
+    
+    def test_trim_idle_transports(self):
+        """Test that trim closes idle transports above the minimum only."""
+        pool = self.make_pool(min_transports=1, max_transports=3, max_channels=1)
+        pool.fill()
+        slots = [pool.acquire() for _ in range(3)]
+        for slot in slots:
+            pool.release(slot)
+        self.assertEqual(pool.trim(max_idle_time=-1), 2)
+        self.assertEqual(pool.stats()['transports'], 1)
+    
+    def test_timeout_when_exhausted(self):
+        """Test that acquire times out when every channel is in use."""
+        pool = self.make_pool(min_transports=1, max_transports=1, max_channels=1)
+        pool.fill()
+        pool.acquire()
+        self.assertRaises(PoolTimeout, pool.acquire, LANE_INTERACTIVE, 0.05)
+        self.assertEqual(pool.stats()['waiters'][LANE_INTERACTIVE], 0)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+    
+    def test_lanes_served_round_robin(self):
+        """Test that metric polls are not starved by queued interactive work."""
+        pool = self.make_pool(min_transports=1, max_transports=1, max_channels=1)
+        pool.fill()
+        held = pool.acquire()
+        order = []
+        
+        def worker(lane, name):
+            with pool.lease(lane, timeout=5):
+                order.append(name)
+                time.sleep(0.01)
+        
+        threads = [threading.Thread(target=worker, args=(LANE_INTERACTIVE, f'i{i}')) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        while pool.stats()['waiters'][LANE_INTERACTIVE] < 4:
+            time.sleep(0.005)
+        metrics_thread = threading.Thread(target=worker, args=(LANE_METRICS, 'm'))
+        metrics_thread.start()
+        while pool.stats()['waiters'][LANE_METRICS] < 1:
+            time.sleep(0.005)
+        
+        pool.release(held)
+        for thread in threads + [metrics_thread]:
+            thread.join()
+        
+        # The metrics request jumps ahead of the remaining interactive backlog
+        self.assertLessEqual(order.index('m'), 1)
+    
+    def test_dead_transport_replaced(self):
+        """Test that a dead idle transport is dropped and replaced."""
+        pool = self.make_pool(min_transports=1, max_transports=1, max_channels=1)
+        pool.fill()
+        self.opened[0].transport.active = False
+        with pool.lease() as client:
+            self.assertIs(client, self.opened[1])
+        self.assertTrue(self.opened[0].closed)
+    
+    def test_close_wakes_waiters(self):
+        """Test that closing the pool fails pending acquires."""
+        pool = self.make_pool(min_transports=1, max_transports=1, max_channels=1)
+        pool.fill()
+        pool.acquire()
+        errors = []
+        
+        def waiter():
+            try:
+                pool.acquire(timeout=5)
+            except ConnectionError as e:
+                errors.append(e)
+        
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.05)
+        pool.close()
+        thread.join()
+        self.assertEqual(len(errors), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import logging
+import threading
+import unittest
+from ssh_manager import SSHManager
+from local_ssh_server import LocalSSHServer
+
+logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+class TestPersistentShell(unittest.TestCase):
+    """Test cases for running commands through a persistent shell channel."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalSSHServer().start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+    
+    def setUp(self):
+        self.ssh = SSHManager(exec_mode='shell')
+        self.assertTrue(self.ssh.connect('local', '127.0.0.1', 'test', password='x', port=self.server.port))
+    
+    def tearDown(self):
+        self.ssh.disconnect('local')
+    
+    def test_output_and_exit_codes(self):
+        """Test that stdout, stderr and exit codes are demultiplexed per command."""
+        result = self.ssh.execute_command('local', 'echo out; echo err >&2; exit 3')
+        self.assertEqual(result['stdout'], 'out\n')
+        self.assertEqual(result['stderr'], 'err\n')
+        self.assertEqual(result['exit_code'], 3)
+        
+        result = self.ssh.execute_command('local', 'printf no-newline')
+        self.assertEqual(result['stdout'], 'no-newline')
+        self.assertTrue(result['success'])
+        
+        # exec and shell modes agree
+        exec_result = self.ssh.execute_command('local', 'printf no-newline', mode='exec')
+        self.assertEqual(exec_result['stdout'], result['stdout'])
+    
+    def test_session_survives_bad_commands(self):
+        """Test that syntax errors, exit and cd do not leak into later commands."""
+        before = self.ssh.execute_command('local', 'pwd')['stdout']
+        self.assertNotEqual(self.ssh.execute_command('local', 'if then')['exit_code'], 0)
+        self.ssh.execute_command('local', 'cd / && exit 1')
+        self.ssh.execute_command('local', 'cat')  # stdin is /dev/null, must not hang
+        
+        self.assertEqual(self.ssh.execute_command('local', 'pwd')['stdout'], before)
+        self.assertEqual(self.ssh._shells['local']['shell'].commands_run, 5)
+    
+    def test_pipelined_commands(self):
+        """Test that concurrent commands share one shell and get their own output."""
+        results = {}
+        
+        def run(i):
+            results[i] = self.ssh.execute_command('local', f'sleep 0.0{i % 3}; echo {i}')
+        
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        
+        for i in range(20):
+            self.assertEqual(results[i]['stdout'], f'{i}\n')
+        self.assertEqual(self.ssh._shells['local']['shell'].commands_run, 20)
+    
+    def test_timeout_reopens_shell(self):
+        """Test that a timed-out command closes the shell and the next one reopens it."""
+        result = self.ssh.execute_command('local', 'sleep 5', timeout=0.2)
+        self.assertFalse(result['success'])
+        self.assertIn('timed out', result['error'])
+        
+        result = self.ssh.execute_command('local', 'echo again')
+        self.assertEqual(result['stdout'], 'again\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import threading
+import unittest
+from warmup import ConnectionWarmer
+from test_ssh_manager import FakeSSHManager, server
+
+class PeakSSHManager(FakeSSHManager):
+    """FakeSSHManager that records peak concurrent handshakes and fails some hosts."""
+    
+    def __init__(self, handshake_time=0.05, failing=()):
+        super().__init__(handshake_time)
+        self.failing = set(failing)
+        self.active = 0
+        self.peak = 0
+    
+    def _open_client(self, hostname, username, password, key_path, port):
+        with self.counter_lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            if hostname in self.failing:
+                raise ConnectionRefusedError('Connection refused')
+            return super()._open_client(hostname, username, password, key_path, port)
+        finally:
+            with self.counter_lock:
+                self.active -= 1
+
+def named_server(server_id):
+    return dict(server(server_id), name=server_id)
+
+class TestConnectionWarmer(unittest.TestCase):
+    """Tests for concurrent connection warm-up."""
+    
+    def test_concurrency_cap(self):
+        """Test that warm-up connects concurrently but within the cap."""
+        manager = PeakSSHManager()
+        warmer = ConnectionWarmer(manager, concurrency=4)
+        run = warmer.warm([named_server(f's{i}') for i in range(12)], wait_for=None)
+        
+        self.assertEqual(run['connected'], 12)
+        self.assertEqual(run['pending'], 0)
+        self.assertEqual(manager.peak, 4)
+        self.assertEqual(len(manager.connections), 12)
+    
+    def test_progress_and_failures(self):
+        """Test that per-server states, errors and timings are reported."""
+        manager = PeakSSHManager(handshake_time=0, failing={'bad.example'})
+        warmer = ConnectionWarmer(manager, concurrency=2)
+        warmer.warm([named_server('good'), named_server('bad')], reason='startup', wait_for=None)
+        
+        status = warmer.status()
+        self.assertFalse(status['running'])
+        run = status['runs'][0]
+        self.assertEqual(run['reason'], 'startup')
+        self.assertEqual((run['connected'], run['failed']), (1, 1))
+        states = {entry['id']: entry for entry in run['servers']}
+        self.assertEqual(states['good']['state'], 'connected')
+        self.assertIsNotNone(states['good']['elapsed_ms'])
+        self.assertEqual(states['bad']['state'], 'failed')
+        self.assertTrue(states['bad']['error'])
+        self.assertIsNotNone(run['duration_ms'])
+
+if __name__ == '__main__':
+    unittest.main()
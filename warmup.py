@@ -0,0 +1,133 @@
+import os
+import time
+import uuid
+import threading
+import logging
+from collections import deque
+from concurrent.futures import wait
+from typing import Dict, Any, List, Optional
+import db
+from ssh_manager import ssh_manager
+from fanout import FanOutExecutor, server_host_key
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Connect to servers up front, at startup and when they are added, instead of on first use
+WARMUP_ENABLED = os.environ.get('SSH_WARMUP', 'False').lower() in ('true', '1', 't')
+
+# Hosts connected to at once during a warm-up
+WARMUP_CONCURRENCY = int(os.environ.get('SSH_WARMUP_CONCURRENCY', 16))
+
+# Warm-up runs whose progress is kept for the API
+WARMUP_HISTORY = 10
+
+class ConnectionWarmer:
+    """
+    Pre-establishes SSH connections so first queries do not pay for the handshake.
+
+    Servers are connected concurrently, at most `concurrency` at a time and one
+    at a time per host. Progress and per-server timings of recent runs are kept
+    for the warm-up API endpoint.
+    """
+
+    def __init__(self, manager, concurrency: int = WARMUP_CONCURRENCY):
+        self.manager = manager
+        self.concurrency = concurrency
+        self._executor = FanOutExecutor(max_workers=concurrency, per_host_limit=1)
+        self._runs = deque(maxlen=WARMUP_HISTORY)
+        self.lock = threading.Lock()
+
+    def warm(self, servers: List[Dict[str, Any]], reason: str = 'manual',
+             wait_for: Optional[float] = 0) -> Dict[str, Any]:
+        """
+        Connect to servers in the background and return the run's progress.
+
+        Args:
+            servers: Server records including credentials.
+            reason: Label for the run, e.g. 'startup' or 'server_added'.
+            wait_for: Seconds to wait for the run to finish; None waits forever.
+        """
+        run = {
+            'id': str(uuid.uuid4()),
+            'reason': reason,
+            'started_at': time.time(),
+            'finished_at': None,
+            'duration_ms': None,
+            'total': len(servers),
+            'connected': 0,
+            'failed': 0,
+            'servers': {
+                server['id']: {'name': server['name'], 'state': 'pending',
+                               'elapsed_ms': None, 'error': None}
+                for server in servers
+            }
+        }
+        with self.lock:
+            self._runs.append(run)
+
+        if not servers:
+            self._finish(run)
+            return self._snapshot(run)
+
+        logger.info(f"Warming up connections to {len(servers)} servers ({reason})")
+        futures = [
+            self._executor.submit(server_host_key(server), self._warm_one, run, server)
+            for server in servers
+        ]
+        if wait_for is None or wait_for > 0:
+            wait(futures, timeout=wait_for)
+
+        return self._snapshot(run)
+
+    def warm_all(self, reason: str = 'manual', wait_for: Optional[float] = 0) -> Dict[str, Any]:
+        """Warm up connections to every server in the database."""
+        return self.warm(db.get_servers(include_credentials=True), reason, wait_for)
+
+    def _warm_one(self, run: Dict[str, Any], server: Dict[str, Any]) -> None:
+        entry = run['servers'][server['id']]
+        entry['state'] = 'connecting'
+        start = time.monotonic()
+        try:
+            connected = self.manager.ensure_connected(server)
+            error = None if connected else self.manager.connect_error(server)
+        except Exception as e:
+            connected, error = False, str(e)
+
+        with self.lock:
+            entry['elapsed_ms'] = round((time.monotonic() - start) * 1000, 1)
+            entry['state'] = 'connected' if connected else 'failed'
+            entry['error'] = error
+            run['connected' if connected else 'failed'] += 1
+            done = run['connected'] + run['failed'] == run['total']
+        if done:
+            self._finish(run)
+
+    def _finish(self, run: Dict[str, Any]) -> None:
+        run['finished_at'] = time.time()
+        run['duration_ms'] = round((run['finished_at'] - run['started_at']) * 1000, 1)
+        logger.info(f"Connection warm-up ({run['reason']}) finished in {run['duration_ms']}ms: "
+                    f"{run['connected']} connected, {run['failed']} failed")
+
+    def _snapshot(self, run: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                **run,
+                'pending': run['total'] - run['connected'] - run['failed'],
+                'servers': [{'id': server_id, **entry} for server_id, entry in run['servers'].items()]
+            }
+
+    def status(self) -> Dict[str, Any]:
+        """Return progress and timings of recent warm-up runs, newest first."""
+        with self.lock:
+            runs = list(self._runs)
+        snapshots = [self._snapshot(run) for run in reversed(runs)]
+        return {
+            'running': any(run['finished_at'] is None for run in snapshots),
+            'concurrency': self.concurrency,
+            'runs': snapshots
+        }
+
+# Create a singleton instance
+connection_warmer = ConnectionWarmer(ssh_manager)
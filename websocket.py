@@ -1,9 +1,12 @@
 import logging
 from typing import Dict, Any, List, Optional
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import db
 from ssh_manager import ssh_manager
 from ai_agent import ai_agent
+from metrics_pipeline import collect_metrics, latest_metrics, add_metrics_listener
+from history_writer import history_writer
+from command_stream import run_streamed
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -12,6 +15,20 @@ logger = logging.getLogger(__name__)
 # Initialize SocketIO instance
 socketio = SocketIO()
 
+def metrics_room(server_id: str) -> str:
+    """Name of the room whose clients receive a server's metrics."""
+    return f'metrics:{server_id}'
+
+def publish_metrics(server_id: str, metrics: Dict[str, Any]):
+    """Push a collected sample to the clients subscribed to its server."""
+    socketio.emit('metrics_update', {
+        'server_id': server_id,
+        'metrics': metrics
+    }, to=metrics_room(server_id))
+
+# Every collection, polled or on demand, is pushed once to its subscribers
+add_metrics_listener(publish_metrics)
+
 def init_socketio(app):
     """Initialize SocketIO with the Flask app."""
     socketio.init_app(app, cors_allowed_origins="*", async_mode="eventlet")
@@ -46,7 +63,12 @@ def register_handlers():
     
     @socketio.on('execute_action')
     def handle_execute_action(data):
-        """Execute a command on a server."""
+        """
+        Execute a command on a server.
+        
+        With 'stream': true, output is sent as 'command_output' chunk events
+        followed by a 'command_complete' event carrying the exit status.
+        """
         action_type = data.get('action')
         server_id = data.get('server_id')
         command = data.get('command')
@@ -86,22 +108,31 @@ def register_handlers():
             if not connection_result:
                 socketio.emit('action_result', {
                     'success': False,
-                    'error': f'Failed to connect to server {server["name"]}',
+                    'error': ssh_manager.connect_error(server),
                     'action': action_type
                 })
                 return
         
-        # Execute the command
-        result = ssh_manager.execute_command(server_id, command)
+        if data.get('stream'):
+            # Stream output chunks as they arrive, tagged with an execution id
+            result = run_streamed(ssh_manager, socketio.emit, server_id, command,
+                                  action=action_type, execution_id=data.get('execution_id'))
+        else:
+            # Execute the command
+            result = ssh_manager.execute_command(server_id, command)
         
         # Log the command to history
-        db.add_command_history(
+        history_writer.add(
             server_id=server_id,
             command=command,
             output=result.get('stdout', '') + '\n' + result.get('stderr', ''),
             exit_code=result.get('exit_code')
         )
         
+        if data.get('stream'):
+            # command_complete has already reported the result
+            return
+        
         # Send result back to client
         socketio.emit('action_result', {
             'action': action_type,
@@ -109,13 +140,82 @@ def register_handlers():
             'result': result
         })
     
+    @socketio.on('execute_actions')
+    def handle_execute_actions(data):
+        """Run a batch of actions (e.g. an "all servers" response) concurrently."""
+        actions = data.get('actions', [])
+        
+        if not actions:
+            socketio.emit('action_result', {
+                'success': False,
+                'error': 'Invalid request: Missing actions'
+            })
+            return
+        
+        def emit_result(action, result):
+            # Emit each server's result as soon as it completes
+            if action['type'] == 'get_metrics':
+                socketio.emit('metrics_update', {
+                    'server_id': action['server_id'],
+                    'metrics': result
+                })
+            else:
+                socketio.emit('action_result', {
+                    'action': action['type'],
+                    'server_id': action['server_id'],
+                    'result': result
+                })
+        
+        ai_agent.run_actions(actions, on_result=emit_result)
+    
+    @socketio.on('subscribe_metrics')
+    def handle_subscribe_metrics(data):
+        """
+        Receive 'metrics_update' events for a server until unsubscribed.
+        
+        The latest sample, if any, is sent right away; after that every
+        sample the poller or an on-demand request collects is pushed.
+        """
+        server_id = data.get('server_id')
+        
+        if not server_id or not db.get_server(server_id):
+            emit('metrics_update', {
+                'success': False,
+                'error': f'Server with ID {server_id} not found' if server_id else
+                         'Invalid request: Missing server_id'
+            })
+            return
+        
+        join_room(metrics_room(server_id))
+        logger.info(f"Client subscribed to metrics of server {server_id}")
+        
+        metrics = latest_metrics(server_id)
+        if metrics:
+            emit('metrics_update', {
+                'server_id': server_id,
+                'metrics': metrics
+            })
+    
+    @socketio.on('unsubscribe_metrics')
+    def handle_unsubscribe_metrics(data):
+        """Stop receiving a server's metrics."""
+        server_id = data.get('server_id')
+        if server_id:
+            leave_room(metrics_room(server_id))
+    
     @socketio.on('get_metrics')
     def handle_get_metrics(data):
-        """Get system metrics from a server."""
+        """
+        Get system metrics from a server.
+        
+        A sample collected within the freshness window is returned without
+        asking the server again. The reply goes to the requesting client;
+        newly collected samples also reach the server's subscribers.
+        """
         server_id = data.get('server_id')
         
         if not server_id:
-            socketio.emit('metrics_update', {
+            emit('metrics_update', {
                 'success': False,
                 'error': 'Invalid request: Missing server_id'
             })
@@ -124,7 +224,7 @@ def register_handlers():
         # Get server details
         server = db.get_server(server_id)
         if not server:
-            socketio.emit('metrics_update', {
+            emit('metrics_update', {
                 'success': False,
                 'error': f'Server with ID {server_id} not found'
             })
@@ -143,17 +243,17 @@ def register_handlers():
             )
             
             if not connection_result:
-                socketio.emit('metrics_update', {
+                emit('metrics_update', {
                     'success': False,
-                    'error': f'Failed to connect to server {server["name"]}'
+                    'error': ssh_manager.connect_error(server)
                 })
                 return
         
         # Get metrics
-        metrics = ssh_manager.get_server_metrics(server_id)
+        metrics = collect_metrics(server_id)
         
         # Send metrics back to client
-        socketio.emit('metrics_update', {
+        emit('metrics_update', {
             'server_id': server_id,
             'metrics': metrics
         })